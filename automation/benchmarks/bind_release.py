@@ -0,0 +1,79 @@
+#---------------------------------------------------------
+# Release binding step of the benchmarks
+# Runs the semantic model binding step of fabric_release.py for all layers of
+# an environment, without publishing items with fabric-cicd. Used by
+# run_benchmarks.py, where the semantic models were created by git sync.
+#---------------------------------------------------------
+import os, sys, io, argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")))
+
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.report_functions as perfreport
+import modules.semantic_model_functions as smfunc
+import modules.state_functions as fabstate
+
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Release binding benchmark arguments")
+parser.add_argument("--environment", required=False, default="dev", help="Environment to bind the semantic models in. Default is dev.")
+parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
+parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
+parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
+parser.add_argument("--bind_max_workers", required=False, default=4, type=int, help="Maximum number of semantic models bound to SQL endpoints concurrently. Default is 4.")
+parser.add_argument("--state", required=False, default=os.environ.get('FABRICOPS_STATE'), help="State file written by utils_build_parameter_file.py --state, read like fabric_release.py does. Defaults to the FABRICOPS_STATE environment variable.")
+parser.add_argument("--report", required=False, default=os.environ.get('FABRICOPS_REPORT'), help="Writes a performance report to this file or folder. Defaults to the FABRICOPS_REPORT environment variable.")
+
+args = parser.parse_args()
+perfreport.start(args.report, environment=args.environment)
+
+environment = args.environment
+
+# Authenticate
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(args.client_id, args.client_secret, args.tenant_id)
+
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
+env_definition = misc.merge_json(main_json, env_json)
+
+if not env_definition:
+    misc.print_error(f"No environment definition found for {environment}... Exiting!")
+    sys.exit(1)
+
+misc.print_header(f"Binding semantic models - {environment}")
+environment_state = fabstate.load_state(args.state, environment, env_definition) if args.state else None
+
+failed = 0
+bindings_yml = os.path.join(misc.PARAMETERS_DIR, "sqlendpoint_model_binding.yml")
+for layer in env_definition.get("layers"):
+    bindings = misc.get_semantic_model_bindings(bindings_yml, layer)
+    if not bindings:
+        continue
+
+    workspace_name = env_definition.get("name").format(layer=layer, environment=environment)
+    misc.print_subheader(f"Binding semantic models of {workspace_name}")
+
+    workspace_id = fabstate.get_workspace_id(environment_state, layer) or fabcli.run_command(f"get '{workspace_name}.Workspace' -q id -f").strip()
+    bind_results = smfunc.bind_semantic_models(
+        workspace_id=workspace_id,
+        workspace_name=workspace_name,
+        bindings=bindings,
+        env_definition=env_definition,
+        environment=environment,
+        owner_ids={args.client_id},
+        max_workers=args.bind_max_workers,
+    )
+
+    succeeded = sum(1 for result in bind_results if result.get("status") == "succeeded")
+    failed += len(bind_results) - succeeded
+    misc.print_info(f"{succeeded} of {len(bind_results)} semantic model(s) bound.")
+
+if failed:
+    misc.print_error(f"{failed} semantic model(s) not bound.")
+    sys.exit(1)
+
+misc.print_success("All semantic models bound.")
@@ -0,0 +1,117 @@
+#---------------------------------------------------------
+# API call budget gate
+# Runs canonical scenarios (fresh setup, idempotent setup re-run, parameter
+# file builders, release binding and git sync) against the local Fabric API
+# emulator, counts the calls by endpoint and CLI verb and fails if a run makes
+# more calls than allowed by the checked-in budget file (call_budgets.json).
+# An N+1 lookup in an item loop shows up as calls above the budget.
+#
+# Usage:
+#   python automation/benchmarks/check_call_budget.py
+#   python automation/benchmarks/check_call_budget.py --update true
+#---------------------------------------------------------
+import os, sys, io, json, argparse, tempfile
+import harness
+import synthetic
+import modules.misc_functions as misc
+
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+# Scale of the canonical scenarios. Several lakehouses per layer make per-item calls in the setup item loop visible.
+DEFAULT_SCALE = {"layers": 3, "items": 12, "environments": 2, "lakehouses": 3}
+
+# Get arguments
+parser = argparse.ArgumentParser(description="API call budget gate arguments")
+parser.add_argument("--budget", required=False, default=os.path.join(harness.BENCHMARKS_DIR, "call_budgets.json"), help="Budget file. Default is benchmarks/call_budgets.json.")
+parser.add_argument("--update", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Writes the counted calls to the budget file instead of checking them.")
+parser.add_argument("--scenarios", required=False, default=",".join(harness.SCENARIOS), help=f"Comma separated list of scenarios to run. Default is all: {', '.join(harness.SCENARIOS)}.")
+parser.add_argument("--work_dir", required=False, help="Folder for the synthetic environment and logs. Defaults to a temporary folder.")
+
+args = parser.parse_args()
+
+budget = misc.load_json(args.budget) if os.path.isfile(args.budget) else {}
+if not budget and not args.update:
+    misc.print_error(f"Budget file {args.budget} not found. Create it with --update true.")
+    sys.exit(1)
+
+scale = budget.get("scale") or DEFAULT_SCALE
+scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="fabricops_call_budget_"))
+
+
+def get_counts(measurement: dict) -> dict:
+    """Returns the budgeted counts of a run as {metric: count}."""
+    counts = {"calls total": measurement.get("api_calls"), "writes total": measurement.get("api_writes")}
+    counts.update({f"calls {endpoint}": count for endpoint, count in measurement.get("api_calls_by_endpoint").items()})
+    counts.update({f"fab {verb}": count for verb, count in (measurement.get("cli_calls_by_verb") or {}).items()})
+    return counts
+
+
+def check_run(name: str, counts: dict, run_budget: dict) -> list:
+    """Returns the budget violations of a run as table rows. Counts without a budget (new endpoints or verbs) violate it."""
+    if run_budget is None:
+        return [(name, "calls total", "no budget", counts.get("calls total"), "✖ missing")]
+    return [
+        (name, metric, run_budget.get(metric, 0), count, "✖ exceeded")
+        for metric, count in counts.items()
+        if count > run_budget.get(metric, 0)
+    ]
+
+
+misc.print_header("API call budget")
+misc.print_info(f"Scale: {scale.get('layers')} layer(s), {scale.get('items')} item(s), {scale.get('environments')} environment(s), {scale.get('lakehouses')} lakehouse(s) per layer")
+misc.print_info(f"Budget: {args.budget}")
+
+paths = synthetic.generate(os.path.join(work_dir, "environment"), scale.get("layers"), scale.get("items"), scale.get("environments"), scale.get("lakehouses", 1))
+emulator, server, env = harness.start_emulator(paths)
+
+runs = {}
+failed_runs = []
+violations = []
+try:
+    for scenario in scenarios:
+        for measurement in harness.run_scenario(emulator, env, scenario, paths.get("environment_names"), work_dir):
+            name = measurement.get("run")
+            if measurement.get("exit_code"):
+                failed_runs.append(name)
+                misc.print_error(f"{name} failed with exit code {measurement.get('exit_code')}. Output: {measurement.get('log_path')}")
+                continue
+
+            counts = get_counts(measurement)
+            runs[name] = counts
+            run_violations = [] if args.update else check_run(name, counts, budget.get("runs", {}).get(name))
+            violations.extend(run_violations)
+
+            if run_violations:
+                misc.print_error(f"{name}: {measurement.get('api_calls')} API call(s), {measurement.get('api_writes')} write(s) ✖ over budget")
+            else:
+                misc.print_success(f"{name}: {measurement.get('api_calls')} API call(s), {measurement.get('api_writes')} write(s)")
+finally:
+    server.shutdown()
+
+print("")
+
+if failed_runs:
+    misc.print_error(f"{len(failed_runs)} run(s) failed, the call budget was not checked for them.", bold=True)
+    sys.exit(1)
+
+if args.update:
+    budget = {"scale": scale, "runs": {**budget.get("runs", {}), **runs}}
+    with open(args.budget, "w", encoding="utf-8") as f:
+        json.dump(budget, f, indent=2)
+        f.write("\n")
+    misc.print_success(f"Call budget of {len(runs)} run(s) written to {args.budget}.", bold=True)
+    sys.exit(0)
+
+if violations:
+    misc.print_table(["Run", "Metric", "Budget", "Counted", ""], violations)
+    print("")
+    misc.print_error(f"{len(violations)} count(s) over budget. If the additional calls are intended, update the budget with --update true.", bold=True)
+    sys.exit(1)
+
+# Point out budgets that can be tightened, so improvements are locked in
+below = sum(1 for name, counts in runs.items() for metric, count in budget.get("runs", {}).get(name, {}).items() if counts.get(metric, 0) < count)
+if below:
+    misc.print_info(f"{below} count(s) below budget. Lock in the improvement with --update true.")
+misc.print_success("All runs within the call budget.", bold=True)
@@ -0,0 +1,142 @@
+#---------------------------------------------------------
+# Benchmark harness
+# Runs entry scripts against an in-process Fabric API emulator serving a
+# synthetic environment and measures them. Shared by run_benchmarks.py and
+# check_call_budget.py.
+#---------------------------------------------------------
+import os, sys, time, subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.abspath(os.path.join(BENCHMARKS_DIR, "..", "scripts"))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, "mock"))
+
+import modules.misc_functions as misc
+import synthetic
+from fabric_emulator import FabricEmulator, start_server
+
+SCENARIOS = ["setup", "setup_rerun", "parameter_file", "parameter_file_dynamic", "release_binding", "release_binding_state", "gitsync"]
+
+
+def get_git_commit() -> str:
+    """Returns the commit of the working copy, or None outside of git."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def start_emulator(paths: dict, config: dict = None) -> tuple:
+    """
+    Starts the emulator on a free port, updating workspaces from the synthetic solution tree.
+
+    Args:
+        paths (dict): Folders of a synthetic environment as returned by synthetic.generate.
+        config (dict, optional): Emulator configuration, e.g. {"latency_ms": 50}.
+
+    Returns:
+        tuple: (emulator, server, environment variables to run the scripts with)
+    """
+    emulator = FabricEmulator(config, capacities=[synthetic.CAPACITY_NAME], repository=paths.get("root"))
+    server = start_server(emulator, "127.0.0.1", 0)
+
+    env = os.environ.copy()
+    env.update({
+        "FABRICOPS_ENVIRONMENTS_DIR": paths.get("environments"),
+        "FABRICOPS_PARAMETERS_DIR": paths.get("parameters"),
+        "FABRICOPS_SOLUTION_DIR": paths.get("solution"),
+        "FABRICOPS_EMULATOR_URL": f"http://127.0.0.1:{server.server_address[1]}",
+        "FABRICOPS_FAB_EXECUTABLE": f'"{sys.executable}" "{os.path.join(SCRIPTS_DIR, "mock", "mock_fab.py")}"',
+        "FABRICOPS_FAB_CONFIG_DIR": os.path.join(paths.get("root"), "fab"),
+    })
+    for name in ("FABRICOPS_TRACE", "FABRICOPS_REPORT", "FABRICOPS_SETUP_JOURNAL", "FABRICOPS_STATE"):
+        env.pop(name, None)
+    for name in ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET", "GITHUB_PAT"):
+        env.setdefault(name, "emulator")
+    return emulator, server, env
+
+
+def get_scenario_runs(scenario: str, environment_names: list, work_dir: str) -> list:
+    """Returns the runs of a scenario as list of (name, command)."""
+    if scenario == "setup":
+        return [(f"setup {environment}", ["fabric_setup.py", "--environment", environment]) for environment in environment_names]
+    if scenario == "setup_rerun":
+        return [(f"setup {environment_names[0]} (re-run)", ["fabric_setup.py", "--environment", environment_names[0]])]
+    if scenario == "parameter_file":
+        return [("utils_build_parameter_file", ["utils_build_parameter_file.py", "--environments", ",".join(environment_names)])]
+    if scenario == "parameter_file_dynamic":
+        return [("utils_build_parameter_file_dynamic", ["utils_build_parameter_file_dynamic.py", "--target_environments", ",".join(environment_names[1:])])]
+    if scenario == "release_binding":
+        return [(f"release binding {environment_names[0]}", [os.path.join(BENCHMARKS_DIR, "bind_release.py"), "--environment", environment_names[0]])]
+    if scenario == "release_binding_state":
+        # The build stage scans the environments into a state file, the release reads it instead of discovering again
+        state_path = os.path.join(work_dir, "fabric_state.json")
+        return [
+            ("utils_build_parameter_file (state)", ["utils_build_parameter_file.py", "--environments", ",".join(environment_names), "--state", state_path]),
+            (f"release binding {environment_names[0]} (state)", [os.path.join(BENCHMARKS_DIR, "bind_release.py"), "--environment", environment_names[0], "--state", state_path]),
+        ]
+    if scenario == "gitsync":
+        return [(f"gitsync {environment_names[0]}", ["fabric_gitsync_env.py", "--environment", environment_names[0]])]
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+def run_script(command: list, env: dict, log_path: str) -> tuple:
+    """
+    Runs a script from the scripts folder and measures it.
+
+    Returns:
+        tuple: (exit code, wall seconds, peak RSS of the script process in MB or None if not measurable)
+    """
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen([sys.executable, "-u"] + command, cwd=SCRIPTS_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            peak_rss_mb = round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        else:
+            process.wait()
+            peak_rss_mb = None
+    return process.returncode, round(time.perf_counter() - started, 3), peak_rss_mb
+
+
+def run_scenario(emulator, env: dict, scenario: str, environment_names: list, work_dir: str):
+    """
+    Runs the scripts of a scenario one after another and yields a measurement per run.
+
+    Emulator statistics are reset before every run, so the API calls of a measurement belong to that run only.
+
+    Yields:
+        dict: 'run', 'exit_code', 'wall_seconds', 'peak_rss_mb', 'api_calls', 'api_writes', 'api_throttled',
+            'api_calls_by_endpoint', 'cli_calls', 'cli_calls_by_verb' and 'log_path'.
+    """
+    if scenario == "gitsync":
+        # Simulate a new commit so git sync has changes to pull
+        emulator.handle("POST", "/_emulator/push", body={})
+
+    for index, (name, command) in enumerate(get_scenario_runs(scenario, environment_names, work_dir)):
+        emulator.handle("POST", "/_emulator/stats/reset")
+        report_path = os.path.join(work_dir, f"{scenario}_{index}.report.json")
+        log_path = os.path.join(work_dir, f"{scenario}_{index}.log")
+        if os.path.isfile(report_path):
+            os.remove(report_path)
+
+        exit_code, wall_seconds, peak_rss_mb = run_script(command, {**env, "FABRICOPS_REPORT": report_path}, log_path)
+        _, stats, _ = emulator.handle("GET", "/_emulator/stats")
+        report = misc.load_json(report_path) if os.path.isfile(report_path) else {}
+        by_endpoint = dict(sorted(stats.get("by_endpoint", {}).items()))
+
+        yield {
+            "run": name,
+            "exit_code": exit_code,
+            "wall_seconds": wall_seconds,
+            "peak_rss_mb": peak_rss_mb,
+            "api_calls": stats.get("requests"),
+            "api_writes": sum(count for endpoint, count in by_endpoint.items() if not endpoint.startswith("GET ")),
+            "api_throttled": stats.get("throttled"),
+            "api_calls_by_endpoint": by_endpoint,
+            "cli_calls": (report.get("calls") or {}).get("total"),
+            "cli_calls_by_verb": (report.get("calls") or {}).get("by_verb"),
+            "log_path": log_path,
+        }
@@ -0,0 +1,91 @@
+#---------------------------------------------------------
+# Cold start measurement
+# Measures how long the entry scripts take from process start until their
+# arguments are parsed (interpreter start and module imports) by running
+# them with --help, and lists the packages that take longest to import.
+# Fabric CLI configuration and login are part of the startup in the
+# performance reports of the scripts (--report).
+#
+# Usage:
+#   python automation/benchmarks/measure_startup.py
+#   python automation/benchmarks/measure_startup.py --scripts fabric_release.py --runs 10
+#---------------------------------------------------------
+import sys, io, time, argparse, statistics, subprocess
+import harness
+import modules.misc_functions as misc
+
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+DEFAULT_SCRIPTS = [
+    "fabric_setup.py",
+    "fabric_release.py",
+    "fabric_gitsync_env.py",
+    "fabric_feature_maintainance.py",
+    "utils_build_parameter_file.py",
+    "utils_build_parameter_file_dynamic.py",
+    "utils_rebind_connections.py",
+]
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Cold start measurement arguments")
+parser.add_argument("--scripts", required=False, default=",".join(DEFAULT_SCRIPTS), help="Comma separated list of scripts in the scripts folder. Default is the entry scripts.")
+parser.add_argument("--runs", required=False, default=5, type=int, help="Runs per script. The median is reported. Default is 5.")
+parser.add_argument("--top_imports", required=False, default=3, type=int, help="Number of slowest imported packages listed per script. Default is 3.")
+
+args = parser.parse_args()
+
+
+def get_import_times(command: list) -> dict:
+    """
+    Runs a command with -X importtime and returns the import time per top level package in seconds. The time of a
+    package is the cumulative time of its outermost import, so it includes the packages it imports.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command, cwd=harness.SCRIPTS_DIR, capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        package = parts[2].strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(parts[1]) / 1e6)
+    return packages
+
+
+def measure(command: list) -> tuple:
+    """Returns the median seconds of a Python command over --runs runs and the exit code of the last run."""
+    durations = []
+    exit_code = 0
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        exit_code = subprocess.run([sys.executable] + command, cwd=harness.SCRIPTS_DIR, capture_output=True).returncode
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), exit_code
+
+
+misc.print_header("Cold start")
+interpreter_seconds, _ = measure(["-c", "pass"])
+# Packages imported by every interpreter (site, encodings, ...) are not attributed to the scripts
+interpreter_packages = get_import_times(["-c", "pass"])
+misc.print_info(f"Interpreter start without imports: {interpreter_seconds:.3f}s (median of {args.runs} runs)")
+
+rows = []
+failed = []
+for script in [script.strip() for script in args.scripts.split(",") if script.strip()]:
+    seconds, exit_code = measure([script, "--help"])
+    if exit_code:
+        failed.append(script)
+        rows.append((script, "", "", f"✖ exit code {exit_code}"))
+        continue
+    packages = {package: package_seconds for package, package_seconds in get_import_times([script, "--help"]).items() if package not in interpreter_packages and package != "__main__"}
+    slowest = sorted(packages.items(), key=lambda package: package[1], reverse=True)[:args.top_imports]
+    rows.append((script, f"{seconds:.3f}s", f"{seconds - interpreter_seconds:.3f}s", ", ".join(f"{package} {package_seconds:.3f}s" for package, package_seconds in slowest)))
+
+print("")
+misc.print_table(["Script", "Cold start", "Above interpreter", "Slowest imports"], rows)
+print("")
+
+if failed:
+    misc.print_error(f"{len(failed)} script(s) failed to start: {', '.join(failed)}", bold=True)
+    sys.exit(1)
+misc.print_success(f"Cold start of {len(rows)} script(s) measured.", bold=True)
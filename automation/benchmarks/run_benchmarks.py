@@ -0,0 +1,125 @@
+#---------------------------------------------------------
+# Scaling benchmarks
+# Generates synthetic environments at several scales, runs fabric_setup.py,
+# the parameter file builders, the release binding step and git sync against
+# the local Fabric API emulator and records wall time, peak RSS and API call
+# counts of every run to a JSON lines history file.
+#
+# Usage:
+#   python automation/benchmarks/run_benchmarks.py --scales small,medium
+#   python automation/benchmarks/run_benchmarks.py --layers 10 --items 500 --environments 3
+#---------------------------------------------------------
+import os, sys, io, json, argparse, tempfile, platform
+from datetime import datetime, timezone
+import harness
+import synthetic
+import modules.misc_functions as misc
+
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+# Scales as (layers, items, environments)
+SCALES = {
+    "small": (3, 10, 3),
+    "medium": (10, 500, 3),
+    "large": (50, 5000, 10),
+}
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Scaling benchmark arguments")
+parser.add_argument("--scales", required=False, default="small", help=f"Comma separated list of scales to run ({', '.join(SCALES)}). Default is small. Ignored if --layers is given.")
+parser.add_argument("--layers", required=False, type=int, help="Number of layers of a custom scale.")
+parser.add_argument("--items", required=False, default=100, type=int, help="Number of solution items of a custom scale. Default is 100.")
+parser.add_argument("--environments", required=False, default=3, type=int, help="Number of environments of a custom scale. Default is 3.")
+parser.add_argument("--scenarios", required=False, default=",".join(harness.SCENARIOS), help=f"Comma separated list of scenarios to run. Default is all: {', '.join(harness.SCENARIOS)}.")
+parser.add_argument("--latency_ms", required=False, default=0, type=float, help="Latency the emulator adds to every request in milliseconds. Default is 0.")
+parser.add_argument("--lro_seconds", required=False, default=0, type=float, help="Duration of emulated long running operations in seconds. Default is 0.")
+parser.add_argument("--history", required=False, default=os.path.join(harness.BENCHMARKS_DIR, "history.jsonl"), help="JSON lines file the results are appended to. Default is benchmarks/history.jsonl.")
+parser.add_argument("--work_dir", required=False, help="Folder for the synthetic environments and logs. Defaults to a temporary folder.")
+parser.add_argument("--keep_logs", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Keep the output of the runs in the work folder.")
+
+args = parser.parse_args()
+
+if args.layers:
+    scales = {f"custom-{args.layers}x{args.items}x{args.environments}": (args.layers, args.items, args.environments)}
+else:
+    unknown = [scale for scale in args.scales.split(",") if scale.strip() not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+    scales = {scale.strip(): SCALES[scale.strip()] for scale in args.scales.split(",")}
+
+scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="fabricops_benchmarks_"))
+
+misc.print_header("Scaling benchmarks")
+misc.print_info(f"Work folder: {work_dir}")
+misc.print_info(f"History: {args.history}")
+
+git_commit = harness.get_git_commit()
+results = []
+failed = 0
+
+for scale, (layers, items, environments) in scales.items():
+    misc.print_subheader(f"Scale {scale}: {layers} layer(s), {items} item(s), {environments} environment(s)")
+
+    scale_dir = os.path.join(work_dir, scale)
+    paths = synthetic.generate(scale_dir, layers, items, environments)
+    logs_dir = os.path.join(scale_dir, "logs")
+    os.makedirs(logs_dir)
+
+    # One emulator per scale, updating workspaces from the synthetic solution tree
+    emulator, server, env = harness.start_emulator(paths, {"latency_ms": args.latency_ms, "lro_seconds": args.lro_seconds})
+
+    try:
+        for scenario in scenarios:
+            for measurement in harness.run_scenario(emulator, env, scenario, paths.get("environment_names"), logs_dir):
+                log_path = measurement.pop("log_path")
+                result = {
+                    "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "git_commit": git_commit,
+                    "python": platform.python_version(),
+                    "platform": sys.platform,
+                    "scale": scale,
+                    "layers": layers,
+                    "items": items,
+                    "environments": environments,
+                    "scenario": scenario,
+                    **measurement,
+                }
+                results.append(result)
+                with open(args.history, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(result) + "\n")
+
+                if result.get("exit_code"):
+                    failed += 1
+                    misc.print_error(f"{result.get('run')} failed with exit code {result.get('exit_code')}. Output: {log_path}")
+                else:
+                    misc.print_success(f"{result.get('run')}: {result.get('wall_seconds'):.2f}s, {result.get('api_calls')} API call(s)")
+                    if not args.keep_logs:
+                        os.remove(log_path)
+    finally:
+        server.shutdown()
+
+print("")
+misc.print_table(
+    ["Scale", "Run", "Wall time", "Peak RSS", "API calls", "CLI calls", "Exit code"],
+    [
+        (
+            result.get("scale"),
+            result.get("run"),
+            f"{result.get('wall_seconds'):.2f}s",
+            f"{result.get('peak_rss_mb')} MB" if result.get("peak_rss_mb") is not None else "-",
+            result.get("api_calls"),
+            result.get("cli_calls") if result.get("cli_calls") is not None else "-",
+            result.get("exit_code"),
+        )
+        for result in results
+    ],
+)
+print("")
+
+if failed:
+    misc.print_error(f"{failed} run(s) failed.", bold=True)
+    sys.exit(1)
+
+misc.print_success(f"{len(results)} run(s) appended to {args.history}.", bold=True)
@@ -0,0 +1,167 @@
+#---------------------------------------------------------
+# Synthetic environments for the benchmarks
+# Generates infrastructure*.json files, a parameters folder and a solution
+# tree of <name>.<type> item folders at a given scale. The scripts are pointed
+# at the generated folders through FABRICOPS_ENVIRONMENTS_DIR,
+# FABRICOPS_PARAMETERS_DIR and FABRICOPS_SOLUTION_DIR.
+#---------------------------------------------------------
+import os, json, shutil
+
+RESOURCES_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources"))
+
+SOLUTION_NAME = "BENCH"
+CAPACITY_NAME = "emulator"
+ADMIN_GROUP_ID = "00000000-0000-0000-0000-000000000000"
+GIT_CONNECTION_NAME = "BENCH-GitHub"
+
+# Item types of the solution tree, assigned round robin. Lakehouses are created by fabric_setup.py instead.
+SOLUTION_ITEM_TYPES = ["Notebook", "DataPipeline", "SemanticModel", "Report"]
+
+
+def get_layer_names(layers: int) -> list:
+    """Returns the names of the synthetic layers, e.g. ['Layer01', 'Layer02', 'Layer03']."""
+    return [f"Layer{index:0{max(2, len(str(layers)))}d}" for index in range(1, layers + 1)]
+
+
+def get_environment_names(environments: int) -> list:
+    """Returns the names of the synthetic environments. The first three are dev, tst and prd, followed by e04, e05, ..."""
+    names = ["dev", "tst", "prd"][:environments]
+    return names + [f"e{index:02d}" for index in range(len(names) + 1, environments + 1)]
+
+
+def build_infrastructure(layers: int, lakehouses: int = 1) -> dict:
+    """Returns the main infrastructure.json with lakehouses per layer. The first lakehouse of a layer has a connection."""
+    return {
+        "name": f"{SOLUTION_NAME} - {{layer}} [{{environment}}]",
+        "generic": {
+            "capacity_name": CAPACITY_NAME,
+            "permissions": {"Admin": [{"type": "Group", "id": ADMIN_GROUP_ID}]},
+            "fabric_connections": [
+                {"name": f"{SOLUTION_NAME}-SemanticModel", "type": "PowerBIDatasets", "auth_type": "ServicePrincipal"}
+            ],
+        },
+        "layers": {
+            layer: {
+                "items": {
+                    "Lakehouse": [
+                        {"item_name": f"Lakehouse{layer}", "connection_name": f"{SOLUTION_NAME}-{layer} [{{environment}}]"}
+                    ] + [
+                        {"item_name": f"Lakehouse{layer}_{index:02d}"} for index in range(2, lakehouses + 1)
+                    ]
+                }
+            }
+            for layer in get_layer_names(layers)
+        },
+    }
+
+
+def build_environment(environment: str, layers: int, is_primary: bool) -> dict:
+    """Returns the infrastructure.<environment>.json. The primary environment is connected to git."""
+    generic = {
+        "merge_type": 2,
+        "environment_name": environment,
+        "permissions": {"Admin": [{"type": "Group", "id": ADMIN_GROUP_ID}]},
+    }
+    layer_definitions = {layer: {} for layer in get_layer_names(layers)}
+
+    if is_primary:
+        generic["is_primary"] = True
+        generic["git_settings"] = {
+            "gitProviderDetails": {
+                "gitProviderType": "GitHub",
+                "ownerName": "benchmarks",
+                "repositoryName": "benchmarks",
+                "branchName": "main",
+            },
+            "myGitCredentials": {"source": "ConfiguredConnection", "connection_name": GIT_CONNECTION_NAME},
+        }
+        layer_definitions = {
+            layer: {"git_directoryName": f"solution/{layer.lower()}", "git_synchronize_on_commit": True}
+            for layer in get_layer_names(layers)
+        }
+
+    return {"generic": generic, "layers": {"merge_type": 2, **layer_definitions}}
+
+
+def build_solution_items(layers: int, items: int) -> dict:
+    """Returns {layer: [(item name, item type)]} with the items spread round robin over the layers."""
+    layer_names = get_layer_names(layers)
+    solution_items = {layer: [] for layer in layer_names}
+    for index in range(items):
+        item_type = SOLUTION_ITEM_TYPES[index % len(SOLUTION_ITEM_TYPES)]
+        solution_items[layer_names[index % len(layer_names)]].append((f"Item{index + 1:05d}", item_type))
+    return solution_items
+
+
+def build_bindings(layers: int, solution_items: dict) -> dict:
+    """Returns the sqlendpoint_model_binding.yml content binding the semantic models of each layer to its lakehouse."""
+    bindings = []
+    for layer in get_layer_names(layers):
+        semantic_models = [name for name, item_type in solution_items.get(layer, []) if item_type == "SemanticModel"]
+        if semantic_models:
+            bindings.append({
+                "lakehouse_name": f"Lakehouse{layer}",
+                "lakehouse_ws_layer": layer,
+                "semantic_model_layer": layer,
+                "semantic_models": semantic_models,
+            })
+    return {"semantic_model_sqlendpoint_binding": bindings}
+
+
+def write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def generate(root: str, layers: int, items: int, environments: int, lakehouses: int = 1) -> dict:
+    """
+    Writes a synthetic environment into root, replacing an existing one.
+
+    Layout:
+        <root>/environments/infrastructure.json and infrastructure.<environment>.json
+        <root>/parameters/parameter.yml (copy of resources/parameters) and sqlendpoint_model_binding.yml
+        <root>/solution/<layer>/<name>.<type>/.platform
+
+    Args:
+        root (str): Folder to write to.
+        layers (int): Number of layers (workspaces per environment).
+        items (int): Number of items in the solution tree.
+        environments (int): Number of environments. The first one (dev) is the primary environment connected to git.
+        lakehouses (int): Number of lakehouses created by fabric_setup.py per layer. Default is 1.
+
+    Returns:
+        dict: Folders of the generated files ('root', 'environments', 'parameters', 'solution') and the environment names.
+    """
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+
+    paths = {
+        "root": root,
+        "environments": os.path.join(root, "environments"),
+        "parameters": os.path.join(root, "parameters"),
+        "solution": os.path.join(root, "solution"),
+    }
+    for folder in ("environments", "parameters", "solution"):
+        os.makedirs(paths[folder])
+
+    environment_names = get_environment_names(environments)
+    write_json(os.path.join(paths["environments"], "infrastructure.json"), build_infrastructure(layers, lakehouses))
+    for index, environment in enumerate(environment_names):
+        write_json(os.path.join(paths["environments"], f"infrastructure.{environment}.json"), build_environment(environment, layers, index == 0))
+
+    solution_items = build_solution_items(layers, items)
+    for layer, layer_items in solution_items.items():
+        layer_path = os.path.join(paths["solution"], layer.lower())
+        os.makedirs(layer_path)
+        for name, item_type in layer_items:
+            item_path = os.path.join(layer_path, f"{name}.{item_type}")
+            os.makedirs(item_path)
+            write_json(os.path.join(item_path, ".platform"), {"metadata": {"type": item_type, "displayName": name}})
+
+    shutil.copyfile(os.path.join(RESOURCES_DIR, "parameters", "parameter.yml"), os.path.join(paths["parameters"], "parameter.yml"))
+    # JSON is valid YAML, so the bindings need no YAML writer
+    write_json(os.path.join(paths["parameters"], "sqlendpoint_model_binding.yml"), build_bindings(layers, solution_items))
+
+    paths["environment_names"] = environment_names
+    paths["layer_names"] = get_layer_names(layers)
+    return paths
@@ -1,31 +1,53 @@
-import os, argparse, json
+import os, sys, atexit, re, argparse, json, copy, time, uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.report_functions as perfreport
+import modules.gitsync_functions as gitsync
+import modules.seed_functions as seed
+import modules.github_functions as github
+import modules.ado_functions as ado
 
 default_branch_name = os.environ.get('GITHUB_REF_NAME') if os.environ.get('GITHUB_REF_NAME') else os.environ.get('BUILD_SOURCEBRANCH').removeprefix("refs/heads/") if os.environ.get('BUILD_SOURCEBRANCH') else None
 
+# Report throttling of Fabric calls at the end of the run
+atexit.register(fabcli.print_throttle_summary)
+
 # Get arguments 
 parser = argparse.ArgumentParser(description="Fabric feature maintainance arguments")
 parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
 parser.add_argument("--branch_name", required=False, default=default_branch_name, help="The name of the Git feature branch to operate on. Used for workspace setup, automation, and CI/CD logic. Defaults to a predefined variable `branch_name`.")
-parser.add_argument("--action", required=False, default="create", help="Action to perform: `create` to set up a new feature branch and workspace, `update` to synchronize repos and workspaces, `delete` to clean up. Default is `create`.")
+parser.add_argument("--action", required=False, default="create", help="Action to perform: `create` to set up a new feature branch and workspace, `update` to synchronize repos and workspaces, `delete` to clean up, `pool_refill` to top up the warm pool of pre-provisioned workspaces, `gc` to remove feature workspaces of branches that no longer exist. Default is `create`.")
+parser.add_argument("--dry_run", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Only report the feature workspaces the `gc` action would remove.")
+parser.add_argument("--github_pat", required=False, default=os.environ.get('GITHUB_PAT') or os.environ.get('GITHUB_TOKEN'), help="GitHub token used by the `gc` action to list branches. Defaults to the GITHUB_PAT or GITHUB_TOKEN environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--report", required=False, default=os.environ.get('FABRICOPS_REPORT'), help="Writes a performance report (wall time per phase, call counts, latency percentiles, sleep time and retries) to this file or folder. Compare reports with utils_compare_perf_reports.py. Defaults to the FABRICOPS_REPORT environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+perfreport.start(args.report, action=args.action, branch=args.branch_name)
 tenant_id = args.tenant_id
 client_id = args.client_id
 client_secret = args.client_secret
 branch_name = args.branch_name
 action = args.action
+dry_run = args.dry_run
 
-feature_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/feature.json'))
+feature_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'feature.json'))
 layers = feature_json.get("layers")
 permissions = feature_json.get("permissions")
 capacity_name = feature_json.get("capacity_name")
 feature_name = feature_json.get("feature_name")
 git_settings = feature_json.get("git_settings")
-branch_name_trimmed = branch_name.replace("feature/", "").replace("/feature", "")
+warm_pool = feature_json.get("warm_pool") or {}
+warm_pool_size = int(warm_pool.get("size", 0))
+branch_name_trimmed = branch_name.replace("feature/", "").replace("/feature", "") if branch_name else ""
 
 # Filter layers based on branch name
 def filter_layers_by_branch(layers, branch_name_trimmed):
@@ -55,121 +77,335 @@ def filter_layers_by_branch(layers, branch_name_trimmed):
 
 layers = filter_layers_by_branch(layers, branch_name_trimmed)
 
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(client_id, client_secret, tenant_id)
+
+def resolve_git_connection_id(git_settings):
+    """Resolves the ID of the git connection configured in feature.json (by ID or by name template)."""
+    connection_id = None
+    if git_settings.get("myGitCredentials").get("connectionId"):
+        if fabcli.connection_exists(git_settings.get("myGitCredentials").get("connectionId")):
+            connection_id = git_settings.get("myGitCredentials").get("connectionId")
+
+    if git_settings.get("myGitCredentials").get("connection_name"):
+        if git_settings.get('gitProviderDetails').get('gitProviderType').lower() == "github":
+            identity_username = os.environ.get('GITHUB_ACTOR')
+            identity_id =  os.environ.get("GITHUB_ACTOR_ID")
+        else:
+            identity_username = os.getenv("BUILD_REQUESTEDFOREMAIL").split("@")[0].upper() if os.getenv("BUILD_REQUESTEDFOREMAIL") else None
+            identity_id = os.getenv("BUILD_REQUESTEDFORID")
+
+        connection_name = git_settings.get("myGitCredentials").get("connection_name").format(identity_id=identity_id, identity_username=identity_username)
+
+        if fabcli.connection_exists(connection_name):
+            connection_id = fabcli.run_command(f"get .connections/{connection_name}.Connection -q id -f")
+
+    return connection_id
+
+
+def prepare_workspace(workspace_name, layer_definition, log):
+    """Creates a workspace on the feature capacity and applies permissions and spark settings of the layer."""
+    workspace_name_escaped = workspace_name.replace("/", "\\/")
+    fabcli.run_command(f"create '{workspace_name_escaped}.Workspace' -P capacityname={capacity_name}")
+    workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+    if not fabcli.is_guid(workspace_id):
+        raise RuntimeError(f"Workspace '{workspace_name}' could not be created.")
+    log(misc.print_success, "Workspace created ✔")
+
+    if permissions:
+        for permission, definitions in permissions.items():
+            for definition in definitions:
+                fabcli.run_command(f"acl set '{workspace_name_escaped}.Workspace' -I {definition.get("id")} -R {permission.lower()} -f")
+        log(misc.print_info, "  • Workspace permissions assigned ✔")
+
+    if layer_definition.get("spark_settings"):
+        response = fabcli.update_workspace_spark_settings(workspace_id, layer_definition.get("spark_settings"))
+        if response.get("status_code") == 200:
+            log(misc.print_info, "  • Workspace spark settings set ✔")
+        else:
+            log(misc.print_warning, f"  • Setting workspace spark settings returned status code {response.get('status_code')} ⚠")
+
+    return workspace_id
+
+
+# Folder created in a warm pool workspace while a pipeline claims it
+POOL_CLAIM_FOLDER = "~claim"
+
+
+def get_pool_workspaces(layers, workspace_ids):
+    """Returns the warm pool workspaces per layer (name -> id) found in a workspace listing."""
+    pattern = warm_pool.get("workspace_name", "~pool-{pool_id} ({layer_name})")
+    pool_workspaces = {}
+    for layer in layers:
+        name_regex = re.compile("^" + re.escape(pattern).replace(re.escape("{pool_id}"), "[0-9a-f]{8}").replace(re.escape("{layer_name}"), re.escape(layer)) + "$")
+        pool_workspaces[layer] = {name: workspace_id for name, workspace_id in workspace_ids.items() if name_regex.match(name)}
+    return pool_workspaces
+
+
+def claim_pool_workspace(layer, workspace_name, layer_pool_workspaces):
+    """
+    Claims a warm pool workspace by renaming it to the feature workspace name. A claim folder created in the pool
+    workspace is the lock: folder names are unique, so only one pipeline can create it. The lock holder checks that
+    the workspace still has its pool name and renames it before the folder is removed again, so a pipeline getting
+    the lock later finds the workspace renamed and moves on to the next one.
+    """
+    for pool_workspace_name, workspace_id in layer_pool_workspaces.items():
+        response = fabcli.create_folder(workspace_id, POOL_CLAIM_FOLDER)
+        if response.get("status_code") not in (200, 201):
+            continue  # Claimed by a concurrent pipeline
+        try:
+            if (fabcli.get_workspace(workspace_id) or {}).get("displayName") != pool_workspace_name:
+                continue
+            if fabcli.rename_workspace(workspace_id, workspace_name).get("status_code") == 200:
+                return workspace_id
+        finally:
+            fabcli.delete_folder(workspace_id, (response.get("text") or {}).get("id"))
+    return None
+
+
+def refill_warm_pool(layers):
+    """
+    Creates pre-provisioned workspaces until each layer has warm_pool.size workspaces in the pool.
+
+    Returns:
+        int: Number of pool workspaces that could not be created.
+    """
+    pattern = warm_pool.get("workspace_name", "~pool-{pool_id} ({layer_name})")
+    pool_workspaces = get_pool_workspaces(layers, fabcli.get_workspace_ids())
+
+    missing = [(layer, layer_definition) for layer, layer_definition in layers.items() for _ in range(warm_pool_size - len(pool_workspaces.get(layer)))]
+    if not missing:
+        misc.print_info("Warm pool is full.")
+        return 0
+
+    def create_pool_workspace(layer, layer_definition):
+        pool_workspace_name = pattern.format(pool_id=uuid.uuid4().hex[:8], layer_name=layer)
+        prepare_workspace(pool_workspace_name, layer_definition, lambda print_function, message: print_function(f"[{pool_workspace_name}] {message}"))
+
+    created = 0
+    with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+        for future in as_completed([executor.submit(create_pool_workspace, layer, layer_definition) for layer, layer_definition in missing]):
+            try:
+                future.result()
+                created += 1
+            except Exception as e:
+                misc.print_error(f"Creating warm pool workspace failed: {e}")
+
+    failed = len(missing) - created
+    if failed:
+        misc.print_error(f"Warm pool refilled with {created} workspace(s), {failed} workspace(s) could not be created.")
+    else:
+        misc.print_success(f"Warm pool refilled with {created} workspace(s).")
+    return failed
+
+
+def seed_feature_workspace(layer, seed_environment, workspace_id, log):
+    """Seeds a feature workspace with the items of the layer's workspace in the given environment (e.g. dev)."""
+    infrastructure_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+    source_workspace_name = infrastructure_json.get("name").format(layer=layer, environment=seed_environment)
+    source_workspace_name_escaped = source_workspace_name.replace("/", "\\/")
+    source_workspace_id = fabcli.run_command(f"get '{source_workspace_name_escaped}.Workspace' -q id -f").strip()
+
+    if not fabcli.is_guid(source_workspace_id):
+        log(misc.print_warning, f"  • Seed workspace {source_workspace_name} not found. Falling back to git initialization ⚠")
+        return False
+
+    if seed.seed_workspace(source_workspace_id, workspace_id, log=lambda message: log(misc.print_warning, f"  • Seeding {message} ⚠")):
+        log(misc.print_info, f"  • Workspace seeded from {source_workspace_name} ✔")
+        return True
+
+    log(misc.print_warning, "  • Seeding failed. Falling back to git initialization ⚠")
+    return False
+
+
+def get_feature_short_name(branch):
+    """Returns the feature name used in workspace names for a branch, matching the create action."""
+    return branch.removeprefix("refs/heads/").replace("feature/", "").replace("/feature", "").split("/")[-1]
+
+
+def list_live_branches():
+    """Lists all branches of the repository configured in feature.json through the git provider API."""
+    provider_details = git_settings.get("gitProviderDetails")
+    if provider_details.get("gitProviderType").lower() == "github":
+        return github.list_branches(provider_details.get("ownerName"), provider_details.get("repositoryName"), args.github_pat)
+    return ado.list_branches(
+        provider_details.get("organizationName"),
+        provider_details.get("projectName"),
+        provider_details.get("repositoryName"),
+        tenant_id=tenant_id,
+        client_id=client_id,
+        client_secret=client_secret,
+    )
+
+
+def find_orphaned_feature_workspaces(all_layers, workspace_ids, live_branches):
+    """Returns all feature workspaces (name -> feature name) whose feature name has no live branch."""
+    live_features = {get_feature_short_name(branch) for branch in live_branches}
+    orphans = {}
+    for layer in all_layers:
+        name_regex = re.compile("^" + re.escape(feature_name).replace(re.escape("{feature_name}"), "(?P<feature>.+)").replace(re.escape("{layer_name}"), re.escape(layer)) + "$")
+        for workspace_name in workspace_ids:
+            match = name_regex.match(workspace_name)
+            if match and match.group("feature") not in live_features:
+                orphans[workspace_name] = match.group("feature")
+    return orphans
+
+
+def provision_feature_workspace(layer, layer_definition, git_connection_id, pool_workspaces):
+    """
+    Creates (or synchronizes) the feature workspace of one layer. Runs concurrently for all layers, so all
+    output is printed as complete lines prefixed with the workspace name.
+    """
+    # Extract only the last part of the branch name after the last /
+    feature_name_short = branch_name_trimmed.split("/")[-1]
+    workspace_name = feature_name.format(feature_name=feature_name_short, layer_name=layer)
+    workspace_name_escaped = workspace_name.replace("/", "\\/")
+
+    def log(print_function, message):
+        print_function(f"[{workspace_name}] {message}")
+
+    if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace").replace("*", "").strip().lower() == "false":
+        workspace_id = claim_pool_workspace(layer, workspace_name, pool_workspaces.get(layer) or {}) if warm_pool_size else None
+        if workspace_id:
+            log(misc.print_success, "Pre-provisioned workspace claimed from warm pool ✔")
+        else:
+            workspace_id = prepare_workspace(workspace_name, layer_definition, log)
+
+        # Seed workspaces that are disconnected from git anyway by copying item definitions, fall back to git init on failure
+        seeded = False
+        if layer_definition.get("git_disconnect_after_initialize", False) and layer_definition.get("seed_from_environment"):
+            seeded = seed_feature_workspace(layer, layer_definition.get("seed_from_environment"), workspace_id, log)
+
+        if git_settings and not seeded:
+            if git_connection_id:
+                # Each layer gets its own copy, as branch and directory differ per layer
+                layer_git_settings = copy.deepcopy(git_settings)
+                layer_git_settings["myGitCredentials"].pop("connection_name", None) # Remove connection name
+                layer_git_settings["myGitCredentials"]["connectionId"] = git_connection_id # Add connection id required by Fabric REST API
+                layer_git_settings["gitProviderDetails"]["branchName"] = branch_name
+                layer_git_settings["gitProviderDetails"]["directoryName"] = layer_definition.get("git_directoryName")
+
+                connect_response = fabcli.connect_workspace_to_git(workspace_id, layer_git_settings)
+                if connect_response:
+                    init_response = fabcli.initialize_git_connection(workspace_id)
+                    if init_response and init_response.get("requiredAction") != "None" and init_response.get("remoteCommitHash"):
+                        fabcli.update_workspace_from_git(workspace_id, init_response.get("remoteCommitHash"))
+
+                    log(misc.print_info, f"  • Git integration set up ({git_settings.get('gitProviderDetails').get('gitProviderType')}) ✔")
+
+                    # Disconnect from Git if specified
+                    if layer_definition.get("git_disconnect_after_initialize", False):
+                        fabcli.disconnect_git_connection(workspace_id)
+                        log(misc.print_info, "  • Workspace disconnected from git ✔")
+                else:
+                    log(misc.print_error, "  • Git integration failed! Please verify connection and tenant settings. ✖")
+            else:
+                log(misc.print_error, "  • Connection not found. Skipping Git integration setup.")
+
+    else: # Support workspace synchronization on commit for existing workspaces
+        log(misc.print_info, "Already exist. Feature workspace creation skipped!")
+        if layer_definition.get("git_synchronize_on_commit", False) and not layer_definition.get("git_disconnect_after_initialize", False):
+            result = gitsync.sync_workspaces([workspace_name], skip_without_changes=False)[0]
+            if result.get("status") == "failed":
+                log(misc.print_error, f"  • Synchronizing with latest changes from Git failed: {result.get('message')} ✖")
+            elif result.get("status") == "updated":
+                log(misc.print_success, "  • Synchronized with latest changes from Git ✔")
+            else:
+                log(misc.print_warning, f"  • {result.get('message')} ⚠")
+
 
 if action == "create":
     misc.print_header(f"Setting up feature development workspaces")
-    for layer, layer_definition in layers.items():
-            # Extract only the last part of the branch name after the last /
-            feature_name_short = branch_name_trimmed.split("/")[-1]
-            workspace_name = feature_name.format(feature_name=feature_name_short, layer_name=layer)
-            workspace_name_escaped = workspace_name.replace("/", "\\/")
-
-            if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace").replace("*", "").strip().lower() == "false":
-                misc.print_info(f"Creating workspace '{workspace_name}'...", bold=True, end="")
-                fabcli.run_command(f"create '{workspace_name_escaped}.Workspace' -P capacityname={capacity_name}")
-                workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
-                misc.print_success(" ✔", bold=True)
-
-                if permissions:
-                    misc.print_info(f"  • Assigning workspace permissions...", end="")
-                    for permission, definitions in permissions.items():
-                        for definition in definitions:
-                            fabcli.run_command(f"acl set '{workspace_name_escaped}.Workspace' -I {definition.get("id")} -R {permission.lower()} -f")
-                    misc.print_success(" ✔")
-
-                if layer_definition.get("spark_settings"):
-                    misc.print_info(f"  • Set workspace spark settings... ", end="")
-                    spark_settings = misc.flatten_dict(layer_definition.get("spark_settings"))
-                    for key, value in spark_settings:
-                        fabcli.run_command(f"set '{workspace_name_escaped}.Workspace' -q sparkSettings.{key} -i {value} -f")
-                    misc.print_success(" ✔")
-
-                if git_settings:
-                    connection_id = None
-                    misc.print_info(f"  • Setting up Git integration ({git_settings.get('gitProviderDetails').get('gitProviderType')})...", end="")
-                    
-                    if git_settings.get("myGitCredentials").get("connectionId"):
-                        if fabcli.connection_exists(git_settings.get("myGitCredentials").get("connectionId")):
-                            connection_id = git_settings.get("myGitCredentials").get("connectionId")
-
-                    if git_settings.get("myGitCredentials").get("connection_name"):
-                        if git_settings.get('gitProviderDetails').get('gitProviderType').lower() == "github":
-                            identity_username = os.environ.get('GITHUB_ACTOR')
-                            identity_id =  os.environ.get("GITHUB_ACTOR_ID")
-                        else:
-                            identity_username = os.getenv("BUILD_REQUESTEDFOREMAIL").split("@")[0].upper() if os.getenv("BUILD_REQUESTEDFOREMAIL") else None
-                            identity_id = os.getenv("BUILD_REQUESTEDFORID")
-
-                        connection_name = git_settings.get("myGitCredentials").get("connection_name").format(identity_id=identity_id, identity_username=identity_username)
-                        
-                        if fabcli.connection_exists(connection_name):
-                            connection_id = fabcli.run_command(f"get .connections/{connection_name}.Connection -q id -f")
-                            git_settings["myGitCredentials"].pop("connection_name", None) # Remove connection name
-                            git_settings["myGitCredentials"]["connectionId"] = connection_id # Add connection id required by Fabric REST API
-                        
-                    if connection_id:
-                        git_settings["gitProviderDetails"]["branchName"] = branch_name
-                        git_settings["gitProviderDetails"]["directoryName"] = layer_definition.get("git_directoryName")
-                        
-                        connect_response = fabcli.connect_workspace_to_git(workspace_id, git_settings)
-                        if connect_response:                            
-                            init_response = fabcli.initialize_git_connection(workspace_id)
-                            if init_response and init_response.get("requiredAction") != "None" and init_response.get("remoteCommitHash"):
-                                fabcli.update_workspace_from_git(workspace_id, init_response.get("remoteCommitHash"))
-                            
-                            misc.print_success(" ✔")
-
-                            # Disconnect from Git if specified
-                            if layer_definition.get("git_disconnect_after_initialize", False):
-                                misc.print_info(f"  • Disconnect workspace from git...", end="")
-                                fabcli.disconnect_git_connection(workspace_id)
-                                misc.print_success(" ✔")
-                        else:
-                            misc.print_error(f" ✖ Failed! Please verify connection and tenant settings.")
-                    else:
-                        misc.print_error(f"Connection not found. Skipping Git integration setup.")
-                        
-            else: # Support workspace synchronization on commit for existing workspaces
-                misc.print_info(f"{workspace_name} already exist. Feature workspace creation skipped!", bold=True)
-                if layer_definition.get("git_synchronize_on_commit", False) and not layer_definition.get("git_disconnect_after_initialize", False):
-                    misc.print_info(f"  • Synchronizing workspace {workspace_name_escaped} with latest changes from Git...", end="")
-                    workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
-                    
-                    git_status = fabcli.get_git_status(workspace_id)
-
-                    if git_status and git_status.get("workspaceHead") == git_status.get("remoteCommitHash"):
-                        misc.print_warning(" ⚠ Already up to date.")
-                        continue
-                    else:
-                        try:
-                            fabcli.update_workspace_from_git(workspace_id, git_status.get("remoteCommitHash"))
-                            misc.print_success(" ✔")
-                        except:
-                            misc.print_error(" ✖ Failed!")
-            print ("")
-    misc.print_success(f"Feature development workspace setup completed!",bold = True)
+
+    git_connection_id = resolve_git_connection_id(git_settings) if git_settings else None
+    pool_workspaces = get_pool_workspaces(layers, fabcli.get_workspace_ids()) if warm_pool_size else {}
+
+    # Provision the workspaces of all layers in parallel
+    failed_layers = []
+    with ThreadPoolExecutor(max_workers=max(1, len(layers))) as executor:
+        futures = {executor.submit(provision_feature_workspace, layer, layer_definition, git_connection_id, pool_workspaces): layer for layer, layer_definition in layers.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                misc.print_error(f"[{futures[future]}] Feature workspace setup failed: {e}")
+                failed_layers.append(futures[future])
+
+    print ("")
+    if failed_layers:
+        misc.print_error(f"Feature development workspace setup failed for layer(s): {', '.join(sorted(failed_layers))}!", bold = True)
+    else:
+        misc.print_success(f"Feature development workspace setup completed!",bold = True)
+
+    # Top up the warm pool once the feature workspaces are ready, so the refill does not delay the feature setup
+    if warm_pool_size:
+        print ("")
+        misc.print_info("Refilling warm pool...", bold=True)
+        refill_warm_pool(layers)
+
+    if failed_layers:
+        sys.exit(1)
 elif action == "update": # Support workspace synchronization on commit for existing workspaces in GitHub scenario
     misc.print_header(f"Synchronizing feature development workspaces")
-    for layer, layer_definition in layers.items():
-            feature_name_short = branch_name_trimmed.split("/")[-1]
-            workspace_name = feature_name.format(feature_name=feature_name_short, layer_name=layer)
-            workspace_name_escaped = workspace_name.replace("/", "\\/")
-            if layer_definition.get("git_synchronize_on_commit", False) and not layer_definition.get("git_disconnect_after_initialize", False):
-                misc.print_info(f"Synchronizing workspace {workspace_name_escaped} with latest changes from Git repo...", bold=True, end="")
-                workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
-
-                git_status = fabcli.get_git_status(workspace_id)
-                if git_status and git_status.get("workspaceHead") == git_status.get("remoteCommitHash"):
-                    misc.print_warning(" ⚠ Already up to date.")
-                    continue
-                else:
-                    fabcli.update_workspace_from_git(workspace_id, git_status.get("remoteCommitHash"))
-                    misc.print_success(" ✔")
+    feature_name_short = branch_name_trimmed.split("/")[-1]
+    workspace_names = [
+        feature_name.format(feature_name=feature_name_short, layer_name=layer)
+        for layer, layer_definition in layers.items()
+        if layer_definition.get("git_synchronize_on_commit", False) and not layer_definition.get("git_disconnect_after_initialize", False)
+    ]
 
-            print ("")
+    sync_results = gitsync.sync_workspaces(workspace_names, skip_without_changes=False)
+    gitsync.print_sync_summary(sync_results)
+    print ("")
     misc.print_success(f"Feature development workspace setup completed!",bold = True)
+elif action == "pool_refill":
+    misc.print_header(f"Refilling warm pool of feature development workspaces")
+    if warm_pool_size:
+        if refill_warm_pool(layers):
+            sys.exit(1)
+    else:
+        misc.print_warning("Warm pool is disabled (warm_pool.size in feature.json is 0).")
+elif action == "gc":
+    misc.print_header(f"Removing stale feature development workspaces")
+
+    live_branches = list_live_branches()
+    if not live_branches:
+        misc.print_error("No branches returned by the git provider. Garbage collection aborted!")
+        exit(1)
+
+    workspace_ids = fabcli.get_workspace_ids()
+    orphans = find_orphaned_feature_workspaces(feature_json.get("layers"), workspace_ids, live_branches)
+    misc.print_info(f"{len(live_branches)} live branch(es), {len(orphans)} stale feature workspace(s).")
+
+    def remove_workspace(workspace_name):
+        if dry_run:
+            return "would be removed"
+        status_code = fabcli.delete_resource(f"workspaces/{workspace_ids[workspace_name]}")
+        if status_code == 404:
+            return "already removed"
+        if status_code not in (200, 202, 204):
+            raise RuntimeError(f"status code {status_code}")
+        return "removed"
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {executor.submit(remove_workspace, workspace_name): workspace_name for workspace_name in orphans}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = f"failed: {e}"
+
+    if orphans:
+        print ("")
+        misc.print_table(["Workspace", "Feature", "Outcome"], [(name, orphans[name], results.get(name)) for name in sorted(orphans)])
+
+    failed_orphans = [name for name in orphans if results.get(name, "").startswith("failed")]
+    print ("")
+    if failed_orphans:
+        misc.print_error(f"Garbage collection of feature development workspaces failed for {len(failed_orphans)} workspace(s)!", bold = True)
+        sys.exit(1)
+    misc.print_success(f"Garbage collection of feature development workspaces completed{' (dry run)' if dry_run else ''}!",bold = True)
 elif action == "delete":
     misc.print_header(f"Remove feature development workspaces")
     
@@ -188,5 +424,5 @@ elif action == "delete":
 
     misc.print_success(f"Removal of feature development workspaces completed!",bold = True)
 else:
-    misc.print_error(f"Unknown action '{action}'. Please use 'create', 'delete', or 'merge'.")
+    misc.print_error(f"Unknown action '{action}'. Please use 'create', 'update', 'delete', 'pool_refill' or 'gc'.")
     exit(1)
\ No newline at end of file
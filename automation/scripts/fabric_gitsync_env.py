@@ -1,56 +1,62 @@
-import os, argparse, json
+import os, atexit, sys, argparse, json
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.report_functions as perfreport
+import modules.gitsync_functions as gitsync
 
 default_environment = "dev"
 
+# Report throttling of Fabric calls at the end of the run
+atexit.register(fabcli.print_throttle_summary)
+
 # Get arguments 
 parser = argparse.ArgumentParser(description="Fabric feature maintainance arguments")
 parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
 parser.add_argument("--environment", required=False, default=default_environment, help="The environment to operate on. Defaults to a predefined variable `environment`.")
+parser.add_argument("--max_workers", required=False, default=8, type=int, help="Maximum number of workspaces synchronized in parallel. Default is 8.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--report", required=False, default=os.environ.get('FABRICOPS_REPORT'), help="Writes a performance report (wall time per phase, call counts, latency percentiles, sleep time and retries) to this file or folder. Compare reports with utils_compare_perf_reports.py. Defaults to the FABRICOPS_REPORT environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+perfreport.start(args.report, environment=args.environment)
 tenant_id = args.tenant_id
 client_id = args.client_id
 client_secret = args.client_secret
 environment = args.environment
 
 # Load JSON environment files (main and environment specific) and merge
-main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
 env_definition = misc.merge_json(main_json, env_json)
 
 if env_definition:
     solution_name = env_definition.get("name")
     layers = env_definition.get("layers")
 
-    fabcli.run_command("config set encryption_fallback_enabled true")
-    fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+    fabcli.configure({"encryption_fallback_enabled": "true"})
+    fabcli.login(client_id, client_secret, tenant_id)
 
-    # Perform workspace synchronization for all layers
+    # Perform workspace synchronization for all layers concurrently
     misc.print_header(f"Synchronizing environment workspaces")
-    for layer, layer_definition in layers.items():
-            workspace_name = solution_name.format(layer=layer, environment=environment)
-            workspace_name_escaped = workspace_name.replace("/", "\\/")
-
-            if layer_definition.get("git_synchronize_on_commit", True) and not layer_definition.get("git_disconnect_after_initialize", False):
-                misc.print_info(f"Synchronizing workspace {workspace_name_escaped} with latest changes from Git repo...", bold=True, end="")
-                workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
-
-                git_status = fabcli.get_git_status(workspace_id)
-                if git_status is None:
-                    misc.print_warning(" ⚠ Git synchronization not possible.")
-                    continue
-                elif git_status.get("workspaceHead") == git_status.get("remoteCommitHash"):
-                    misc.print_warning(" ⚠ Already up to date.")
-                    continue
-                elif len(git_status.get("changes")) == 0:
-                    misc.print_warning(" ⚠ No changes detected.")
-                    continue
-                else:
-                    fabcli.update_workspace_from_git(workspace_id, git_status.get("remoteCommitHash"))
-                    misc.print_success(" ✔")
+    workspace_names = [
+        solution_name.format(layer=layer, environment=environment)
+        for layer, layer_definition in layers.items()
+        if layer_definition.get("git_synchronize_on_commit", True) and not layer_definition.get("git_disconnect_after_initialize", False)
+    ]
+
+    sync_results = gitsync.sync_workspaces(workspace_names, max_workers=args.max_workers)
+    gitsync.print_sync_summary(sync_results)
+    print("")
+
+    if any(result.get("status") == "failed" for result in sync_results):
+        misc.print_error(f"Synchronization of one or more environment workspaces failed!", bold = True)
+        sys.exit(1)
 
     misc.print_success(f"Environment workspaces synchronized!",bold = True)
@@ -9,17 +9,23 @@ default_environment = "tst"
 #---------------------------------------------------------
 # Main script
 #---------------------------------------------------------
-import os, sys, argparse, json
+import os, atexit, sys, argparse, json
 from pathlib import Path
-from fabric_cicd import FabricWorkspace, publish_all_items, unpublish_all_orphan_items, change_log_level
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
-from azure.identity import ClientSecretCredential
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.report_functions as perfreport
+import modules.semantic_model_functions as smfunc
+import modules.state_functions as fabstate
 
 # Ensure stdout and stderr are line-buffered
 sys.stdout.reconfigure(line_buffering=True, write_through=True)
 sys.stderr.reconfigure(line_buffering=True, write_through=True)
 
+# Report throttling of Fabric calls at the end of the run
+atexit.register(fabcli.print_throttle_summary)
+
 # Get arguments 
 parser = argparse.ArgumentParser(description="Fabric release arguments")
 parser.add_argument("--environment", required=True, default=default_environment, help="Name of environment to release.")
@@ -28,11 +34,24 @@ parser.add_argument("--item_types", required=False, default=default_item_types_i
 parser.add_argument("--repo_path", required=False, default=default_solution_path, help="Path the the solution repository where items are stored.")
 parser.add_argument("--is_debug", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Enable debug logging.")
 parser.add_argument("--unpublish_items", required=False, default=True, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Whether to unpublish orphan items that are no longer in the repository. Default is True.")
+parser.add_argument("--bind_max_workers", required=False, default=4, type=int, help="Maximum number of semantic models bound to SQL endpoints concurrently. Default is 4.")
+parser.add_argument("--refresh_models", required=False, default="none", choices=["none", "all", "changed"], help="Semantic models to refresh after the release: none, all released models, or only models changed since --refresh_changed_since. Default is none.")
+parser.add_argument("--refresh_changed_since", required=False, default="HEAD~1", help="Git reference used to detect changed semantic models when --refresh_models is 'changed' and --changed_models has no list for a layer. Needs a git checkout of the solution with this history. Default is HEAD~1.")
+parser.add_argument("--changed_models", required=False, default=os.environ.get('FABRICOPS_CHANGED_MODELS'), help="File with the changed semantic models per layer, written in the build stage by utils_build_parameter_file_dynamic.py --changed_models. Used by --refresh_models changed, as release stages have no git checkout. Defaults to the FABRICOPS_CHANGED_MODELS environment variable.")
+parser.add_argument("--refresh_max_per_capacity", required=False, default=2, type=int, help="Maximum number of concurrent semantic model refreshes per capacity. Default is 2.")
+parser.add_argument("--refresh_timeout", required=False, default=120, type=int, help="Minutes to wait for semantic model refreshes before failing the release. Default is 120.")
+parser.add_argument("--state", required=False, default=os.environ.get('FABRICOPS_STATE'), help="State file written by utils_build_parameter_file.py --state. Workspace IDs and connections of the environment are read from it instead of being discovered, if it is recent, matches the environment definition and its workspace IDs are current. Defaults to the FABRICOPS_STATE environment variable.")
 parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--report", required=False, default=os.environ.get('FABRICOPS_REPORT'), help="Writes a performance report (wall time per phase, call counts, latency percentiles, sleep time and retries) to this file or folder. Compare reports with utils_compare_perf_reports.py. Defaults to the FABRICOPS_REPORT environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+perfreport.start(args.report, environment=args.environment, layers=args.layers)
 tenant_id = args.tenant_id
 client_id = args.client_id
 client_secret = args.client_secret
@@ -42,20 +61,12 @@ item_type_list = args.item_types.split(",")
 repo_path = args.repo_path
 is_debug = args.is_debug
 unpublish_items = args.unpublish_items
-
-# Uncomment to enable debug logging
-if is_debug:
-    change_log_level("DEBUG")
-
-# Authenticate
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
-
-token_credential = ClientSecretCredential(client_id=client_id, client_secret=client_secret, tenant_id=tenant_id)
+bind_max_workers = args.bind_max_workers
+refresh_models = args.refresh_models
 
 # Load JSON environment files (main and environment specific) and merge
-main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
 env_definition = misc.merge_json(main_json, env_json)
 
 if env_definition:
@@ -65,13 +76,33 @@ if env_definition:
     layers = env_definition.get("layers")
     
     environment_parameters = {}
+    refresh_targets = []
+
+    # fabric_cicd is imported and the Fabric CLI is logged in only if a layer is released
+    if any(layer.lower() in layers_to_deploy for layer in layers):
+        from fabric_cicd import FabricWorkspace, publish_all_items, unpublish_all_orphan_items, change_log_level
+
+        # Uncomment to enable debug logging
+        if is_debug:
+            change_log_level("DEBUG")
+
+        # Authenticate
+        fabcli.configure({"encryption_fallback_enabled": "true"})
+        fabcli.login(client_id, client_secret, tenant_id)
+
+        token_credential = fabcli.get_token_credential(client_id, client_secret, tenant_id)
+
+        # Workspace IDs and connections resolved by the build stage
+        environment_state = fabstate.load_state(args.state, environment, env_definition) if args.state else None
+    else:
+        misc.print_info(f"No layer of {environment} matches --layers {args.layers}. Nothing to release.")
 
     for layer, layer_definition in layers.items():
         if layer.lower() in layers_to_deploy:        
             workspace_name = solution_name.format(layer=layer, environment=environment)
             workspace_name_escaped = workspace_name.replace("/", "\\/")
 
-            workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+            workspace_id = fabstate.get_workspace_id(environment_state, layer) or fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
 
             misc.print_subheader(f"Running release to workspace {workspace_name}!")
 
@@ -103,59 +134,86 @@ if env_definition:
 
             # Bind Semantic Models to SQL Endpoints (if configured)
             try:
-                bindings_yml = os.path.join(os.path.dirname(__file__), f"../resources/parameters/sqlendpoint_model_binding.yml")
+                bindings_yml = os.path.join(misc.PARAMETERS_DIR, "sqlendpoint_model_binding.yml")
                 bindings = misc.get_semantic_model_bindings(bindings_yml, layer)
 
                 if bindings:
                     misc.print_subheader("Binding semantic models to SQL endpoints")
 
-                    for binding in bindings:
-                        lakehouse_name = binding.get("lakehouse_name")
-                        lakehouse_ws_layer = binding.get("lakehouse_ws_layer")
-                        semantic_models = binding.get("semantic_models", [])
-
-                        # Resolve lakehouse connection and SQL endpoint information
-                        connection_name_template = misc.get_lakehouse_connection_template(env_definition, lakehouse_ws_layer, lakehouse_name)
-                        connection_identifier = connection_name_template.format(environment=environment) if connection_name_template else None
-
-                        connection_id = None
-                        database_name = None
-                        sqlendpoint = None
-                        if connection_identifier:
-                            conn_obj = fabcli.get_connection(connection_identifier)
-                            if conn_obj:
-                                conn_details = misc.parse_fabric_connection(conn_obj)
-                                connection_id = conn_details.get("connection_id")
-                                sqlendpoint = conn_details.get("sqlendpoint")
-                                database_name = conn_details.get("database_name")
-
-                        # Check if connection information was resolved successfully
-                        if not (connection_id and sqlendpoint and database_name):
-                            misc.print_warning(f"Connection information for {lakehouse_name} is incomplete. Skipping all models for this lakehouse.")
-                            continue
-
-                        # Now bind all semantic models to this lakehouse
-                        for semantic_model_name in semantic_models:
-                            semantic_model_id = fabcli.run_command(f"get '/{workspace_name}.Workspace/{semantic_model_name}.SemanticModel' -q id -f").strip()
-                            if not semantic_model_id:
-                                misc.print_warning(f"Semantic model '{semantic_model_name}' not found in workspace {workspace_name}. Skip binding.")
-                                continue
-
-                            resp = fabcli.bind_semanticmodel_sqlendpoint(
-                                workspace_id=workspace_id,
-                                item_id=semantic_model_id,
-                                connection_id=connection_id,
-                                sqlendpoint=sqlendpoint,
-                                database_name=database_name,
-                            )
-                            status = (resp or {}).get("status_code")
-                            if status == 200:
-                                misc.print_success(f"Binding '{semantic_model_name}' to SQL endpoint for lakehouse '{lakehouse_name}' successfully done.")
-                            else:
-                                misc.print_warning(f"Binding call returned non-success (status code {status}) for '{semantic_model_name}': {resp}")
+                    bind_results = smfunc.bind_semantic_models(
+                        workspace_id=workspace_id,
+                        workspace_name=workspace_name,
+                        bindings=bindings,
+                        env_definition=env_definition,
+                        environment=environment,
+                        owner_ids={client_id},
+                        max_workers=bind_max_workers,
+                    )
+
+                    for result in bind_results:
+                        if result.get("status") == "succeeded":
+                            misc.print_success(result.get("message"))
+                        else:
+                            misc.print_warning(result.get("message"))
                 else:
                     misc.print_info("No semantic model bindings configured for this layer.")
             except Exception as e:
                 misc.print_warning(f"Semantic model binding step encountered an error: {e}")
+
+            # Collect semantic models to refresh after all layers are released (if requested)
+            if refresh_models != "none" and "SemanticModel" in item_type_list:
+                layer_path = os.path.join(repo_path, layer.lower())
+                semantic_models = smfunc.get_repository_semantic_models(layer_path)
+
+                if refresh_models == "changed":
+                    changed_models = smfunc.load_changed_semantic_models(args.changed_models, layer) if args.changed_models else None
+                    if changed_models is None:
+                        changed_models = smfunc.get_changed_semantic_models(layer_path, args.refresh_changed_since)
+                    if changed_models is None:
+                        misc.print_warning(f"Changed semantic models could not be determined from --changed_models or with git. Refreshing all semantic models of layer {layer}.")
+                    else:
+                        semantic_models = [name for name in semantic_models if name in changed_models]
+
+                if semantic_models:
+                    refresh_yml = os.path.join(misc.PARAMETERS_DIR, "semantic_model_refresh.yml")
+                    refresh_settings = misc.get_semantic_model_refresh_settings(refresh_yml, layer)
+                    semantic_model_ids = fabcli.get_workspace_item_ids(workspace_id, "SemanticModel")
+                    capacity_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q capacityId -f").strip()
+
+                    for semantic_model_name in semantic_models:
+                        if semantic_model_name not in semantic_model_ids:
+                            misc.print_warning(f"Semantic model '{semantic_model_name}' not found in workspace {workspace_name}. Skip refresh.")
+                            continue
+                        refresh_targets.append({
+                            "workspace_id": workspace_id,
+                            "workspace_name": workspace_name,
+                            "capacity_id": capacity_id,
+                            "semantic_model": semantic_model_name,
+                            "semantic_model_id": semantic_model_ids[semantic_model_name],
+                            "body": smfunc.build_refresh_body(refresh_settings.get(semantic_model_name)),
+                        })
+
+    # Refresh semantic models in parallel and fail the release on refresh errors
+    if refresh_targets:
+        misc.print_subheader(f"Refreshing {len(refresh_targets)} semantic model(s)")
+
+        refresh_results = smfunc.refresh_semantic_models(
+            refresh_targets,
+            max_per_capacity=args.refresh_max_per_capacity,
+            timeout_minutes=args.refresh_timeout,
+        )
+
+        failed_refreshes = [result for result in refresh_results if result.get("status") != "Completed"]
+        for result in refresh_results:
+            if result.get("status") == "Completed":
+                misc.print_success(result.get("message"))
+            else:
+                misc.print_error(result.get("message"))
+
+        if failed_refreshes:
+            misc.print_error(f"{len(failed_refreshes)} semantic model refresh(es) failed.", True)
+            sys.exit(1)
+    elif refresh_models != "none":
+        misc.print_info("No semantic models to refresh.")
 else:
     misc.print_error(f"No environment definition found for environment {environment}! Release of {environment} has been skipped.", True)
\ No newline at end of file
@@ -7,13 +7,22 @@ default_environment = "dev"
 #---------------------------------------------------------
 # Main script
 #---------------------------------------------------------
-import os, sys, io, argparse, time, json
+import os, atexit, sys, io, argparse, time, json
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
-
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.report_functions as perfreport
+import modules.plan_functions as planfunc
+from modules.journal_functions import SetupJournal
+
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stdout.reconfigure(line_buffering=True)
 
+# Report throttling of Fabric calls at the end of the run
+atexit.register(fabcli.print_throttle_summary)
+
 # Get arguments
 parser = argparse.ArgumentParser(description="Fabric IaC setup arguments")
 parser.add_argument("--environment", required=False, default=default_environment, help="Environment to setup. Default is dev.")
@@ -22,8 +31,18 @@ parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENAN
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
 parser.add_argument("--github_pat", required=False, default=os.environ.get('GITHUB_PAT'), help="Github Personal Access Token. Used when source control provider is GitHub. Defaults to the FAB_GITHUB_PAT environment variable.")
+parser.add_argument("--plan", required=False, default=None, help="Reads the current state once, writes the operations needed for the action to this file and exits without changing anything.")
+parser.add_argument("--apply", required=False, default=None, help="Executes only the operations of a plan file written with --plan.")
+parser.add_argument("--journal", required=False, default=os.environ.get('FABRICOPS_SETUP_JOURNAL'), help="Path of a journal file of completed operations. A failed run resumes from the point of failure when re-run with the same journal. Defaults to the FABRICOPS_SETUP_JOURNAL environment variable.")
+parser.add_argument("--max_workers", required=False, default=8, type=int, help="Maximum number of parallel reads (--plan) and operations (--apply and delete). Default is 8.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--report", required=False, default=os.environ.get('FABRICOPS_REPORT'), help="Writes a performance report (wall time per phase, call counts, latency percentiles, sleep time and retries) to this file or folder. Compare reports with utils_compare_perf_reports.py. Defaults to the FABRICOPS_REPORT environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+perfreport.start(args.report, environment=args.environment, action=args.action)
 environment = args.environment
 tenant_id = args.tenant_id
 client_id = args.client_id
@@ -32,16 +51,79 @@ github_pat = args.github_pat
 action = args.action.lower()
 
 # Authenticate
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command("config set folder_listing_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+fabcli.configure({"encryption_fallback_enabled": "true", "folder_listing_enabled": "true"})
+fabcli.login(client_id, client_secret, tenant_id)
 
 # Load JSON environment files (main and environment specific) and merge
-main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
 env_definition = misc.merge_json(main_json, env_json)
 
+journal = None
+if args.journal and action == "create" and not args.plan:
+    journal = SetupJournal(args.journal, environment, action, planfunc.get_definition_hash(env_definition))
+    if journal.resumed:
+        # One workspace and one connection listing verify all journaled operations
+        dropped = journal.verify(set(fabcli.get_workspace_ids().values()), {connection.get("id") for connection in fabcli.list_paginated("connections")})
+        misc.print_info(f"Resuming from journal {args.journal}: {len(journal.entries)} completed operation(s) will be skipped" + (f", {dropped} re-run as their resources no longer exist." if dropped else "."))
+
+
+def is_journaled(key):
+    return journal is not None and journal.is_done(key)
+
+
+def record_journal(key, ids=None):
+    if journal is not None:
+        journal.record(key, ids)
+
+
+def assign_connection_roles(connection_id, permissions, is_new=False):
+    """Assigns the connection roles of the permissions that are not assigned yet. New connections are not listed."""
+    existing = {} if is_new else fabcli.get_role_assignments(f"connections/{connection_id}")
+    for permission, definitions in permissions.items():
+        for definition in definitions:
+            role = "Owner" if permission == "Admin" else "User"
+            if existing.get((definition.get("id") or "").lower()) != role.lower():
+                fabcli.add_connection_roleassignment(connection_id, definition.get("id"), definition.get("type"), role)
+
+
+if args.plan:
+    misc.print_header(f"Planning {action} of {environment} environment")
+    if action == "delete":
+        state = planfunc.read_teardown_state(env_definition, environment, args.max_workers)
+    else:
+        state = planfunc.read_current_state(env_definition, environment, args.max_workers)
+    plan = planfunc.build_plan(env_definition, environment, state, action)
+    planfunc.save_plan(plan, args.plan)
+    planfunc.print_plan(plan)
+    misc.print_info(f"Plan written to {args.plan}.")
+    sys.exit(0)
+
+if args.apply:
+    try:
+        plan = planfunc.load_plan(args.apply)
+    except ValueError as e:
+        misc.print_error(f"{e}... Exiting!")
+        sys.exit(1)
+    misc.print_header(f"Applying {plan.get('action')} plan of {plan.get('environment')} environment")
+    if plan.get("version") != planfunc.PLAN_VERSION or plan.get("environment") != environment:
+        misc.print_error(f"Plan {args.apply} was not created for the {environment} environment with this version... Exiting!")
+        sys.exit(1)
+    if plan.get("definition_hash") != planfunc.get_definition_hash(env_definition):
+        misc.print_error(f"The environment definition changed after the plan was created. Please create a new plan... Exiting!")
+        sys.exit(1)
+
+    apply_journal = SetupJournal(args.journal, environment, f"apply:{plan.get('created')}", plan.get("definition_hash")) if args.journal else None
+    results = planfunc.apply_plan(plan, {"tenant_id": tenant_id, "client_id": client_id, "client_secret": client_secret, "github_pat": github_pat}, args.max_workers, apply_journal)
+    failed = [result for result in results if result.get("status") != "succeeded"]
+    if apply_journal and not failed:
+        apply_journal.complete()
+    misc.print_info(f"\n{len(results) - len(failed)} of {len(results)} operation(s) succeeded.", bold=True)
+    sys.exit(1 if failed else 0)
+
 if action == "create":
+    # Steps that failed without raising; the journal is only completed if there are none, so a re-run resumes
+    failed_steps = []
     generic_connection_header_printed = False
     connection_permissions = env_definition.get("generic", {}).get("permissions")
 
@@ -52,7 +134,11 @@ if action == "create":
         for connection in env_definition.get("generic").get("fabric_connections"):
             misc.print_info(f"Creating Fabric connection '{connection.get('name')}'...", bold=True, end="")
             fabric_connection = False
-            if not fabcli.connection_exists(connection.get("name")):
+            connection_created = False
+            if is_journaled(f"connection:{connection.get('name')}"):
+                misc.print_warning(" ⚠ Completed in previous run")
+                fabric_connection = {"id": journal.get_ids(f"connection:{connection.get('name')}").get("connection_id")}
+            elif not fabcli.connection_exists(connection.get("name")):
                 fabric_connection = fabcli.create_fabric_connection(
                     connection.get("name"),
                     connection.get("type"),
@@ -62,30 +148,28 @@ if action == "create":
                     client_secret
                 )
                 if fabric_connection:
+                    connection_created = True
                     misc.print_success(" ✔")
                 else: 
                     misc.print_error(f" ✖ Failed!")    
+                    failed_steps.append(f"connection:{connection.get('name')}")
             else:
                 misc.print_warning(" ⚠ Already exists")
                 fabric_connection = fabcli.get_connection(connection.get('name'))
 
-            if connection_permissions and fabric_connection:
+            if fabric_connection:
+                record_journal(f"connection:{connection.get('name')}", {"connection_id": fabric_connection.get("id")})
+
+            if connection_permissions and fabric_connection and not is_journaled(f"connection_permissions:{connection.get('name')}"):
                 print(f"  • Assigning connection permissions...", end="")
-                
-                for permission, definitions in connection_permissions.items():
-                    for definition in definitions:
-                        role = "Owner" if permission == "Admin" else "User"
-                        fabcli.add_connection_roleassignment(
-                            fabric_connection.get("id"),
-                            definition.get("id"),
-                            definition.get("type"),
-                            role
-                            )
+                assign_connection_roles(fabric_connection.get("id"), connection_permissions, connection_created)
+                record_journal(f"connection_permissions:{connection.get('name')}", {"connection_id": fabric_connection.get("id")})
                 misc.print_success(" ✔")
 
 
     git_settings = env_definition.get("generic").get("git_settings")
     git_connection = None
+    git_connection_created = False
         
     if git_settings:
         misc.print_header(f"Configuring generic solution connections") if not generic_connection_header_printed else None
@@ -95,7 +179,10 @@ if action == "create":
         git_permissions = env_definition.get("generic", {}).get("permissions")
         connection_identifier = git_settings.get("myGitCredentials").get("connection_name") if git_settings.get("myGitCredentials").get("connection_name") else git_settings.get("myGitCredentials").get("connectionId")
 
-        if fabcli.connection_exists(connection_identifier):
+        if is_journaled(f"connection:{connection_identifier}"):
+            git_connection = {"id": journal.get_ids(f"connection:{connection_identifier}").get("connection_id")}
+            misc.print_warning(f" ⚠ Completed in previous run")
+        elif fabcli.connection_exists(connection_identifier):
             git_connection = fabcli.get_connection(connection_identifier)
             misc.print_warning(f" ⚠ Already exists")
         else:           
@@ -108,19 +195,16 @@ if action == "create":
                 fabcli.create_azuredevops_connection(git_settings.get("myGitCredentials").get("connection_name"), repo_url, tenant_id, client_id, client_secret)
                 git_connection = fabcli.get_connection(connection_identifier)
             
+            git_connection_created = True
             misc.print_success(" ✔")
 
-        if connection_permissions and git_connection:
+        if git_connection:
+            record_journal(f"connection:{connection_identifier}", {"connection_id": git_connection.get("id")})
+
+        if connection_permissions and git_connection and not is_journaled(f"connection_permissions:{connection_identifier}"):
             print(f"  • Assigning connection permissions...", end="")
-            for permission, definitions in connection_permissions.items():
-                for definition in definitions:
-                    role = "Owner" if permission == "Admin" else "User"
-                    fabcli.add_connection_roleassignment(
-                        git_connection.get("id"),
-                        definition.get("id"),
-                        definition.get("type"),
-                        role
-                        )
+            assign_connection_roles(git_connection.get("id"), connection_permissions, git_connection_created)
+            record_journal(f"connection_permissions:{connection_identifier}", {"connection_id": git_connection.get("id")})
             misc.print_success(" ✔")
 
     if env_definition:
@@ -140,13 +224,24 @@ if action == "create":
             
             misc.print_info(f"Creating workspace '{workspace_name}'...", bold=True, end="")
 
-            if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace").replace("*", "").strip().lower() == "false":
-                fabcli.run_command(f"create '{workspace_name_escaped}.Workspace' -P capacityname={capacity_name}")
-                misc.print_success(" ✔", bold=True)
+            workspace_created = False
+            if is_journaled(f"workspace:{workspace_name}"):
+                workspace_id = journal.get_ids(f"workspace:{workspace_name}").get("workspace_id")
+                misc.print_warning(f" ⚠ Completed in previous run", bold=True)
             else:
-                misc.print_warning(f" ⚠ Already exists", bold=True)
+                if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace").replace("*", "").strip().lower() == "false":
+                    fabcli.run_command(f"create '{workspace_name_escaped}.Workspace' -P capacityname={capacity_name}")
+                    workspace_created = True
+                    misc.print_success(" ✔", bold=True)
+                else:
+                    misc.print_warning(f" ⚠ Already exists", bold=True)
 
-            workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+                workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+                if fabcli.is_guid(workspace_id):
+                    record_journal(f"workspace:{workspace_name}", {"workspace_id": workspace_id})
+                else:
+                    failed_steps.append(f"workspace:{workspace_name}")
+            workspace_ids = {"workspace_id": workspace_id}
                 
             # Update layer_definition
             layer_definition["workspace_id"] = workspace_id
@@ -159,23 +254,46 @@ if action == "create":
             
             if permissions:
                 #misc.print_info(f"  • Assigning workspace permissions...", end="")
+                # Roles of an existing workspace are listed once, so assigned roles are not set again
+                workspace_roles = None if not workspace_created and fabcli.is_guid(workspace_id) else {}
                 for permission, definitions in permissions.items():
                     for definition in definitions:
                         if definition.get("type").lower() == "workspaceidentity":
                             identity_name = definition.get("name").format(layer=layer, environment=environment)
                             workspace_identity_acl[workspace_name_escaped] = identity_name
-                        else:
+                        elif not is_journaled(f"workspace_permission:{workspace_name}:{definition.get('id')}:{permission.lower()}"):
                             misc.print_info(f"  • Assigning workspace permission for identity {definition.get('id')}...", end="")   
+                            if workspace_roles is None:
+                                workspace_roles = fabcli.get_role_assignments(f"workspaces/{workspace_id}")
+                            if workspace_roles.get((definition.get('id') or "").lower()) == permission.lower():
+                                misc.print_warning(" ⚠ Already assigned")
+                                record_journal(f"workspace_permission:{workspace_name}:{definition.get('id')}:{permission.lower()}", workspace_ids)
+                                continue
+
                             fabcli.run_command(f"acl set {workspace_name_escaped}.Workspace -I {definition.get('id')} -R {permission.lower()} -f")
-                            misc.print_success(" ✔")
+                            # The role is journaled only if the workspace lists it afterwards
+                            workspace_roles = fabcli.get_role_assignments(f"workspaces/{workspace_id}")
+                            if workspace_roles.get((definition.get('id') or "").lower()) == permission.lower():
+                                record_journal(f"workspace_permission:{workspace_name}:{definition.get('id')}:{permission.lower()}", workspace_ids)
+                                misc.print_success(" ✔")
+                            else:
+                                misc.print_error(" ✖ Failed!")
+                                failed_steps.append(f"workspace_permission:{workspace_name}:{definition.get('id')}:{permission.lower()}")
                 
-            if (layer_definition.get("create_workspace_identity", False)):
+            if (layer_definition.get("create_workspace_identity", False)) and not is_journaled(f"workspace_identity:{workspace_name}"):
                 misc.print_info(f"  • Creating workspace identity...", end="")
-                if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace/.managedidentities/{workspace_name_escaped}.ManagedIdentity").replace("*", "").strip().lower() == "false":
-                    fabcli.run_command(f"create {workspace_name_escaped}.Workspace/.managedidentities/{workspace_name_escaped}.ManagedIdentity")
-                    misc.print_success(" ✔")
+                identity_path = f"{workspace_name_escaped}.Workspace/.managedidentities/{workspace_name_escaped}.ManagedIdentity"
+                if not fabcli.item_exists(identity_path):
+                    fabcli.run_command(f"create {identity_path}")
+                    if fabcli.item_exists(identity_path):
+                        record_journal(f"workspace_identity:{workspace_name}", workspace_ids)
+                        misc.print_success(" ✔")
+                    else:
+                        misc.print_error(" ✖ Failed!")
+                        failed_steps.append(f"workspace_identity:{workspace_name}")
                 else:
-                    misc.print_warning(f" ⚠ Already exists", bold=True)      
+                    record_journal(f"workspace_identity:{workspace_name}", workspace_ids)
+                    misc.print_warning(f" ⚠ Already exists", bold=True)
 
             if layer_definition.get("items"):
                 print_item_header = True
@@ -190,9 +308,12 @@ if action == "create":
                                 print_item_header = False
 
                             item_folder = f'{item.get("item_folder")}/' if item.get("item_folder") else ""
+                            item_key = f'item:{workspace_name}:{item_folder}{item.get("item_name")}.{item_type}'
                             misc.print_info(f"    ◦ {item_type}: {item_folder}{item.get("item_name")}...", end="")
 
-                            if not fabcli.item_exists(f'{workspace_name_escaped}.Workspace/{item_folder}{item.get("item_name")}.{item_type}'):    
+                            if is_journaled(item_key):
+                                misc.print_warning(f" ⚠ Completed in previous run")
+                            elif not fabcli.item_exists(f'{workspace_name_escaped}.Workspace/{item_folder}{item.get("item_name")}.{item_type}'):    
                                 fabcli.run_command(f"create '{workspace_name_escaped}.Workspace/{item_folder}{item.get("item_name")}.{item_type}'")
                                 item["item_metadata"] = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item_folder}{item.get('item_name')}.{item_type}", retry_count=2)
                                 
@@ -210,15 +331,18 @@ if action == "create":
                                             misc.print_warning(" ⚠ Timed out waiting for Lakehouse SQL endpoint provisioning")
                                             break
                                         print(".", end="")
-                                        time.sleep(2)
+                                        tracing.sleep(2, "sql endpoint provisioning")
                                         item["item_metadata"] = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item_folder}{item.get('item_name')}.{item_type}")
 
                                 if item["item_metadata"]:                           
+                                    record_journal(item_key, workspace_ids)
                                     misc.print_success(" ✔")
                                 else:
                                     misc.print_error(" ✖ Failed!")
+                                    failed_steps.append(item_key)
                             else:
                                 item["item_metadata"] = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item.get('item_name')}.{item_type}")
+                                record_journal(item_key, workspace_ids)
                                 misc.print_warning(f" ⚠ Already exists")
   
             if layer_definition.get("private_endpoints"):
@@ -227,19 +351,24 @@ if action == "create":
                     resource_type = misc.get_private_endpoint_resource_type(private_endpoint.get("id"))
                     print(f"    ◦ Provisioning {private_endpoint.get('name')}...", end="")
 
-                    if (fabcli.item_exists(f"{workspace_name_escaped}.Workspace/.managedprivateendpoints/{private_endpoint.get('name')}.ManagedPrivateEndpoint")):
+                    private_endpoint_path = f"{workspace_name_escaped}.Workspace/.managedprivateendpoints/{private_endpoint.get('name')}.ManagedPrivateEndpoint"
+                    if is_journaled(f"private_endpoint:{workspace_name}:{private_endpoint.get('name')}"):
+                        misc.print_warning(" ⚠ Completed in previous run")
+                    elif (fabcli.item_exists(private_endpoint_path)):
+                        record_journal(f"private_endpoint:{workspace_name}:{private_endpoint.get('name')}", workspace_ids)
                         misc.print_warning(" ⚠ Already exists")
                     else:
-                        try:
-                            mpe_result = fabcli.run_command(
-                                f'create {workspace_name_escaped}.Workspace/.managedprivateendpoints/'
-                                f'{private_endpoint.get("name")}.ManagedPrivateEndpoint'
-                                f' -P targetPrivateLinkResourceId={private_endpoint.get("id")},targetSubresourceType={resource_type},'
-                                f'autoApproveEnabled=true' if private_endpoint.get("auto_approve") else 'autoApproveEnabled=false'
-                            )
+                        fabcli.run_command(
+                            f'create {private_endpoint_path}'
+                            f' -P targetPrivateLinkResourceId={private_endpoint.get("id")},targetSubresourceType={resource_type},'
+                            + ('autoApproveEnabled=true' if private_endpoint.get("auto_approve") else 'autoApproveEnabled=false')
+                        )
+                        if fabcli.item_exists(private_endpoint_path):
+                            record_journal(f"private_endpoint:{workspace_name}:{private_endpoint.get('name')}", workspace_ids)
                             misc.print_success(" ✔")
-                        except:
+                        else:
                             misc.print_error("  ✖ Failed!")
+                            failed_steps.append(f"private_endpoint:{workspace_name}:{private_endpoint.get('name')}")
 
             git_settings = env_definition.get("generic").get("git_settings")
         
@@ -249,33 +378,46 @@ if action == "create":
                     git_settings["myGitCredentials"].pop("connection_name", None) # Remove connection name
                     git_settings["myGitCredentials"]["connectionId"] = git_connection.get("id") # Add connection id instead
 
-                if git_settings and layer_definition.get("git_directoryName"):
+                if git_settings and layer_definition.get("git_directoryName") and is_journaled(f"git:{workspace_name}"):
+                    misc.print_info(f"  • Setting up Git integration...", end="")
+                    misc.print_warning(" ⚠ Completed in previous run")
+                elif git_settings and layer_definition.get("git_directoryName"):
                     misc.print_info(f"  • Setting up Git integration...", end="")
                     git_settings = env_definition.get("generic").get("git_settings")
                     git_settings["gitProviderDetails"]["directoryName"] = layer_definition.get("git_directoryName")                    
                 
-                    if git_connection.get("id"):                   
+                    if fabcli.get_git_connection_state(workspace_id) == "ConnectedAndInitialized":
+                        record_journal(f"git:{workspace_name}", workspace_ids)
+                        misc.print_warning(" ⚠ Already connected")
+                    elif git_connection.get("id"):                   
                         connect_response = fabcli.connect_workspace_to_git(workspace_id, git_settings)
                         if connect_response:                            
                             init_response = fabcli.initialize_git_connection(workspace_id)
                             if init_response and init_response.get("requiredAction") != "None" and init_response.get("remoteCommitHash"):
                                 fabcli.update_workspace_from_git(workspace_id, init_response.get("remoteCommitHash"))
                             
+                            record_journal(f"git:{workspace_name}", workspace_ids)
                             misc.print_success(" ✔")
                         else:
                             misc.print_error(f" ✖ Failed! Please verify connection and tenant settings.")
+                            failed_steps.append(f"git:{workspace_name}")
         
         ### Assign workspace identities to workspaces
         if workspace_identity_acl:
             misc.print_header(f"Assigning workspace identities as members on workspaces")
             for workspace_name, workspace_identity in workspace_identity_acl.items():
                 misc.print_info(f"  • Assigning workspace identity {workspace_identity} to {workspace_name}...", end="")   
+                if is_journaled(f"workspace_identity_acl:{workspace_name}:{workspace_identity}"):
+                    misc.print_warning(" ⚠ Completed in previous run")
+                    continue
                 try:             
                     identity_id = fabcli.run_command(f"get {workspace_identity}.Workspace -q workspaceIdentity.servicePrincipalId -f").strip()
                     fabcli.run_command(f"acl set {workspace_name}.Workspace -I {identity_id} -R admin -f") 
+                    record_journal(f"workspace_identity_acl:{workspace_name}:{workspace_identity}")
                     misc.print_success(" ✔")
                 except Exception as e:
                     misc.print_error(f" ✖ Failed! {str(e)}")
+                    failed_steps.append(f"workspace_identity_acl:{workspace_name}:{workspace_identity}")
 
         if has_item_connections:
             misc.print_header(f"Configuring item connections")
@@ -294,6 +436,11 @@ if action == "create":
 
                             if item.get("connection_name") and item_type in {"Lakehouse", "SQLDatabase", "Warehouse"}:
                                 connection_name = item.get("connection_name").format(layer=layer, environment=environment)
+                                if is_journaled(f"connection_permissions:{connection_name}"):
+                                    misc.print_info(f"\nCreating item connection for {connection_name}...", bold=True, end="")
+                                    misc.print_warning(" ⚠ Completed in previous run")
+                                    continue
+
                                 item["item_metadata"] = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item.get('item_name')}.{item_type}")
                                 #print(f"/{workspace_name_escaped}.Workspace/{item.get('item_name')}.{item_type}")
                                 misc.print_info(f"\nCreating item connection for {connection_name}...", bold=True, end="")
@@ -309,89 +456,52 @@ if action == "create":
                                         item.get("item_metadata").get("properties").get("databaseName") 
                                     )
 
+                                    item_connection_created = False
                                     if not fabcli.connection_exists(connection_name):
                                         fabcli.create_sql_connection(connection_name, server, database, tenant_id, client_id, client_secret)
+                                        item_connection_created = True
                                         misc.print_success(" ✔")
                                     else:
                                         misc.print_warning(" ⚠ Already exists")
 
 
                                     item["connection_metadata"] = fabcli.get_item(f".connections/{connection_name}.Connection")
+                                    connection_ids = {"connection_id": (item.get("connection_metadata") or {}).get("id")}
+                                    record_journal(f"connection:{connection_name}", connection_ids)
 
                                     if permissions and fabcli.connection_exists(connection_name):
                                         print(f"  • Assigning connection permissions...", end="")
-                                        for permission, definitions in permissions.items():
-                                            for definition in definitions:
-                                                role = "Owner" if permission == "Admin" else "User"
-                                                fabcli.add_connection_roleassignment(
-                                                    item.get("connection_metadata").get("id"), 
-                                                    definition.get("id"),
-                                                    definition.get("type"),
-                                                    role
-                                                    )
+                                        assign_connection_roles(item.get("connection_metadata").get("id"), permissions, item_connection_created)
+                                        record_journal(f"connection_permissions:{connection_name}", connection_ids)
                                         misc.print_success(" ✔")
                                 else:
                                     misc.print_error(" ✖ Failed to retrieve item!")
+                                    failed_steps.append(f"connection:{connection_name}")
     else:
         misc.print_warning(f"No environment definition found for {environment}... Skipping setup!")
 
+    if journal is not None and failed_steps:
+        misc.print_warning(f"\n{len(failed_steps)} step(s) failed. The journal {args.journal} is kept, re-run to resume from the failed steps.")
+    elif journal is not None:
+        journal.complete()
+
     print("")
 
 elif action == "delete": 
 
-    misc.print_header(f"Deleting generic solution connections")
-
-    if (env_definition.get("generic").get("fabric_connections") and env_definition.get("generic").get("is_primary")):
-        for connection in env_definition.get("generic").get("fabric_connections"):
-            
-            if fabcli.connection_exists(connection.get("name")):
-                misc.print_info(f"Deleting connection '{connection.get('name')}'...", bold=True, end="")
-                fabcli.run_command(f"rm .connections/{connection.get('name')}.Connection -f")
-                misc.print_success(f" ✔")
-
-    git_settings = env_definition.get("generic").get("git_settings")
-    git_connection = None
-        
-    if git_settings:
-        connection_identifier = git_settings.get("myGitCredentials").get("connection_name") if git_settings.get("myGitCredentials").get("connection_name") else git_settings.get("myGitCredentials").get("connectionId")
-        if fabcli.connection_exists(connection_identifier):
-            git_connection = fabcli.get_connection(connection_identifier)
-            misc.print_info(f"Deleting connection '{git_connection.get("displayName")}'...", bold=True, end="")
-            fabcli.run_command(f"rm .connections/{git_connection.get("displayName")}.Connection -f")
-            misc.print_success(f" ✔")
-
     misc.print_header(f"Deleting {environment} environment")
-    
-    solution_name = env_definition.get("name")
-    layers = env_definition.get("layers")
-    default_capacityid = env_definition.get("generic").get("capacity_id")
-
-    for layer, layer_definition in layers.items():
-        workspace_name = solution_name.format(layer=layer, environment=environment)
-        workspace_name_escaped = workspace_name.replace("/", "\\/")
-        misc.print_info(f"Deleting workspace '{workspace_name}'...", bold=True, end="")
-        if fabcli.run_command(f"exists {workspace_name_escaped}.Workspace").replace("*", "").strip().lower() == "true":
 
-            if layer_definition.get("private_endpoints"):
-                for private_endpoint in layer_definition.get("private_endpoints"):
-                    if (fabcli.item_exists(f"{workspace_name_escaped}.Workspace/.managedprivateendpoints/{private_endpoint.get('name')}.ManagedPrivateEndpoint")):
-                        fabcli.run_command(f"rm {workspace_name_escaped}.Workspace/.managedprivateendpoints/{private_endpoint.get('name')}.ManagedPrivateEndpoint -f")
+    # Everything to remove is listed in one pass and deleted with bounded concurrency, private endpoints before their workspace
+    state = planfunc.read_teardown_state(env_definition, environment, args.max_workers)
+    plan = planfunc.build_plan(env_definition, environment, state, "delete")
 
-            fabcli.run_command(f"rm '{workspace_name_escaped}.Workspace' -f")
-            misc.print_success(" ✔")
-        else:
-            misc.print_warning(f" ⚠ Does not exist. Skipping deletion!")
-
-        if layer_definition.get("items"):
-            for item_type, items in layer_definition.get("items").items():
-                for item in items:    
-                    if item.get("connection_name") and item_type in {"Lakehouse", "SQLDatabase", "Warehouse"}:
-                        connection_name = item.get("connection_name").format(layer=layer, environment=environment)
-                        misc.print_info(f"  • Deleting connection '{connection_name}'... ", bold=False, end="")
-                        if fabcli.run_command(f"exists .connections/{connection_name}.Connection").replace("*", "").strip().lower() == "true":
-                            fabcli.run_command(f"rm .connections/{connection_name}.Connection -f")
-                            misc.print_success(" ✔")
-                        else:
-                            misc.print_warning(f" ⚠ Does not exist. Skipping deletion!")
+    if not plan.get("operations"):
+        misc.print_warning(f"Nothing to delete for {environment}.")
+    else:
+        results = planfunc.apply_plan(plan, {}, args.max_workers)
+        failed = [result for result in results if result.get("status") != "succeeded"]
+        misc.print_info(f"\n{len(results) - len(failed)} of {len(results)} object(s) deleted.", bold=True)
+        if failed:
+            sys.exit(1)
 else:
     misc.print_error(f"Invalid action specified: {action}. Supported values are Create/Delete.")
\ No newline at end of file
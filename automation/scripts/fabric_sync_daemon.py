@@ -0,0 +1,210 @@
+#---------------------------------------------------------
+# Git sync daemon
+# Keeps an authenticated Fabric CLI session, the merged environment definition
+# and the workspace inventory warm, and synchronizes workspaces with git on
+# request. Requests are accepted through a local HTTP endpoint and/or a file
+# drop folder, duplicate requests for a workspace are coalesced and syncs run
+# with bounded concurrency.
+#
+# HTTP:      POST /sync   {"layers": ["Core"]} | {"workspaces": ["..."]} | {} (all layers)
+#            GET  /status
+# File drop: *.json files with the same body as POST /sync. Write the file as
+#            *.tmp and rename it to *.json when complete, the rename is
+#            atomic and *.tmp files are ignored.
+# Only workspaces and layers of the environment can be requested.
+#---------------------------------------------------------
+import os, sys, io, argparse, json, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.gitsync_functions as gitsync
+from modules.sync_queue_functions import SyncQueue
+
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+default_environment = "dev"
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Fabric git sync daemon arguments")
+parser.add_argument("--environment", required=False, default=default_environment, help="The environment whose workspaces are synchronized. Default is dev.")
+parser.add_argument("--host", required=False, default="127.0.0.1", help="Host the HTTP endpoint listens on. Default is 127.0.0.1.")
+parser.add_argument("--port", required=False, default=8765, type=int, help="Port of the HTTP endpoint. Use 0 to disable the HTTP endpoint. Default is 8765.")
+parser.add_argument("--queue_dir", required=False, default=None, help="Folder watched for sync request files (*.json). File drop is disabled if not set.")
+parser.add_argument("--max_workers", required=False, default=4, type=int, help="Maximum number of workspaces synchronized at the same time. Default is 4.")
+parser.add_argument("--poll_interval", required=False, default=3, type=int, help="Seconds between two status polls of running git updates. Default is 3.")
+parser.add_argument("--refresh_minutes", required=False, default=30, type=int, help="Minutes after which login and workspace inventory are refreshed. Default is 30.")
+parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
+parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
+parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+
+args = parser.parse_args()
+tracing.start(args.trace)
+environment = args.environment
+
+# Load JSON environment files (main and environment specific) and merge once
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
+env_definition = misc.merge_json(main_json, env_json)
+
+if not env_definition:
+    misc.print_error(f"No environment definition found for {environment}... Exiting!")
+    sys.exit(1)
+
+solution_name = env_definition.get("name")
+layer_workspaces = {
+    layer: solution_name.format(layer=layer, environment=environment)
+    for layer, layer_definition in env_definition.get("layers").items()
+    if layer_definition.get("git_synchronize_on_commit", True) and not layer_definition.get("git_disconnect_after_initialize", False)
+}
+
+inventory = {"workspace_ids": {}, "refreshed": 0}
+inventory_lock = threading.Lock()
+
+
+def refresh_session(force: bool = False):
+    """Logs in and reloads the workspace inventory when it is older than --refresh_minutes."""
+    with inventory_lock:
+        if not force and time.time() - inventory["refreshed"] < args.refresh_minutes * 60:
+            return
+        fabcli.configure({"encryption_fallback_enabled": "true"})
+        fabcli.login(args.client_id, args.client_secret, args.tenant_id, force=True)
+        inventory["workspace_ids"] = fabcli.get_workspace_ids()
+        inventory["refreshed"] = time.time()
+        misc.print_info(f"Session refreshed, {len(inventory['workspace_ids'])} workspace(s) in inventory.")
+
+
+def sync_workspace(workspace_name: str) -> dict:
+    refresh_session()
+    result = gitsync.sync_workspaces([workspace_name], poll_interval=args.poll_interval, workspace_ids=inventory["workspace_ids"])[0]
+
+    # Workspaces created after the last inventory refresh are resolved by name, keep them for the next run
+    if workspace_name not in inventory["workspace_ids"] and result.get("status") != "failed":
+        refresh_session(force=True)
+
+    if result.get("status") == "failed":
+        misc.print_error(f"✖ {workspace_name}: {result.get('message')} ({result.get('duration')}s)")
+    else:
+        misc.print_success(f"✔ {workspace_name}: {result.get('status')} ({result.get('duration')}s)")
+    return result
+
+
+def enqueue(request: dict) -> dict:
+    """
+    Resolves a sync request to workspace names and submits them to the queue.
+
+    Raises:
+        ValueError: If the request is not an object or names workspaces or layers that are not synchronized by the daemon.
+    """
+    request = request or {}
+    if not isinstance(request, dict):
+        raise ValueError("The request must be a JSON object.")
+
+    unknown_workspaces = [str(name) for name in request.get("workspaces") or [] if name not in layer_workspaces.values()]
+    unknown_layers = [str(layer) for layer in request.get("layers") or [] if str(layer).lower() not in {key.lower() for key in layer_workspaces}]
+    if unknown_workspaces or unknown_layers:
+        raise ValueError(f"Not synchronized by this daemon: {', '.join(unknown_workspaces + unknown_layers)}. Workspaces: {', '.join(layer_workspaces.values())}.")
+
+    workspace_names = list(request.get("workspaces") or [])
+    for layer in request.get("layers") or []:
+        workspace_names += [name for key, name in layer_workspaces.items() if key.lower() == str(layer).lower()]
+    if not request.get("workspaces") and not request.get("layers"):
+        workspace_names = list(layer_workspaces.values())
+
+    return {workspace_name: sync_queue.submit(workspace_name) for workspace_name in dict.fromkeys(workspace_names)}
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    def _respond(self, status_code: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            self._respond(200, {**sync_queue.status(), "throttle": fabcli.THROTTLE.get_metrics()})
+        else:
+            self._respond(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/sync":
+            self._respond(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._respond(400, {"error": f"Invalid request body: {e}"})
+            return
+        try:
+            self._respond(202, enqueue(request))
+        except ValueError as e:
+            self._respond(400, {"error": str(e)})
+
+    def log_message(self, format, *log_args):
+        pass
+
+
+def watch_queue_dir(queue_dir: str):
+    """
+    Picks up request files from the file drop folder and removes them once queued. Files that are not valid JSON
+    (e.g. still being written) are left in place and read again on the next pass.
+    """
+    os.makedirs(queue_dir, exist_ok=True)
+    unparsable = {}
+    while True:
+        for filename in sorted(os.listdir(queue_dir)):
+            if not filename.lower().endswith(".json"):
+                continue
+            file_path = os.path.join(queue_dir, filename)
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                request = json.loads(content or "{}")
+            except OSError:
+                continue  # File is locked by its writer or was picked up already
+            except ValueError as e:
+                if unparsable.get(filename) != content:
+                    misc.print_warning(f"Sync request file {filename} is not valid JSON yet, retrying: {e}")
+                    unparsable[filename] = content
+                continue
+
+            unparsable.pop(filename, None)
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            try:
+                enqueue(request)
+            except ValueError as e:
+                misc.print_warning(f"Ignoring sync request file {filename}: {e}")
+        time.sleep(1)
+
+
+misc.print_header(f"Git sync daemon - {environment}")
+refresh_session(force=True)
+
+sync_queue = SyncQueue(sync_workspace, max_workers=args.max_workers)
+sync_queue.start()
+
+if args.queue_dir:
+    threading.Thread(target=watch_queue_dir, args=(args.queue_dir,), name="queue-dir-watcher", daemon=True).start()
+    misc.print_info(f"Watching {os.path.abspath(args.queue_dir)} for sync requests.")
+
+try:
+    if args.port:
+        server = ThreadingHTTPServer((args.host, args.port), SyncRequestHandler)
+        misc.print_info(f"Listening on http://{args.host}:{server.server_address[1]} (POST /sync, GET /status).")
+        server.serve_forever()
+    else:
+        while True:
+            time.sleep(3600)
+except KeyboardInterrupt:
+    misc.print_info("Stopping git sync daemon...")
+    sync_queue.stop(wait=False)
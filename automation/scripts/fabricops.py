@@ -0,0 +1,133 @@
+#---------------------------------------------------------
+# FabricOps command line
+# Single entry point for the pipeline scripts. A subcommand runs one script
+# with the given arguments, 'run' chains several steps in one process, so
+# imported libraries, the Fabric CLI configuration and login, caches, the
+# Azure DevOps and GitHub HTTP sessions and the service principal credential
+# used by fabric-cicd are shared and the process starts only once.
+#
+# Usage:
+#   python automation/scripts/fabricops.py setup --environment dev
+#   python automation/scripts/fabricops.py sync-daemon --environment dev --queue_dir sync_requests
+#   python automation/scripts/fabricops.py run "setup --environment tst" "release --environment tst" "bind --environment tst"
+#---------------------------------------------------------
+import os, sys, time, runpy, shlex, atexit, argparse
+import modules.misc_functions as misc
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommands and the scripts they run
+COMMANDS = {
+    "setup": "fabric_setup.py",
+    "release": "fabric_release.py",
+    "sync": "fabric_gitsync_env.py",
+    "sync-daemon": "fabric_sync_daemon.py",
+    "feature": "fabric_feature_maintainance.py",
+    "build-params": "utils_build_parameter_file.py",
+    "build-params-dynamic": "utils_build_parameter_file_dynamic.py",
+    "build-models": "utils_build_semantic_models.py",
+    "bind": "utils_rebind_connections.py",
+    "bpa": "utils_run_bpa.py",
+}
+
+
+def run_step(command: str, arguments: list) -> int:
+    """
+    Runs the script of a subcommand in this process, as if it was started with the given arguments.
+
+    Args:
+        command (str): Subcommand, a key of COMMANDS.
+        arguments (list): Command line arguments passed to the script.
+
+    Returns:
+        int: Exit code of the script.
+    """
+    script = os.path.join(SCRIPTS_DIR, COMMANDS[command])
+    saved_argv, saved_cwd = sys.argv, os.getcwd()
+    sys.argv = [script] + arguments
+    try:
+        runpy.run_path(script, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code)
+        return 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        sys.stdout.flush()
+
+
+def parse_step(step: str) -> tuple:
+    """Splits a step of 'run' (e.g. "setup --environment dev") into its subcommand and arguments."""
+    parts = shlex.split(step, posix=os.name != "nt")
+    if not parts or parts[0] not in COMMANDS:
+        raise ValueError(f"Unknown step '{step}'. Steps start with one of: {', '.join(COMMANDS)}.")
+    return parts[0], [part.strip('"') for part in parts[1:]]
+
+
+def run_steps(steps: list, continue_on_error: bool = False) -> int:
+    """
+    Runs steps one after another in this process and prints the duration and result of each.
+
+    Returns:
+        int: Exit code of the first failed step, or 0.
+    """
+    import modules.fabric_cli_functions as fabcli
+
+    rows = []
+    exit_code = 0
+    for index, (command, arguments) in enumerate(steps):
+        misc.print_header(f"Step {index + 1}/{len(steps)}: {command} {' '.join(arguments)}".strip())
+        started = time.perf_counter()
+        step_exit_code = run_step(command, arguments)
+        rows.append((index + 1, f"{command} {' '.join(arguments)}".strip(), f"{time.perf_counter() - started:.1f}s", "✔" if step_exit_code == 0 else f"✖ exit code {step_exit_code}"))
+
+        # Every script registers the throttle summary, it is printed once at the end of the process
+        atexit.unregister(fabcli.print_throttle_summary)
+        atexit.register(fabcli.print_throttle_summary)
+
+        if step_exit_code:
+            exit_code = exit_code or step_exit_code
+            if not continue_on_error:
+                break
+
+    for index in range(len(rows), len(steps)):
+        command, arguments = steps[index]
+        rows.append((index + 1, f"{command} {' '.join(arguments)}".strip(), "", "skipped"))
+
+    print("")
+    misc.print_table(["Step", "Command", "Duration", "Result"], rows)
+    if exit_code:
+        misc.print_error(f"Run failed in step {next(row[0] for row in rows if row[3].startswith('✖'))}.", bold=True)
+    else:
+        misc.print_success(f"All {len(steps)} step(s) completed.", bold=True)
+    return exit_code
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        # Arguments of a subcommand belong to its script, which parses and documents them (e.g. setup --help)
+        sys.exit(run_step(sys.argv[1], sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        description="FabricOps command line. Runs a pipeline script as subcommand, or several steps in one process with 'run'.",
+        epilog=f"Subcommands: {', '.join(f'{command} ({script})' for command, script in COMMANDS.items())}. Arguments after the subcommand are passed to its script.")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="Runs several steps in one process, e.g. run \"setup --environment dev\" \"build-params --environments dev,tst\".")
+    run_parser.add_argument("steps", nargs="+", help="Steps to run, each a quoted subcommand with its arguments.")
+    run_parser.add_argument("--continue_on_error", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Runs the remaining steps after a failed step. Default is to stop at the first failure.")
+
+    args = parser.parse_args()
+    if args.command != "run":
+        parser.print_help()
+        sys.exit(2)
+
+    try:
+        steps = [parse_step(step) for step in args.steps]
+    except ValueError as e:
+        misc.print_error(str(e))
+        sys.exit(2)
+
+    sys.exit(run_steps(steps, args.continue_on_error))
@@ -1,8 +1,10 @@
 import os, sys, io, argparse, time
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
+import modules.trace_functions as tracing
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stdout.reconfigure(line_buffering=True)
 
 # Get arguments
@@ -14,8 +16,10 @@ parser.add_argument('--output_file', required=True, help="Path to output file wh
 parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
 
 args = parser.parse_args()
+tracing.start(args.trace)
 environment = args.environment
 layer = args.layer
 database = args.database    
@@ -25,12 +29,12 @@ client_secret = args.client_secret
 output_file = args.output_file
 
 # Authenticate
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(client_id, client_secret, tenant_id)
 
 # Load JSON environment files (main and environment specific) and merge
-main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
 env_definition = misc.merge_json(main_json, env_json)
 
 solution_name = env_definition.get("name")
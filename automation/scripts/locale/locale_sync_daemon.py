@@ -0,0 +1,44 @@
+#---------------------------------------------------------
+# Default values
+#---------------------------------------------------------
+environment = "dev" # Environment to sync
+port = 8765 # Port of the local HTTP endpoint (POST /sync, GET /status)
+queue_dir = None # Optional folder watched for sync request files (*.json, write as *.tmp and rename)
+use_mock_fabric = False # Run against the local Fabric emulator (mock/fabric_emulator.py, must be running) through the Fabric CLI shim (mock/mock_fab.py)
+
+#---------------------------------------------------------
+# Main script
+#---------------------------------------------------------
+import subprocess, os, sys
+
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.getcwd())
+
+import modules.auth_functions as authfunc
+
+script_path = 'fabric_sync_daemon.py'
+process_env = os.environ.copy()
+
+if use_mock_fabric:
+    process_env["FABRICOPS_FAB_EXECUTABLE"] = f'"{sys.executable}" "{os.path.abspath("mock/mock_fab.py")}"'
+    env_credentials = {"tenant_id": "mock", "client_id": "mock", "client_secret": "mock"}
+else:
+    env_credentials = authfunc.get_environment_credentials(environment, os.path.join(os.path.dirname(__file__), f'../../credentials/'))
+
+args = ["--environment", environment,
+        "--port", str(port),
+        "--tenant_id", env_credentials.get("tenant_id"),
+        "--client_id", env_credentials.get("client_id"),
+        "--client_secret", env_credentials.get("client_secret")
+        ]
+if queue_dir:
+    args += ["--queue_dir", queue_dir]
+
+process = subprocess.Popen([sys.executable, '-u', script_path] + args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', env=process_env)
+
+# Print output live
+for line in process.stdout:
+    print(line, end='')
+
+# Wait for the process to complete and get the exit code
+process.wait()
@@ -22,6 +22,7 @@ model_root_folder       = "solution/model"
 store_layer             = "Store"
 model_layer             = "Model"
 dev_environment         = "dev"  # Environment to use for credentials
+stream_model_files      = False  # Edit expressions directly in the JSON text of model.bim/database.json instead of parsing the full document. Recommended for very large models.
 
 target_files = {
     "expressions.tmdl",
@@ -99,14 +100,25 @@ if env_definition:
             if filename.lower() in target_files_lower:
                 file_path = os.path.join(root, filename)
                 if filename.lower().endswith((".bim", ".json")):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = json.load(f)
-                    
-                    new_content = misc.update_expression_tmsl("SqlEndpoint", content, sql_analytics_endpoint)
-                    new_content = misc.update_expression_tmsl("Database", new_content, lakehouse_name)
-                    
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(json.dumps(new_content, indent=2, ensure_ascii=False))
+                    expression_values = {"SqlEndpoint": sql_analytics_endpoint, "Database": lakehouse_name}
+
+                    if stream_model_files:
+                        # Read and write the raw text to keep line endings and formatting untouched
+                        with open(file_path, "r", encoding="utf-8", newline="") as f:
+                            content = f.read()
+
+                        new_content, _ = misc.update_expressions_tmsl_text(content, expression_values)
+
+                        with open(file_path, "w", encoding="utf-8", newline="") as f:
+                            f.write(new_content)
+                    else:
+                        with open(file_path, "r", encoding="utf-8") as f:
+                            content = json.load(f)
+
+                        misc.update_expressions_tmsl(content, expression_values)
+
+                        with open(file_path, "w", encoding="utf-8") as f:
+                            f.write(json.dumps(content, indent=2, ensure_ascii=False))
 
                 if filename.lower().endswith((".tmdl")):
                     with open(file_path, "r", encoding="utf-8") as f:
@@ -0,0 +1,864 @@
+#---------------------------------------------------------
+# Local Fabric API emulator
+# In-memory emulation of the Fabric and Power BI REST APIs used by the
+# automation scripts: workspaces, items, connections, role assignments,
+# managed private endpoints, workspace identities, git integration,
+# long running operations, semantic model binding, takeover and refresh.
+# Latency, pagination and throttling (HTTP 429) can be configured to test
+# the scripts under realistic conditions on a plain Linux box.
+#
+# Usage:
+#   python automation/scripts/mock/fabric_emulator.py --port 8780 --latency_ms 50 --throttle_rate 0.05
+#   set FABRICOPS_EMULATOR_URL=http://127.0.0.1:8780
+#   set FABRICOPS_FAB_EXECUTABLE="python automation/scripts/mock/mock_fab.py"
+#
+# Emulator endpoints:
+#   GET  /_emulator/stats     Requests by endpoint, throttled requests and object counts
+#   GET  /_emulator/state     Current state (can be passed to --seed)
+#   POST /_emulator/push      Simulate a new commit on the remote branch, optionally with the items of git
+#                             directories ({"items": {"solution/storage": [{"displayName": "Landing", "type": "Lakehouse"}]}})
+#
+# Updating a workspace from git creates the items of its git directory. Items are read from the push above or, if
+# none were pushed for the directory, from the <name>.<type> folders of the directory in --repository.
+#   POST /_emulator/reset     Remove all objects and reset the stats
+#   POST /_emulator/config    Change latency_ms, jitter_ms, page_size, throttle_rate, rate_limit, retry_after or lro_seconds
+#---------------------------------------------------------
+import os, re, sys, json, time, uuid, random, argparse, threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+PRINCIPAL_ID = "00000000-0000-0000-0000-00000000e0e0"  # Identity all requests are made with
+DEFAULT_CAPACITIES = ["YOUR_CAPACITY_NAME_HERE", "emulator"]
+DEFAULT_REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+GUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+FABRIC_PREFIX = "/v1/"
+POWERBI_PREFIX = "/v1.0/myorg/"
+
+DEFAULT_CONFIG = {
+    "latency_ms": 0,       # Added to every request
+    "jitter_ms": 0,        # Random latency added on top of latency_ms
+    "page_size": 100,      # Values per page of paginated listings
+    "throttle_rate": 0.0,  # Share of requests answered with 429, e.g. 0.05
+    "rate_limit": 0,       # Requests per second above which requests are answered with 429, 0 for no limit
+    "retry_after": 1,      # Retry-After of throttled responses in seconds
+    "lro_seconds": 2,      # Duration of long running operations and refreshes
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, error_code, message=None):
+        super().__init__(message or error_code)
+        self.status_code = status_code
+        self.error_code = error_code
+        self.message = message or error_code
+
+
+def now_utc():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+def deep_merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def normalize_endpoint(method, path):
+    return method + " " + re.sub(r"/\d+(?=/|$)", "/{n}", GUID_PATTERN.sub("{id}", path))
+
+
+class FabricEmulator:
+    """
+    State and request handling of the emulator. All state is kept in memory and guarded by one lock, request
+    handling is independent of the HTTP server so the emulator can also be used in-process.
+    """
+
+    def __init__(self, config: dict = None, capacities: list = None, seed: dict = None, repository: str = DEFAULT_REPOSITORY):
+        self.lock = threading.RLock()
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.capacity_names = capacities or DEFAULT_CAPACITIES
+        self.repository = repository
+        self.routes = self._get_routes()
+        self.reset()
+        if seed:
+            self.state = deep_merge(self.state, seed)
+
+    def reset(self):
+        with self.lock:
+            self.state = {
+                "remote_commit": "0000000000000001",
+                "repository": {},
+                "capacities": {str(uuid.uuid5(uuid.NAMESPACE_URL, name)): {"id": str(uuid.uuid5(uuid.NAMESPACE_URL, name)), "displayName": name, "sku": "F2", "region": "West Europe", "state": "Active"} for name in self.capacity_names},
+                "workspaces": {},
+                "connections": {},
+                "operations": {},
+                "refreshes": {},
+            }
+            self.stats = {"requests": 0, "throttled": 0, "by_endpoint": {}}
+            self.request_times = []
+
+    # ---------------------------------------------------------
+    # Request handling
+    # ---------------------------------------------------------
+
+    def handle(self, method: str, path: str, query: dict = None, body=None, base_url: str = ""):
+        """
+        Handles one request.
+
+        Returns:
+            tuple: (status_code, response body or None, response headers)
+        """
+        method = method.upper()
+        query = query or {}
+        if path.startswith("/_emulator/"):
+            return self._handle_admin(method, path, body)
+
+        delay = self.config["latency_ms"] + random.uniform(0, self.config["jitter_ms"])
+        if delay:
+            time.sleep(delay / 1000)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            endpoint = normalize_endpoint(method, path)
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+
+            if self._is_throttled():
+                self.stats["throttled"] += 1
+                retry_after = self.config["retry_after"]
+                return 429, {"errorCode": "RequestBlocked", "message": f"Request is blocked by the upstream service until retry after {retry_after} seconds."}, {"Retry-After": str(retry_after)}
+
+            for route_method, pattern, handler in self.routes:
+                match = pattern.fullmatch(path)
+                if match and route_method == method:
+                    try:
+                        return handler(*match.groups(), query=query, body=body or {}, base_url=base_url)
+                    except ApiError as e:
+                        return e.status_code, {"errorCode": e.error_code, "message": e.message}, {}
+            return 404, {"errorCode": "EntityNotFound", "message": f"{method} {path} is not supported by the emulator."}, {}
+
+    def _is_throttled(self):
+        if self.config["throttle_rate"] and random.random() < self.config["throttle_rate"]:
+            return True
+        if self.config["rate_limit"]:
+            now = time.monotonic()
+            self.request_times = [t for t in self.request_times if now - t < 1] + [now]
+            return len(self.request_times) > self.config["rate_limit"]
+        return False
+
+    def _handle_admin(self, method, path, body):
+        with self.lock:
+            if path == "/_emulator/stats" and method == "GET":
+                counts = {
+                    "workspaces": len(self.state["workspaces"]),
+                    "items": sum(len(ws["items"]) for ws in self.state["workspaces"].values()),
+                    "connections": len(self.state["connections"]),
+                }
+                return 200, {**self.stats, "objects": counts}, {}
+            if path == "/_emulator/state" and method == "GET":
+                return 200, self.snapshot(), {}
+            if path == "/_emulator/push" and method == "POST":
+                self.state["remote_commit"] = (body or {}).get("commit") or uuid.uuid4().hex[:16]
+                self.state["repository"].update((body or {}).get("items") or {})
+                return 200, {"remote_commit": self.state["remote_commit"]}, {}
+            if path == "/_emulator/reset" and method == "POST":
+                self.reset()
+                return 200, {}, {}
+            if path == "/_emulator/stats/reset" and method == "POST":
+                self.stats = {"requests": 0, "throttled": 0, "by_endpoint": {}}
+                return 200, {}, {}
+            if path == "/_emulator/config" and method == "POST":
+                self.config.update({key: value for key, value in (body or {}).items() if key in DEFAULT_CONFIG})
+                return 200, self.config, {}
+        return 404, {"errorCode": "EntityNotFound"}, {}
+
+    def _get_routes(self):
+        guid = r"([0-9a-fA-F-]{36})"
+        routes = [
+            ("GET", "capacities", self.list_capacities),
+            ("GET", "workspaces", self.list_workspaces),
+            ("POST", "workspaces", self.create_workspace),
+            ("GET", f"workspaces/{guid}", self.get_workspace),
+            ("PATCH", f"workspaces/{guid}", self.update_workspace),
+            ("DELETE", f"workspaces/{guid}", self.delete_workspace),
+            ("POST", f"workspaces/{guid}/provisionIdentity", self.provision_identity),
+            ("POST", f"workspaces/{guid}/deprovisionIdentity", self.deprovision_identity),
+            ("GET", f"workspaces/{guid}/folders", self.list_folders),
+            ("POST", f"workspaces/{guid}/folders", self.create_folder),
+            ("DELETE", f"workspaces/{guid}/folders/{guid}", self.delete_folder),
+            ("GET", f"workspaces/{guid}/roleAssignments", self.list_workspace_role_assignments),
+            ("POST", f"workspaces/{guid}/roleAssignments", self.add_workspace_role_assignment),
+            ("PATCH", f"workspaces/{guid}/roleAssignments/([^/]+)", self.update_workspace_role_assignment),
+            ("DELETE", f"workspaces/{guid}/roleAssignments/([^/]+)", self.delete_workspace_role_assignment),
+            ("GET", f"workspaces/{guid}/items", self.list_items),
+            ("POST", f"workspaces/{guid}/items", self.create_item),
+            ("GET", f"workspaces/{guid}/items/{guid}", self.get_item),
+            ("PATCH", f"workspaces/{guid}/items/{guid}", self.update_item),
+            ("DELETE", f"workspaces/{guid}/items/{guid}", self.delete_item),
+            ("POST", f"workspaces/{guid}/items/{guid}/getDefinition", self.get_item_definition),
+            ("POST", f"workspaces/{guid}/items/{guid}/updateDefinition", self.update_item_definition),
+            ("POST", f"workspaces/{guid}/semanticModels/{guid}/bindConnection", self.bind_connection),
+            ("GET", f"workspaces/{guid}/managedPrivateEndpoints", self.list_private_endpoints),
+            ("POST", f"workspaces/{guid}/managedPrivateEndpoints", self.create_private_endpoint),
+            ("GET", f"workspaces/{guid}/managedPrivateEndpoints/{guid}", self.get_private_endpoint),
+            ("DELETE", f"workspaces/{guid}/managedPrivateEndpoints/{guid}", self.delete_private_endpoint),
+            ("GET", f"workspaces/{guid}/spark/settings", self.get_spark_settings),
+            ("PATCH", f"workspaces/{guid}/spark/settings", self.update_spark_settings),
+            ("GET", f"workspaces/{guid}/git/connection", self.get_git_connection),
+            ("POST", f"workspaces/{guid}/git/connect", self.connect_git),
+            ("POST", f"workspaces/{guid}/git/initializeConnection", self.initialize_git_connection),
+            ("POST", f"workspaces/{guid}/git/disconnect", self.disconnect_git),
+            ("GET", f"workspaces/{guid}/git/status", self.get_git_status),
+            ("POST", f"workspaces/{guid}/git/updateFromGit", self.update_from_git),
+            ("GET", "connections", self.list_connections),
+            ("POST", "connections", self.create_connection),
+            ("GET", f"connections/{guid}", self.get_connection),
+            ("PATCH", f"connections/{guid}", self.update_connection),
+            ("DELETE", f"connections/{guid}", self.delete_connection),
+            ("GET", f"connections/{guid}/roleAssignments", self.list_connection_role_assignments),
+            ("POST", f"connections/{guid}/roleAssignments", self.add_connection_role_assignment),
+            ("DELETE", f"connections/{guid}/roleAssignments/([^/]+)", self.delete_connection_role_assignment),
+            ("GET", f"operations/{guid}", self.get_operation),
+            ("GET", f"operations/{guid}/result", self.get_operation_result),
+        ]
+        powerbi_routes = [
+            ("GET", f"groups/{guid}/datasets", self.list_datasets),
+            ("POST", f"groups/{guid}/datasets/{guid}/Default.TakeOver", self.take_over_dataset),
+            ("POST", f"groups/{guid}/datasets/{guid}/refreshes", self.refresh_dataset),
+            ("GET", f"groups/{guid}/datasets/{guid}/refreshes/([^/]+)", self.get_refresh),
+        ]
+        return (
+            [(method, re.compile(re.escape(FABRIC_PREFIX) + pattern), handler) for method, pattern, handler in routes]
+            + [(method, re.compile(re.escape(POWERBI_PREFIX) + pattern), handler) for method, pattern, handler in powerbi_routes]
+        )
+
+    # ---------------------------------------------------------
+    # Helpers
+    # ---------------------------------------------------------
+
+    def _page(self, values, query, base_url, path):
+        """Returns one page of a listing, with a continuation token if more values follow."""
+        page_size = max(1, int(self.config["page_size"]))
+        offset = int((query.get("continuationToken") or ["0"])[0] or 0)
+        page = {"value": values[offset:offset + page_size]}
+        if offset + page_size < len(values):
+            page["continuationToken"] = str(offset + page_size)
+            page["continuationUri"] = f"{base_url}{path}?continuationToken={offset + page_size}"
+        return 200, page, {}
+
+    def _workspace(self, workspace_id):
+        workspace = self.state["workspaces"].get(workspace_id.lower())
+        if not workspace:
+            raise ApiError(404, "WorkspaceNotFound", f"Workspace {workspace_id} not found.")
+        return workspace
+
+    def _item(self, workspace_id, item_id):
+        item = self._workspace(workspace_id)["items"].get(item_id.lower())
+        if not item:
+            raise ApiError(404, "ItemNotFound", f"Item {item_id} not found.")
+        return item
+
+    def _connection(self, connection_id):
+        connection = self.state["connections"].get(connection_id.lower())
+        if not connection:
+            raise ApiError(404, "ConnectionNotFound", f"Connection {connection_id} not found.")
+        return connection
+
+    def _start_operation(self, apply, base_url):
+        """Starts a long running operation; apply is called when the operation completes and returns its result."""
+        operation_id = new_id()
+        self.state["operations"][operation_id] = {
+            "id": operation_id, "status": "Running", "createdTimeUtc": now_utc(),
+            "ready_at": time.time() + self.config["lro_seconds"], "apply": apply, "result": None,
+        }
+        headers = {
+            "x-ms-operation-id": operation_id,
+            "Location": f"{base_url}{FABRIC_PREFIX}operations/{operation_id}",
+            "Retry-After": str(max(1, int(self.config["lro_seconds"]))),
+        }
+        return 202, None, headers
+
+    @staticmethod
+    def _workspace_view(workspace):
+        view = {key: workspace[key] for key in ("id", "displayName", "description", "type", "capacityId")}
+        if workspace.get("workspaceIdentity"):
+            view["workspaceIdentity"] = workspace["workspaceIdentity"]
+        return view
+
+    @staticmethod
+    def _item_view(item, include_properties=False):
+        view = {key: value for key, value in item.items() if key not in ("definition", "properties") and value is not None}
+        if include_properties and item.get("properties"):
+            view["properties"] = item["properties"]
+        return view
+
+    @staticmethod
+    def _item_properties(item_type, name, workspace_id):
+        host = f"{workspace_id[:8]}-emulator.datawarehouse.fabric.microsoft.com"
+        if item_type == "Lakehouse":
+            # Both the REST API shape (sqlEndpointProperties) and the flattened connection string are returned,
+            # as the scripts read both
+            return {
+                "oneLakeTablesPath": f"https://onelake.dfs.fabric.microsoft.com/{workspace_id}/{name}/Tables",
+                "oneLakeFilesPath": f"https://onelake.dfs.fabric.microsoft.com/{workspace_id}/{name}/Files",
+                "sqlEndpointProperties": {"connectionString": host, "id": new_id(), "provisioningStatus": "Success"},
+                "connectionString": host,
+            }
+        if item_type == "Warehouse":
+            return {"connectionString": host, "createdDate": now_utc()}
+        if item_type == "SQLDatabase":
+            return {"serverFqdn": f"{workspace_id[:8]}-emulator.database.fabric.microsoft.com,1433", "databaseName": f"{name}-{workspace_id[:8]}"}
+        return None
+
+    # ---------------------------------------------------------
+    # Capacities and workspaces
+    # ---------------------------------------------------------
+
+    def list_capacities(self, query, body, base_url):
+        return self._page(list(self.state["capacities"].values()), query, base_url, f"{FABRIC_PREFIX}capacities")
+
+    def list_workspaces(self, query, body, base_url):
+        workspaces = [self._workspace_view(workspace) for workspace in self.state["workspaces"].values()]
+        return self._page(workspaces, query, base_url, f"{FABRIC_PREFIX}workspaces")
+
+    def create_workspace(self, query, body, base_url):
+        name = body.get("displayName")
+        if not name:
+            raise ApiError(400, "InvalidInput", "displayName is required.")
+        if any(workspace["displayName"] == name for workspace in self.state["workspaces"].values()):
+            raise ApiError(409, "WorkspaceNameAlreadyExists", f"Workspace '{name}' already exists.")
+        if body.get("capacityId") and body.get("capacityId").lower() not in self.state["capacities"]:
+            raise ApiError(404, "CapacityNotFound", f"Capacity {body.get('capacityId')} not found.")
+
+        workspace_id = new_id()
+        self.state["workspaces"][workspace_id] = {
+            "id": workspace_id, "displayName": name, "description": body.get("description", ""), "type": "Workspace",
+            "capacityId": body.get("capacityId"), "items": {}, "definitions": {}, "folders": {},
+            "role_assignments": {PRINCIPAL_ID: {"id": PRINCIPAL_ID, "principal": {"id": PRINCIPAL_ID, "type": "ServicePrincipal"}, "role": "Admin"}},
+            "private_endpoints": {}, "spark_settings": {"automaticLog": {"enabled": True}, "pool": {"starterPool": {"maxNodeCount": 10, "maxExecutors": 9}}},
+            "git": {"gitConnectionState": "NotConnected", "gitProviderDetails": None, "head": None},
+        }
+        return 201, self._workspace_view(self.state["workspaces"][workspace_id]), {}
+
+    def get_workspace(self, workspace_id, query, body, base_url):
+        return 200, self._workspace_view(self._workspace(workspace_id)), {}
+
+    def update_workspace(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        for key in ("displayName", "description"):
+            if key in body:
+                workspace[key] = body[key]
+        return 200, self._workspace_view(workspace), {}
+
+    def delete_workspace(self, workspace_id, query, body, base_url):
+        self._workspace(workspace_id)
+        del self.state["workspaces"][workspace_id.lower()]
+        return 200, None, {}
+
+    def provision_identity(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+
+        def apply():
+            workspace["workspaceIdentity"] = workspace.get("workspaceIdentity") or {"applicationId": new_id(), "servicePrincipalId": new_id()}
+            return workspace["workspaceIdentity"]
+        return self._start_operation(apply, base_url)
+
+    def deprovision_identity(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+
+        def apply():
+            workspace.pop("workspaceIdentity", None)
+        return self._start_operation(apply, base_url)
+
+    def list_folders(self, workspace_id, query, body, base_url):
+        folders = list(self._workspace(workspace_id)["folders"].values())
+        return self._page(folders, query, base_url, f"{FABRIC_PREFIX}workspaces/{workspace_id}/folders")
+
+    def create_folder(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        name, parent_id = body.get("displayName"), body.get("parentFolderId")
+        if any(folder["displayName"] == name and folder.get("parentFolderId") == parent_id for folder in workspace["folders"].values()):
+            raise ApiError(409, "FolderDisplayNameAlreadyInUse", f"Folder '{name}' already exists.")
+        folder_id = new_id()
+        workspace["folders"][folder_id] = {"id": folder_id, "displayName": name, "workspaceId": workspace["id"], "parentFolderId": parent_id}
+        return 201, workspace["folders"][folder_id], {}
+
+    def delete_folder(self, workspace_id, folder_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        if any(item.get("folderId") == folder_id.lower() for item in workspace["items"].values()):
+            raise ApiError(400, "FolderNotEmpty")
+        if not workspace["folders"].pop(folder_id.lower(), None):
+            raise ApiError(404, "FolderNotFound")
+        return 200, None, {}
+
+    # ---------------------------------------------------------
+    # Role assignments
+    # ---------------------------------------------------------
+
+    def list_workspace_role_assignments(self, workspace_id, query, body, base_url):
+        assignments = list(self._workspace(workspace_id)["role_assignments"].values())
+        return self._page(assignments, query, base_url, f"{FABRIC_PREFIX}workspaces/{workspace_id}/roleAssignments")
+
+    def add_workspace_role_assignment(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        principal = body.get("principal") or {}
+        if not principal.get("id") or not body.get("role"):
+            raise ApiError(400, "InvalidInput", "principal.id and role are required.")
+        if principal["id"].lower() in workspace["role_assignments"]:
+            raise ApiError(409, "PrincipalAlreadyHasWorkspaceRolePermissions", "The principal already has a role in the workspace.")
+        assignment = {"id": principal["id"].lower(), "principal": principal, "role": body.get("role")}
+        workspace["role_assignments"][principal["id"].lower()] = assignment
+        return 201, assignment, {}
+
+    def update_workspace_role_assignment(self, workspace_id, assignment_id, query, body, base_url):
+        assignment = self._workspace(workspace_id)["role_assignments"].get(assignment_id.lower())
+        if not assignment:
+            raise ApiError(404, "WorkspaceRoleAssignmentNotFound")
+        assignment["role"] = body.get("role", assignment["role"])
+        return 200, assignment, {}
+
+    def delete_workspace_role_assignment(self, workspace_id, assignment_id, query, body, base_url):
+        if not self._workspace(workspace_id)["role_assignments"].pop(assignment_id.lower(), None):
+            raise ApiError(404, "WorkspaceRoleAssignmentNotFound")
+        return 200, None, {}
+
+    # ---------------------------------------------------------
+    # Items
+    # ---------------------------------------------------------
+
+    def list_items(self, workspace_id, query, body, base_url):
+        item_type = (query.get("type") or [None])[0]
+        items = [self._item_view(item) for item in self._workspace(workspace_id)["items"].values() if not item_type or item["type"] == item_type]
+        return self._page(items, query, base_url, f"{FABRIC_PREFIX}workspaces/{workspace_id}/items")
+
+    def _add_item(self, workspace, name, item_type, description=None, folder_id=None, definition=None):
+        item_id = new_id()
+        workspace["items"][item_id] = {
+            "id": item_id, "type": item_type, "displayName": name, "description": description or "",
+            "workspaceId": workspace["id"], "folderId": folder_id,
+            "properties": self._item_properties(item_type, name, workspace["id"]),
+        }
+        if definition:
+            workspace["definitions"][item_id] = definition
+        if item_type == "Lakehouse":
+            endpoint_id = workspace["items"][item_id]["properties"]["sqlEndpointProperties"]["id"]
+            workspace["items"][endpoint_id] = {"id": endpoint_id, "type": "SQLEndpoint", "displayName": name, "description": "", "workspaceId": workspace["id"], "folderId": folder_id}
+        return workspace["items"][item_id]
+
+    def create_item(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        name, item_type = body.get("displayName"), body.get("type")
+        if not name or not item_type:
+            raise ApiError(400, "InvalidInput", "displayName and type are required.")
+        if any(item["displayName"] == name and item["type"] == item_type for item in workspace["items"].values()):
+            raise ApiError(409, "ItemDisplayNameAlreadyInUse", f"{item_type} '{name}' already exists.")
+
+        if body.get("definition"):
+            return self._start_operation(lambda: self._item_view(self._add_item(workspace, name, item_type, body.get("description"), body.get("folderId"), body.get("definition"))), base_url)
+        return 201, self._item_view(self._add_item(workspace, name, item_type, body.get("description"), body.get("folderId"))), {}
+
+    def get_item(self, workspace_id, item_id, query, body, base_url):
+        return 200, self._item_view(self._item(workspace_id, item_id), include_properties=True), {}
+
+    def update_item(self, workspace_id, item_id, query, body, base_url):
+        item = self._item(workspace_id, item_id)
+        for key in ("displayName", "description"):
+            if key in body:
+                item[key] = body[key]
+        return 200, self._item_view(item), {}
+
+    def delete_item(self, workspace_id, item_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        self._item(workspace_id, item_id)
+        del workspace["items"][item_id.lower()]
+        workspace["definitions"].pop(item_id.lower(), None)
+        return 200, None, {}
+
+    def get_item_definition(self, workspace_id, item_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        item = self._item(workspace_id, item_id)
+        definition = workspace["definitions"].get(item["id"]) or {"parts": []}
+        return self._start_operation(lambda: {"definition": definition}, base_url)
+
+    def update_item_definition(self, workspace_id, item_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        item = self._item(workspace_id, item_id)
+        workspace["definitions"][item["id"]] = body.get("definition") or {"parts": []}
+        return 200, None, {}
+
+    def bind_connection(self, workspace_id, item_id, query, body, base_url):
+        item = self._item(workspace_id, item_id)
+        if item["type"] != "SemanticModel":
+            raise ApiError(400, "InvalidItemType", "Item is not a semantic model.")
+        binding = body.get("connectionBinding") or {}
+        if binding.get("id"):
+            self._connection(binding["id"])
+        item["connectionBinding"] = binding
+        return 200, None, {}
+
+    # ---------------------------------------------------------
+    # Managed private endpoints and spark settings
+    # ---------------------------------------------------------
+
+    def list_private_endpoints(self, workspace_id, query, body, base_url):
+        endpoints = list(self._workspace(workspace_id)["private_endpoints"].values())
+        return self._page(endpoints, query, base_url, f"{FABRIC_PREFIX}workspaces/{workspace_id}/managedPrivateEndpoints")
+
+    def create_private_endpoint(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        if any(endpoint["name"] == body.get("name") for endpoint in workspace["private_endpoints"].values()):
+            raise ApiError(409, "ManagedPrivateEndpointAlreadyExists")
+        endpoint_id = new_id()
+        workspace["private_endpoints"][endpoint_id] = {
+            "id": endpoint_id, "name": body.get("name"), "targetPrivateLinkResourceId": body.get("targetPrivateLinkResourceId"),
+            "targetSubresourceType": body.get("targetSubresourceType"), "provisioningState": "Succeeded",
+            "connectionState": {"status": "Approved" if body.get("autoApproveEnabled") else "Pending", "description": body.get("requestMessage", "")},
+        }
+        return 201, workspace["private_endpoints"][endpoint_id], {}
+
+    def get_private_endpoint(self, workspace_id, endpoint_id, query, body, base_url):
+        endpoint = self._workspace(workspace_id)["private_endpoints"].get(endpoint_id.lower())
+        if not endpoint:
+            raise ApiError(404, "ManagedPrivateEndpointNotFound")
+        return 200, endpoint, {}
+
+    def delete_private_endpoint(self, workspace_id, endpoint_id, query, body, base_url):
+        if not self._workspace(workspace_id)["private_endpoints"].pop(endpoint_id.lower(), None):
+            raise ApiError(404, "ManagedPrivateEndpointNotFound")
+        return 200, None, {}
+
+    def get_spark_settings(self, workspace_id, query, body, base_url):
+        return 200, self._workspace(workspace_id)["spark_settings"], {}
+
+    def update_spark_settings(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        deep_merge(workspace["spark_settings"], body)
+        return 200, workspace["spark_settings"], {}
+
+    # ---------------------------------------------------------
+    # Git integration
+    # ---------------------------------------------------------
+
+    def get_git_connection(self, workspace_id, query, body, base_url):
+        git = self._workspace(workspace_id)["git"]
+        connection = {"gitConnectionState": git["gitConnectionState"], "gitProviderDetails": git["gitProviderDetails"]}
+        if git["head"]:
+            connection["gitSyncDetails"] = {"head": git["head"], "lastSyncTime": git.get("lastSyncTime")}
+        return 200, connection, {}
+
+    def connect_git(self, workspace_id, query, body, base_url):
+        git = self._workspace(workspace_id)["git"]
+        if git["gitConnectionState"] != "NotConnected":
+            raise ApiError(409, "WorkspaceAlreadyConnectedToGit")
+        connection_id = (body.get("myGitCredentials") or {}).get("connectionId")
+        if connection_id:
+            self._connection(connection_id)
+        git.update({"gitConnectionState": "Connected", "gitProviderDetails": body.get("gitProviderDetails"), "head": None})
+        return 200, None, {}
+
+    def initialize_git_connection(self, workspace_id, query, body, base_url):
+        git = self._workspace(workspace_id)["git"]
+        if git["gitConnectionState"] == "NotConnected":
+            raise ApiError(400, "WorkspaceNotConnectedToGit")
+        git["gitConnectionState"] = "ConnectedAndInitialized"
+        remote_commit = self.state["remote_commit"]
+        required_action = "None" if git["head"] == remote_commit else "UpdateFromGit"
+        return 200, {"requiredAction": required_action, "workspaceHead": git["head"], "remoteCommitHash": remote_commit}, {}
+
+    def disconnect_git(self, workspace_id, query, body, base_url):
+        git = self._workspace(workspace_id)["git"]
+        if git["gitConnectionState"] == "NotConnected":
+            raise ApiError(400, "WorkspaceNotConnectedToGit")
+        git.update({"gitConnectionState": "NotConnected", "gitProviderDetails": None, "head": None})
+        return 200, None, {}
+
+    def _get_repository_items(self, directory):
+        """Returns the items of a git directory as (display name, type)."""
+        directory = (directory or "").strip("/")
+        if directory in self.state["repository"]:
+            return [(item.get("displayName"), item.get("type")) for item in self.state["repository"][directory]]
+
+        items = []
+        folder = os.path.join(self.repository or "", directory)
+        for name in sorted(os.listdir(folder)) if self.repository and os.path.isdir(folder) else []:
+            platform_file = os.path.join(folder, name, ".platform")
+            if not os.path.isfile(platform_file):
+                continue
+            try:
+                with open(platform_file, "r", encoding="utf-8") as f:
+                    metadata = json.load(f).get("metadata") or {}
+            except ValueError:
+                metadata = {}
+            display_name, _, item_type = name.rpartition(".")
+            items.append((metadata.get("displayName") or display_name, metadata.get("type") or item_type))
+        return items
+
+    def _get_git_changes(self, workspace, git):
+        existing = {(item["displayName"], item["type"]) for item in workspace["items"].values()}
+        changes = [
+            {"itemMetadata": {"itemIdentifier": {"logicalId": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{name}.{item_type}"))}, "itemType": item_type, "displayName": name}, "remoteChange": "Added", "workspaceChange": None, "conflictType": "None"}
+            for name, item_type in self._get_repository_items((git["gitProviderDetails"] or {}).get("directoryName")) if (name, item_type) not in existing
+        ]
+        if not changes and git["head"] != self.state["remote_commit"]:
+            changes.append({"itemMetadata": {"itemIdentifier": {"logicalId": new_id()}, "itemType": "Notebook", "displayName": "Emulated"}, "remoteChange": "Modified", "workspaceChange": None, "conflictType": "None"})
+        return changes
+
+    def get_git_status(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        git = workspace["git"]
+        if git["gitConnectionState"] != "ConnectedAndInitialized":
+            raise ApiError(400, "WorkspaceNotConnectedToGit")
+        return 200, {"workspaceHead": git["head"], "remoteCommitHash": self.state["remote_commit"], "changes": self._get_git_changes(workspace, git)}, {}
+
+    def update_from_git(self, workspace_id, query, body, base_url):
+        workspace = self._workspace(workspace_id)
+        git = workspace["git"]
+        if git["gitConnectionState"] != "ConnectedAndInitialized":
+            raise ApiError(400, "WorkspaceNotConnectedToGit")
+        commit = body.get("remoteCommitHash") or self.state["remote_commit"]
+
+        def apply():
+            for change in self._get_git_changes(workspace, git):
+                if change["remoteChange"] == "Added":
+                    self._add_item(workspace, change["itemMetadata"]["displayName"], change["itemMetadata"]["itemType"])
+            git.update({"head": commit, "lastSyncTime": now_utc()})
+        return self._start_operation(apply, base_url)
+
+    # ---------------------------------------------------------
+    # Connections
+    # ---------------------------------------------------------
+
+    @staticmethod
+    def _connection_view(connection):
+        return {key: value for key, value in connection.items() if key != "role_assignments"}
+
+    def list_connections(self, query, body, base_url):
+        connections = [self._connection_view(connection) for connection in self.state["connections"].values()]
+        return self._page(connections, query, base_url, f"{FABRIC_PREFIX}connections")
+
+    def create_connection(self, query, body, base_url):
+        name = body.get("displayName")
+        if not name:
+            raise ApiError(400, "InvalidInput", "displayName is required.")
+        if any(connection["displayName"] == name for connection in self.state["connections"].values()):
+            raise ApiError(409, "DuplicateConnectionName", f"Connection '{name}' already exists.")
+
+        details = body.get("connectionDetails") or {}
+        parameters = details.get("parameters") or []
+        path = ";".join(str(parameter.get("value")) for parameter in parameters if parameter.get("name") in ("server", "database", "url"))
+        connection_id = new_id()
+        self.state["connections"][connection_id] = {
+            "id": connection_id, "displayName": name, "connectivityType": body.get("connectivityType", "ShareableCloud"),
+            "connectionDetails": {"type": details.get("type"), "path": path},
+            "privacyLevel": body.get("privacyLevel", "Organizational"),
+            "credentialDetails": {
+                "credentialType": (body.get("credentialDetails") or {}).get("credentials", {}).get("credentialType") or (body.get("credentialDetails") or {}).get("type"),
+                "connectionEncryption": (body.get("credentialDetails") or {}).get("connectionEncryption"),
+                "singleSignOnType": "None", "skipTestConnection": False,
+            },
+            "role_assignments": {PRINCIPAL_ID: {"id": PRINCIPAL_ID, "principal": {"id": PRINCIPAL_ID, "type": "ServicePrincipal"}, "role": "Owner"}},
+        }
+        return 201, self._connection_view(self.state["connections"][connection_id]), {}
+
+    def get_connection(self, connection_id, query, body, base_url):
+        return 200, self._connection_view(self._connection(connection_id)), {}
+
+    def update_connection(self, connection_id, query, body, base_url):
+        connection = self._connection(connection_id)
+        for key in ("displayName", "privacyLevel"):
+            if key in body:
+                connection[key] = body[key]
+        return 200, self._connection_view(connection), {}
+
+    def delete_connection(self, connection_id, query, body, base_url):
+        self._connection(connection_id)
+        del self.state["connections"][connection_id.lower()]
+        return 200, None, {}
+
+    def list_connection_role_assignments(self, connection_id, query, body, base_url):
+        assignments = list(self._connection(connection_id)["role_assignments"].values())
+        return self._page(assignments, query, base_url, f"{FABRIC_PREFIX}connections/{connection_id}/roleAssignments")
+
+    def add_connection_role_assignment(self, connection_id, query, body, base_url):
+        connection = self._connection(connection_id)
+        principal = body.get("principal") or {}
+        if not principal.get("id") or not body.get("role"):
+            raise ApiError(400, "InvalidInput", "principal.id and role are required.")
+        if principal["id"].lower() in connection["role_assignments"]:
+            raise ApiError(409, "ConnectionRoleAssignmentAlreadyExists")
+        assignment = {"id": principal["id"].lower(), "principal": principal, "role": body.get("role")}
+        connection["role_assignments"][principal["id"].lower()] = assignment
+        return 201, assignment, {}
+
+    def delete_connection_role_assignment(self, connection_id, assignment_id, query, body, base_url):
+        if not self._connection(connection_id)["role_assignments"].pop(assignment_id.lower(), None):
+            raise ApiError(404, "ConnectionRoleAssignmentNotFound")
+        return 200, None, {}
+
+    # ---------------------------------------------------------
+    # Long running operations
+    # ---------------------------------------------------------
+
+    def _complete_operation(self, operation):
+        if operation["status"] == "Running" and time.time() >= operation["ready_at"]:
+            try:
+                operation["result"] = operation.pop("apply")()
+                operation["status"] = "Succeeded"
+            except ApiError as e:
+                operation["error"] = {"errorCode": e.error_code, "message": e.message}
+                operation["status"] = "Failed"
+            operation["lastUpdatedTimeUtc"] = now_utc()
+        return operation
+
+    def get_operation(self, operation_id, query, body, base_url):
+        operation = self.state["operations"].get(operation_id.lower())
+        if not operation:
+            raise ApiError(404, "OperationNotFound")
+        operation = self._complete_operation(operation)
+        elapsed = 1 - max(0.0, operation["ready_at"] - time.time()) / max(self.config["lro_seconds"], 0.001)
+        view = {
+            "status": operation["status"], "createdTimeUtc": operation["createdTimeUtc"], "lastUpdatedTimeUtc": operation.get("lastUpdatedTimeUtc", now_utc()),
+            "percentComplete": 100 if operation["status"] != "Running" else int(min(99, max(0, elapsed * 100))),
+        }
+        if operation.get("error"):
+            view["error"] = operation["error"]
+        headers = {"Retry-After": "1"} if operation["status"] == "Running" else {}
+        return 200, view, headers
+
+    def get_operation_result(self, operation_id, query, body, base_url):
+        operation = self.state["operations"].get(operation_id.lower())
+        if not operation:
+            raise ApiError(404, "OperationNotFound")
+        if self._complete_operation(operation)["status"] != "Succeeded":
+            raise ApiError(400, "OperationNotSucceeded")
+        return 200, operation["result"], {}
+
+    # ---------------------------------------------------------
+    # Power BI datasets
+    # ---------------------------------------------------------
+
+    def list_datasets(self, workspace_id, query, body, base_url):
+        datasets = [
+            {"id": item["id"], "name": item["displayName"], "configuredBy": item.get("configuredBy", "owner@emulator"), "isRefreshable": True}
+            for item in self._workspace(workspace_id)["items"].values() if item["type"] == "SemanticModel"
+        ]
+        return 200, {"value": datasets}, {}
+
+    def take_over_dataset(self, workspace_id, dataset_id, query, body, base_url):
+        self._item(workspace_id, dataset_id)["configuredBy"] = PRINCIPAL_ID
+        return 200, None, {}
+
+    def refresh_dataset(self, workspace_id, dataset_id, query, body, base_url):
+        self._item(workspace_id, dataset_id)
+        request_id = new_id()
+        self.state["refreshes"][request_id] = {"requestId": request_id, "startTime": now_utc(), "ready_at": time.time() + self.config["lro_seconds"], "type": body.get("type", "full")}
+        location = f"{base_url}{POWERBI_PREFIX}groups/{workspace_id}/datasets/{dataset_id}/refreshes/{request_id}"
+        return 202, None, {"Location": location, "x-ms-request-id": request_id, "RequestId": request_id}
+
+    def get_refresh(self, workspace_id, dataset_id, request_id, query, body, base_url):
+        refresh = self.state["refreshes"].get(request_id.lower())
+        if not refresh:
+            raise ApiError(404, "RefreshNotFound")
+        completed = time.time() >= refresh["ready_at"]
+        return 200, {
+            "requestId": refresh["requestId"], "startTime": refresh["startTime"], "type": refresh["type"],
+            "status": "Completed" if completed else "Unknown", "extendedStatus": "Completed" if completed else "InProgress",
+            "messages": [],
+        }, {}
+
+    def snapshot(self) -> dict:
+        """Returns the state without pending operations, e.g. to persist it for --seed."""
+        with self.lock:
+            return json.loads(json.dumps({key: value for key, value in self.state.items() if key != "operations"}))
+
+
+def create_handler(emulator: FabricEmulator, quiet: bool = True):
+    class EmulatorRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw_body = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except ValueError:
+                body = None
+            base_url = f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address[:2]}"
+
+            status_code, response_body, headers = emulator.handle(self.command, url.path, parse_qs(url.query), body, base_url)
+            payload = json.dumps(response_body, default=str).encode("utf-8") if response_body is not None else b""
+            self.send_response(status_code)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return EmulatorRequestHandler
+
+
+def start_server(emulator: FabricEmulator, host: str = "127.0.0.1", port: int = 8780, quiet: bool = True) -> ThreadingHTTPServer:
+    """
+    Starts the emulator on a background thread. Use port 0 to pick a free port (see server.server_address).
+
+    Returns:
+        ThreadingHTTPServer: The running server, stop it with server.shutdown().
+    """
+    server = ThreadingHTTPServer((host, port), create_handler(emulator, quiet))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fabric-emulator", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Fabric API emulator")
+    parser.add_argument("--host", required=False, default="127.0.0.1", help="Host to listen on. Default is 127.0.0.1.")
+    parser.add_argument("--port", required=False, default=8780, type=int, help="Port to listen on. Default is 8780.")
+    parser.add_argument("--latency_ms", required=False, default=0, type=float, help="Latency added to every request in milliseconds.")
+    parser.add_argument("--jitter_ms", required=False, default=0, type=float, help="Random latency added on top of --latency_ms in milliseconds.")
+    parser.add_argument("--page_size", required=False, default=100, type=int, help="Values per page of paginated listings. Default is 100.")
+    parser.add_argument("--throttle_rate", required=False, default=0.0, type=float, help="Share of requests answered with HTTP 429, e.g. 0.05.")
+    parser.add_argument("--rate_limit", required=False, default=0, type=int, help="Requests per second above which requests are answered with HTTP 429.")
+    parser.add_argument("--retry_after", required=False, default=1, type=int, help="Retry-After of throttled responses in seconds. Default is 1.")
+    parser.add_argument("--lro_seconds", required=False, default=2, type=float, help="Duration of long running operations and refreshes in seconds. Default is 2.")
+    parser.add_argument("--capacities", required=False, default=",".join(DEFAULT_CAPACITIES), help="Comma separated names of the emulated capacities.")
+    parser.add_argument("--seed", required=False, help="JSON file with the initial state, e.g. saved from GET /_emulator/state.")
+    parser.add_argument("--repository", required=False, default=DEFAULT_REPOSITORY, help="Local copy of the git repository workspaces are updated from. Defaults to this repository.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    seed = None
+    if args.seed:
+        with open(args.seed, "r", encoding="utf-8") as f:
+            seed = json.load(f)
+
+    emulator = FabricEmulator(
+        {key: getattr(args, key) for key in DEFAULT_CONFIG},
+        capacities=[name.strip() for name in args.capacities.split(",") if name.strip()],
+        seed=seed,
+        repository=args.repository,
+    )
+    server = start_server(emulator, args.host, args.port, quiet=not args.verbose)
+    print(f"Fabric API emulator listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Set FABRICOPS_EMULATOR_URL=http://{args.host}:{server.server_address[1]} and FABRICOPS_FAB_EXECUTABLE=\"{sys.executable} {os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_fab.py')}\"")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,459 @@
+#---------------------------------------------------------
+# Fabric CLI shim for local testing
+# Emulates `fab -c "<command>"` for the commands used by the automation
+# scripts and translates them into REST calls against the local Fabric API
+# emulator (fabric_emulator.py), the same way the Fabric CLI translates
+# them into calls against the Fabric REST API.
+#
+# Usage:
+#   python automation/scripts/mock/fabric_emulator.py
+#   set FABRICOPS_FAB_EXECUTABLE="python automation/scripts/mock/mock_fab.py"
+#   python automation/scripts/mock/mock_fab.py --push     # simulate a new commit on the remote branch
+#   python automation/scripts/mock/mock_fab.py --reset    # remove all objects from the emulator
+#
+# Environment variables:
+#   FABRICOPS_EMULATOR_URL   URL of the emulator (default: http://127.0.0.1:8780)
+#   FABRICOPS_FAB_CONFIG_DIR Folder of the emulated CLI settings (config.json) and login (auth.json). Set it
+#                            for the scripts as well, so they find the state of the shim. Default is
+#                            <temp>/fabricops_mock_fab, apart from the ~/.config/fab of a real Fabric CLI.
+#---------------------------------------------------------
+import os, re, sys, json, time, shlex, argparse, tempfile
+import urllib.request, urllib.error
+
+EMULATOR_URL = os.environ.get("FABRICOPS_EMULATOR_URL", "http://127.0.0.1:8780").rstrip("/")
+ESCAPED_SLASH = "\x00"  # Placeholder for \/ in workspace names while a path is split
+FAB_CONFIG_DIR = os.environ.get("FABRICOPS_FAB_CONFIG_DIR") or os.path.join(tempfile.gettempdir(), "fabricops_mock_fab")
+ROLES = {"admin": "Admin", "member": "Member", "contributor": "Contributor", "viewer": "Viewer"}
+
+
+class CliError(Exception):
+    def __init__(self, error_code, message):
+        super().__init__(message)
+        self.error_code = error_code
+        self.message = message
+
+
+def request(method, path, body=None, audience="fabric"):
+    """
+    Sends a request to the emulator.
+
+    Returns:
+        tuple: (status_code, parsed response body or "", response headers)
+    """
+    if path.startswith("/_emulator/"):
+        url = EMULATOR_URL + path
+    else:
+        url = EMULATOR_URL + ("/v1.0/myorg/" if audience == "powerbi" else "/v1/") + path.lstrip("/")
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    http_request = urllib.request.Request(url, data=data, method=method.upper(), headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(http_request, timeout=60) as response:
+            status_code, headers, payload = response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        status_code, headers, payload = e.code, dict(e.headers), e.read()
+    except urllib.error.URLError as e:
+        print(f"x Fabric API emulator not reachable at {EMULATOR_URL}: {e.reason}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        text = json.loads(payload) if payload else ""
+    except ValueError:
+        text = payload.decode("utf-8", errors="replace")
+    return status_code, text, {key: value for key, value in headers.items() if key.lower() not in ("content-length", "content-type", "server", "date", "connection")}
+
+
+def call(method, path, body=None, expected=(200, 201, 202)):
+    """Sends a request on behalf of a CLI command and raises CliError for unexpected responses."""
+    status_code, text, headers = request(method, path, body)
+    if status_code == 429:
+        retry_after = {key.lower(): value for key, value in headers.items()}.get("retry-after", "1")
+        raise CliError("TooManyRequests", f"The request was throttled. Retry after {retry_after} seconds")
+    if status_code not in expected:
+        error = text if isinstance(text, dict) else {}
+        raise CliError(error.get("errorCode", str(status_code)), error.get("message", f"Request failed with status code {status_code}"))
+    if status_code == 202 and headers.get("x-ms-operation-id"):
+        return wait_for_operation(headers.get("x-ms-operation-id"))
+    return text
+
+
+def wait_for_operation(operation_id):
+    while True:
+        state = call("get", f"operations/{operation_id}")
+        if state.get("status") == "Succeeded":
+            status_code, result, _ = request("get", f"operations/{operation_id}/result")
+            return result if status_code == 200 else ""
+        if state.get("status") not in ("NotStarted", "Running"):
+            raise CliError("OperationFailed", (state.get("error") or {}).get("message", "The operation failed."))
+        time.sleep(0.5)
+
+
+def list_all(path):
+    """Returns all values of a paginated listing."""
+    values, continuation_token = [], None
+    while True:
+        page = call("get", path + (f"{'&' if '?' in path else '?'}continuationToken={continuation_token}" if continuation_token else ""))
+        values.extend(page.get("value", []))
+        continuation_token = page.get("continuationToken")
+        if not continuation_token:
+            return values
+
+
+def split_body(command):
+    """Splits the inline JSON body (-i {...}) from a command, as it is not shell quoted by the callers."""
+    index = command.find(" -i ")
+    if index < 0 or command[index + 4:].lstrip()[:1] not in ("{", "["):
+        return command, None
+    body, end = json.JSONDecoder().raw_decode(command[index + 4:].lstrip())
+    return command[:index] + command[index + 4:].lstrip()[end:], body
+
+
+def split_command(command):
+    command, body = split_body(command)
+    return [token.replace(ESCAPED_SLASH, "\\/") for token in shlex.split(command.replace("\\/", ESCAPED_SLASH))], body
+
+
+def get_path(tokens, start=1):
+    """Returns the path argument; unquoted paths with spaces are split into several tokens and joined again, as the Fabric CLI does."""
+    parts = []
+    for token in tokens[start:]:
+        if re.fullmatch(r"--?[A-Za-z_]+", token):
+            break
+        parts.append(token)
+    return " ".join(parts)
+
+
+def get_option(tokens, option, default=None):
+    return tokens[tokens.index(option) + 1] if option in tokens[:-1] else default
+
+
+def parse_properties(value):
+    """Parses -P key=value,nested.key=value into a dict."""
+    properties = {}
+    for pair in re.split(r",(?=[\w.]+=)", value or ""):
+        if "=" in pair:
+            key, _, pair_value = pair.partition("=")
+            properties[key.strip()] = pair_value
+    return properties
+
+
+def split_path(path):
+    """Splits a CLI path into (name, type) segments, e.g. /ws.Workspace/folder/item.Lakehouse."""
+    segments = []
+    for segment in path.replace("\\/", ESCAPED_SLASH).strip("/").split("/"):
+        if not segment:
+            continue
+        name, _, segment_type = segment.rpartition(".")
+        if not name or segment.startswith(".") and segment.count(".") == 1:
+            name, segment_type = segment, "Folder" if not segment.startswith(".") else segment
+        segments.append((name.replace(ESCAPED_SLASH, "/"), segment_type))
+    return segments
+
+
+# ---------------------------------------------------------
+# Path resolution
+# ---------------------------------------------------------
+
+def find_workspace(name):
+    return next((workspace for workspace in list_all("workspaces") if workspace.get("displayName") == name), None)
+
+
+def find_folder_id(workspace_id, folder_names, create=False):
+    parent_id = None
+    folders = list_all(f"workspaces/{workspace_id}/folders") if folder_names else []
+    for name in folder_names:
+        folder = next((folder for folder in folders if folder.get("displayName") == name and folder.get("parentFolderId") == parent_id), None)
+        if not folder:
+            if not create:
+                raise CliError("NotFound", f"Folder '{name}' not found")
+            folder = call("post", f"workspaces/{workspace_id}/folders", {"displayName": name, "parentFolderId": parent_id})
+        parent_id = folder.get("id")
+    return parent_id
+
+
+def resolve(path, create_folders=False):
+    """
+    Resolves a CLI path to the REST resource it refers to.
+
+    Returns:
+        dict: 'kind' (workspace, item, connection, identity, private_endpoint or folder) and the IDs and names of
+            the resource; 'id' is None if the resource does not exist.
+    """
+    segments = split_path(path)
+    if not segments:
+        raise CliError("InvalidPath", f"Invalid path '{path}'")
+
+    if segments[0][1] == ".connections":
+        name = segments[1][0] if len(segments) > 1 else None
+        connection = next((connection for connection in list_all("connections") if connection.get("displayName") == name), None)
+        return {"kind": "connection", "name": name, "id": (connection or {}).get("id")}
+
+    workspace_name, workspace_type = segments[0]
+    if workspace_type != "Workspace":
+        raise CliError("InvalidPath", f"Invalid path '{path}'")
+    workspace = find_workspace(workspace_name)
+    resource = {"kind": "workspace", "name": workspace_name, "workspace_id": (workspace or {}).get("id"), "id": (workspace or {}).get("id")}
+    if len(segments) == 1:
+        return resource
+    if not workspace:
+        raise CliError("NotFound", f"Workspace '{workspace_name}' not found")
+
+    workspace_id = workspace.get("id")
+    if segments[1][1] == ".managedidentities":
+        details = call("get", f"workspaces/{workspace_id}")
+        return {"kind": "identity", "name": workspace_name, "workspace_id": workspace_id, "id": (details.get("workspaceIdentity") or {}).get("servicePrincipalId")}
+    if segments[1][1] == ".managedprivateendpoints":
+        name = segments[2][0] if len(segments) > 2 else None
+        endpoint = next((endpoint for endpoint in list_all(f"workspaces/{workspace_id}/managedPrivateEndpoints") if endpoint.get("name") == name), None)
+        return {"kind": "private_endpoint", "name": name, "workspace_id": workspace_id, "id": (endpoint or {}).get("id")}
+
+    folder_names = [name for name, segment_type in segments[1:-1]]
+    name, item_type = segments[-1]
+    if item_type == "Folder":
+        folder_names.append(name)
+        try:
+            return {"kind": "folder", "name": name, "workspace_id": workspace_id, "id": find_folder_id(workspace_id, folder_names)}
+        except CliError:
+            return {"kind": "folder", "name": name, "workspace_id": workspace_id, "id": None}
+
+    folder_id = find_folder_id(workspace_id, folder_names, create=create_folders)
+    item = next((
+        item for item in list_all(f"workspaces/{workspace_id}/items?type={item_type}")
+        if item.get("displayName") == name and item.get("type") == item_type and (not folder_names or item.get("folderId") == folder_id)
+    ), None)
+    return {"kind": "item", "name": name, "type": item_type, "workspace_id": workspace_id, "folder_id": folder_id, "id": (item or {}).get("id")}
+
+
+def get_details(resource):
+    if resource["kind"] == "workspace":
+        return call("get", f"workspaces/{resource['id']}")
+    if resource["kind"] == "item":
+        return call("get", f"workspaces/{resource['workspace_id']}/items/{resource['id']}")
+    if resource["kind"] == "connection":
+        return call("get", f"connections/{resource['id']}")
+    if resource["kind"] == "private_endpoint":
+        return call("get", f"workspaces/{resource['workspace_id']}/managedPrivateEndpoints/{resource['id']}")
+    if resource["kind"] == "identity":
+        return (call("get", f"workspaces/{resource['workspace_id']}").get("workspaceIdentity")) or {}
+    return {"id": resource["id"], "displayName": resource["name"]}
+
+
+def query_value(value, query):
+    for key in [key for key in (query or ".").split(".") if key]:
+        value = value.get(key) if isinstance(value, dict) else None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, indent=2)
+    return "" if value is None else str(value).lower() if isinstance(value, bool) else str(value)
+
+
+# ---------------------------------------------------------
+# Commands
+# ---------------------------------------------------------
+
+def command_api(tokens, body):
+    method = get_option(tokens, "-X", "get").lower()
+    audience = get_option(tokens, "-A", "fabric")
+    path = next(token for index, token in enumerate(tokens[1:], 1) if not token.startswith("-") and tokens[index - 1] not in ("-X", "-A", "-i", "-q"))
+    if body is None and get_option(tokens, "-i"):
+        with open(get_option(tokens, "-i"), "r", encoding="utf-8") as f:
+            body = json.load(f)
+
+    status_code, text, headers = request(method, path, body, audience)
+    response = {"status_code": status_code, "text": text}
+    if "--show_headers" in tokens:
+        response["headers"] = headers
+    return json.dumps(response)
+
+
+def command_get(tokens):
+    resource = resolve(get_path(tokens))
+    if not resource["id"]:
+        raise CliError("NotFound", f"The requested resource '{get_path(tokens)}' could not be found")
+    return query_value(get_details(resource), get_option(tokens, "-q", "."))
+
+
+def command_exists(tokens):
+    try:
+        return "* true" if resolve(get_path(tokens))["id"] else "* false"
+    except CliError as e:
+        if e.error_code == "NotFound":
+            return "* false"
+        raise
+
+
+def command_create(tokens):
+    path = get_path(tokens)
+    resource = resolve(path, create_folders=True)
+    if resource["id"]:
+        raise CliError("AlreadyExists", f"'{path}' already exists")
+    properties = parse_properties(get_option(tokens, "-P"))
+
+    if resource["kind"] == "workspace":
+        capacity_name = properties.get("capacityname")
+        body = {"displayName": resource["name"]}
+        if capacity_name:
+            capacity = next((capacity for capacity in list_all("capacities") if capacity.get("displayName") == capacity_name), None)
+            if not capacity:
+                raise CliError("NotFound", f"Capacity '{capacity_name}' not found")
+            body["capacityId"] = capacity.get("id")
+        call("post", "workspaces", body)
+    elif resource["kind"] == "item":
+        call("post", f"workspaces/{resource['workspace_id']}/items", {"displayName": resource["name"], "type": resource["type"], "folderId": resource["folder_id"]})
+    elif resource["kind"] == "folder":
+        find_folder_id(resource["workspace_id"], [name for name, _ in split_path(path)[1:]], create=True)
+    elif resource["kind"] == "identity":
+        call("post", f"workspaces/{resource['workspace_id']}/provisionIdentity")
+    elif resource["kind"] == "private_endpoint":
+        call("post", f"workspaces/{resource['workspace_id']}/managedPrivateEndpoints", {
+            "name": resource["name"],
+            "targetPrivateLinkResourceId": properties.get("targetPrivateLinkResourceId"),
+            "targetSubresourceType": properties.get("targetSubresourceType"),
+            "autoApproveEnabled": properties.get("autoApproveEnabled", "false").lower() == "true",
+        })
+    elif resource["kind"] == "connection":
+        call("post", "connections", get_connection_body(resource["name"], properties))
+    return f"* '{resource['name']}' created"
+
+
+def get_connection_body(name, properties):
+    """Builds the create connection request from -P properties, as the Fabric CLI does."""
+    parameters = [{"dataType": "Text", "name": key.split(".")[-1], "value": value} for key, value in properties.items() if key.startswith("connectionDetails.parameters.")]
+    credentials = {key.split(".")[-1]: value for key, value in properties.items() if key.startswith("credentialDetails.") and key not in ("credentialDetails.type", "credentialDetails.connectionEncryption")}
+    credentials["credentialType"] = properties.get("credentialDetails.type")
+    return {
+        "connectivityType": "ShareableCloud",
+        "displayName": name,
+        "privacyLevel": properties.get("privacyLevel", "Organizational"),
+        "connectionDetails": {
+            "type": properties.get("connectionDetails.type"),
+            "creationMethod": properties.get("connectionDetails.creationMethod"),
+            "parameters": parameters,
+        },
+        "credentialDetails": {
+            "singleSignOnType": "None",
+            "connectionEncryption": properties.get("credentialDetails.connectionEncryption", "NotEncrypted"),
+            "skipTestConnection": False,
+            "credentials": credentials,
+        },
+    }
+
+
+def command_rm(tokens):
+    resource = resolve(get_path(tokens))
+    if not resource["id"]:
+        raise CliError("NotFound", f"The requested resource '{get_path(tokens)}' could not be found")
+    endpoints = {
+        "workspace": f"workspaces/{resource['id']}",
+        "item": f"workspaces/{resource.get('workspace_id')}/items/{resource['id']}",
+        "folder": f"workspaces/{resource.get('workspace_id')}/folders/{resource['id']}",
+        "connection": f"connections/{resource['id']}",
+        "private_endpoint": f"workspaces/{resource.get('workspace_id')}/managedPrivateEndpoints/{resource['id']}",
+    }
+    if resource["kind"] == "identity":
+        call("post", f"workspaces/{resource['workspace_id']}/deprovisionIdentity")
+    else:
+        call("delete", endpoints[resource["kind"]], expected=(200, 204))
+    return f"* '{resource['name']}' deleted"
+
+
+def command_acl(tokens):
+    if tokens[1] != "set":
+        raise CliError("NotSupported", f"acl {tokens[1]} is not supported by the shim")
+    resource = resolve(get_path(tokens, 2))
+    if resource["kind"] != "workspace" or not resource["id"]:
+        raise CliError("NotFound", f"The requested resource '{get_path(tokens, 2)}' could not be found")
+    principal_id, role = get_option(tokens, "-I"), ROLES.get((get_option(tokens, "-R") or "").lower(), get_option(tokens, "-R"))
+    status_code, text, headers = request("post", f"workspaces/{resource['id']}/roleAssignments", {"principal": {"id": principal_id, "type": "ServicePrincipal"}, "role": role})
+    if status_code == 409:
+        call("patch", f"workspaces/{resource['id']}/roleAssignments/{principal_id}", {"role": role})
+    elif status_code == 429:
+        raise CliError("TooManyRequests", f"The request was throttled. Retry after {headers.get('Retry-After', '1')} seconds")
+    elif status_code not in (200, 201):
+        raise CliError((text or {}).get("errorCode", str(status_code)), (text or {}).get("message", "Setting the role failed"))
+    return "* ACL set"
+
+
+def read_state(file_name):
+    try:
+        with open(os.path.join(FAB_CONFIG_DIR, file_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(file_name, state):
+    os.makedirs(FAB_CONFIG_DIR, exist_ok=True)
+    with open(os.path.join(FAB_CONFIG_DIR, file_name), "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def command_config(tokens):
+    """Keeps the settings in config.json like the Fabric CLI. Every setting is accepted."""
+    config = read_state("config.json")
+    if len(tokens) >= 4 and tokens[1] == "set":
+        config[tokens[2]] = tokens[3]
+        write_state("config.json", config)
+        return f"* Configuration '{tokens[2]}' set to '{tokens[3]}'"
+    if len(tokens) >= 3 and tokens[1] == "get":
+        return config.get(tokens[2], "")
+    if len(tokens) >= 2 and tokens[1] == "ls":
+        return "\n".join(f"{key}: {value}" for key, value in sorted(config.items()))
+    raise CliError("NotSupported", f"config {' '.join(tokens[1:2])} is not supported by the shim")
+
+
+def command_auth(tokens):
+    """Keeps the service principal login in auth.json. Any secret is accepted by the emulator."""
+    action = tokens[1] if len(tokens) > 1 else ""
+    if action == "login":
+        write_state("auth.json", {"fab_auth_mode": "service_principal", "fab_spn_client_id": get_option(tokens, "-u"), "fab_tenant_id": get_option(tokens, "--tenant")})
+        return "* Logged in to app.fabric.microsoft.com"
+    if action == "logout":
+        if os.path.isfile(os.path.join(FAB_CONFIG_DIR, "auth.json")):
+            os.remove(os.path.join(FAB_CONFIG_DIR, "auth.json"))
+        return "* Logged out of app.fabric.microsoft.com"
+    if action == "status":
+        auth = read_state("auth.json")
+        if not auth:
+            return "x Not logged in to app.fabric.microsoft.com"
+        return "\n".join([
+            "* Logged in to app.fabric.microsoft.com",
+            f"  - Account: {auth.get('fab_spn_client_id')} (Service Principal)",
+            f"  - Tenant ID: {auth.get('fab_tenant_id')}",
+        ])
+    raise CliError("NotSupported", f"auth {action} is not supported by the shim")
+
+
+def handle_command(command):
+    tokens, body = split_command(command)
+    if not tokens:
+        return ""
+    if tokens[0] == "config":
+        return command_config(tokens)
+    if tokens[0] == "auth":
+        return command_auth(tokens)
+    if tokens[0] == "api":
+        return command_api(tokens, body)
+
+    handlers = {"get": command_get, "exists": command_exists, "create": command_create, "mkdir": command_create, "rm": command_rm, "acl": command_acl}
+    if tokens[0] not in handlers or len(tokens) < 2:
+        raise CliError("NotSupported", f"'{command}' is not supported by the shim")
+    return handlers[tokens[0]](tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fabric CLI shim for the local Fabric API emulator")
+    parser.add_argument("-c", dest="command", required=False, help="Fabric CLI command to emulate.")
+    parser.add_argument("--push", action="store_true", help="Simulate a new commit on the remote branch.")
+    parser.add_argument("--reset", action="store_true", help="Remove all objects from the emulator.")
+    args = parser.parse_args()
+
+    if args.reset:
+        request("post", "/_emulator/reset")
+    elif args.push:
+        status_code, text, _ = request("post", "/_emulator/push", {})
+        print(f"Remote branch now at {text.get('remote_commit')}")
+    elif args.command:
+        try:
+            print(handle_command(args.command))
+        except CliError as e:
+            print(f"x {args.command.split()[0]}: [{e.error_code}] {e.message}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,63 @@
+#---------------------------------------------------------
+# Run an entry script against the local Fabric API emulator
+# Starts the emulator on a free port, points the Fabric CLI of the script
+# at the shim (mock_fab.py) and runs the script with dummy credentials.
+#
+# Usage:
+#   python automation/scripts/mock/run_with_emulator.py [--latency_ms 50] [--throttle_rate 0.05] -- fabric_setup.py --environment dev
+#---------------------------------------------------------
+import os, sys, json, argparse, subprocess
+import mock_fab
+from fabric_emulator import FabricEmulator, DEFAULT_CONFIG, DEFAULT_REPOSITORY, start_server
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+parser = argparse.ArgumentParser(description="Runs an entry script against the local Fabric API emulator")
+parser.add_argument("--latency_ms", required=False, default=0, type=float, help="Latency added to every request in milliseconds.")
+parser.add_argument("--jitter_ms", required=False, default=0, type=float, help="Random latency added on top of --latency_ms in milliseconds.")
+parser.add_argument("--page_size", required=False, default=100, type=int, help="Values per page of paginated listings. Default is 100.")
+parser.add_argument("--throttle_rate", required=False, default=0.0, type=float, help="Share of requests answered with HTTP 429, e.g. 0.05.")
+parser.add_argument("--rate_limit", required=False, default=0, type=int, help="Requests per second above which requests are answered with HTTP 429.")
+parser.add_argument("--retry_after", required=False, default=1, type=int, help="Retry-After of throttled responses in seconds. Default is 1.")
+parser.add_argument("--lro_seconds", required=False, default=2, type=float, help="Duration of long running operations and refreshes in seconds. Default is 2.")
+parser.add_argument("--repository", required=False, default=DEFAULT_REPOSITORY, help="Local copy of the git repository workspaces are updated from. Defaults to this repository.")
+parser.add_argument("--seed", required=False, help="JSON file with the initial state, e.g. saved from GET /_emulator/state.")
+parser.add_argument("--save_state", required=False, help="Writes the state of the emulator to this file after the run, to seed later runs.")
+parser.add_argument("--stats", required=False, help="Writes the request statistics of the emulator to this file after the run.")
+parser.add_argument("script", nargs=argparse.REMAINDER, help="Entry script and its arguments, e.g. -- fabric_setup.py --environment dev")
+args = parser.parse_args()
+
+script = [part for part in args.script if part != "--"]
+if not script:
+    parser.error("No script given.")
+
+seed = None
+if args.seed:
+    with open(args.seed, "r", encoding="utf-8") as f:
+        seed = json.load(f)
+
+emulator = FabricEmulator({key: getattr(args, key) for key in DEFAULT_CONFIG}, seed=seed, repository=args.repository)
+server = start_server(emulator, "127.0.0.1", 0)
+
+process_env = os.environ.copy()
+process_env["FABRICOPS_EMULATOR_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+process_env["FABRICOPS_FAB_EXECUTABLE"] = f'"{sys.executable}" "{os.path.join(SCRIPTS_DIR, "mock", "mock_fab.py")}"'
+process_env.setdefault("FABRICOPS_FAB_CONFIG_DIR", mock_fab.FAB_CONFIG_DIR)
+for name in ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET", "GITHUB_PAT"):
+    process_env.setdefault(name, "emulator")
+
+try:
+    exit_code = subprocess.run([sys.executable, "-u"] + script, cwd=SCRIPTS_DIR, env=process_env).returncode
+finally:
+    server.shutdown()
+
+status_code, stats, _ = emulator.handle("GET", "/_emulator/stats")
+print(f"\nEmulator: {stats.get('requests')} request(s), {stats.get('throttled')} throttled.")
+if args.stats:
+    with open(args.stats, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+if args.save_state:
+    with open(args.save_state, "w", encoding="utf-8") as f:
+        json.dump(emulator.snapshot(), f, indent=2)
+
+sys.exit(exit_code)
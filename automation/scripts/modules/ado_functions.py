@@ -1,6 +1,12 @@
 import requests
 import base64
 from urllib.parse import quote
+import modules.cassette_functions as cassette
+
+cassette.start()
+
+# One session per process, so steps run with fabricops.py reuse its connection pool
+_session = requests.Session()
 
 def get_ado_access_token(tenant_id, client_id, client_secret):
     token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
@@ -12,7 +18,7 @@ def get_ado_access_token(tenant_id, client_id, client_secret):
         "scope": "499b84ac-1321-427f-aa17-267ca6975798/.default"
     }
 
-    response = requests.post(token_url, data=payload)
+    response = _session.post(token_url, data=payload)
     response.raise_for_status()
 
     return response.json()["access_token"]
@@ -39,7 +45,7 @@ def get_repository(org, project, repo_name, pat=None, tenant_id=None, client_id=
     
     url = (f"https://dev.azure.com/{org}/{project}/_apis/git/repositories?api-version=7.1")
 
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
 
     repos = response.json()["value"]
@@ -75,7 +81,7 @@ def create_azure_pipeline(name, folder, pipeline_path, organization, project, re
         }
     }
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = _session.post(url, headers=headers, json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -99,7 +105,7 @@ def create_variable_group(name, variables, organization, project, pat=None, tena
             }]
         }
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = _session.post(url, headers=headers, json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -109,7 +115,7 @@ def get_variable_group(name, organization, project, pat=None, tenant_id=None, cl
 
     url = f"https://dev.azure.com/{organization}/{project}/_apis/distributedtask/variablegroups?groupName={name}&api-version=7.2-preview.2"
 
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
     if not response.json().get("value"):
         return None
@@ -122,7 +128,7 @@ def get_project(organization, project_name, pat=None, tenant_id=None, client_id=
 
     url = f"https://dev.azure.com/{organization}/_apis/projects/{project_name}?api-version=7.1"
 
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
 
     return response.json()
@@ -140,7 +146,7 @@ def delete_variable_group(name, organization, project, pat=None, tenant_id=None,
 
     url = f"https://dev.azure.com/{organization}/_apis/distributedtask/variablegroups/{variable_group_response.get('id')}?projectIds={project_response.get('id')}&api-version=7.2-preview.2"
     
-    response = requests.delete(url, headers=headers)
+    response = _session.delete(url, headers=headers)
     response.raise_for_status()
 
 def get_definition(name, organization, project, pat=None, tenant_id=None, client_id=None, client_secret=None):
@@ -149,7 +155,7 @@ def get_definition(name, organization, project, pat=None, tenant_id=None, client
     encoded_name = quote(name, safe="")
     url = f"https://dev.azure.com/{organization}/{project}/_apis/build/definitions?name={encoded_name}&api-version=7.2-preview.7"
 
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
 
     return response.json()["value"][0]
@@ -162,7 +168,7 @@ def delete_azure_pipeline(name, organization, project, pat=None, tenant_id=None,
 
     url = f"https://dev.azure.com/{organization}/{project}/_apis/build/definitions/{definition_id}?api-version=7.0"
 
-    response = requests.delete(url, headers=headers)
+    response = _session.delete(url, headers=headers)
     response.raise_for_status()
 
 
@@ -171,7 +177,7 @@ def delete_definition_folder(folder_path, organization, project, pat=None, tenan
 
     url = f"https://dev.azure.com/{organization}/{project}/_apis/build/folders?path={folder_path}&api-version=7.2-preview.2"
 
-    return requests.delete(url, headers=headers)
+    return _session.delete(url, headers=headers)
 
 
 def set_variable_group_permissions(organization, project, variable_group_id, pipeline_id, pat=None, tenant_id=None, client_id=None, client_secret=None):
@@ -191,7 +197,7 @@ def set_variable_group_permissions(organization, project, variable_group_id, pip
         ]
     }
 
-    response = requests.patch(url, headers=headers, json=payload)
+    response = _session.patch(url, headers=headers, json=payload)
     response.raise_for_status()
 
 
@@ -240,7 +246,7 @@ def set_queue_build_permission(organization, project_name, folder_path, pipeline
         ]
     }
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = _session.post(url, headers=headers, json=payload)
     response.raise_for_status()
 
 
@@ -248,7 +254,7 @@ def get_service_principals(organization, pat=None, tenant_id=None, client_id=Non
     headers = build_headers(pat, tenant_id, client_id, client_secret)
 
     url= f"https://vssps.dev.azure.com/{organization}/_apis/graph/serviceprincipals?api-version=7.1-preview.1"
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
 
     return response.json()
@@ -259,6 +265,24 @@ def get_acl(organization, pat=None, tenant_id=None, client_id=None, client_secre
 
     url= f"https://dev.azure.com/{organization}/_apis/accesscontrollists/2e9eb7ed-3c0a-47d4-87c1-0ffdd275fd87?api-version=7.1"
    
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+
+def list_branches(org, project, repo_name, pat=None, tenant_id=None, client_id=None, client_secret=None):
+    headers = build_headers(pat, tenant_id, client_id, client_secret)
+
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{quote(repo_name)}/refs?filter=heads/&api-version=7.1"
+
+    branches = []
+    continuation_token = None
+    while True:
+        response = _session.get(url + (f"&continuationToken={continuation_token}" if continuation_token else ""), headers=headers)
+        response.raise_for_status()
+        branches.extend(ref["name"].removeprefix("refs/heads/") for ref in response.json()["value"])
+        continuation_token = response.headers.get("x-ms-continuationtoken")
+        if not continuation_token:
+            break
+
+    return branches
@@ -0,0 +1,417 @@
+import os, re, json, hashlib, subprocess, tempfile
+
+CACHE_VERSION = 1
+MODEL_OBJECT_KEY = "__model__"
+
+# Maps TMDL/TMSL object keywords to the Tabular Editor BPA scopes they can be evaluated under
+KEYWORD_SCOPES = {
+    "table": {"Table", "CalculatedTable"},
+    "measure": {"Measure", "KPI"},
+    "column": {"DataColumn", "CalculatedColumn", "CalculatedTableColumn"},
+    "partition": {"Partition"},
+    "hierarchy": {"Hierarchy", "Level"},
+    "calculationGroup": {"CalculationGroup", "CalculationItem"},
+    "relationship": {"Relationship"},
+    "perspective": {"Perspective"},
+    "role": {"ModelRole", "TablePermission"},
+    "culture": {"Culture"},
+    "expression": {"NamedExpression"},
+    "dataSource": {"ProviderDataSource", "StructuredDataSource"},
+    "model": {"Model"},
+    "database": {"Model"},
+}
+
+TABLE_MEMBER_KEYWORDS = {"measure", "column", "partition", "hierarchy", "calculationGroup"}
+TMSL_TABLE_MEMBERS = {"columns": "column", "measures": "measure", "partitions": "partition", "hierarchies": "hierarchy"}
+TMSL_MODEL_COLLECTIONS = {"relationships": "relationship", "perspectives": "perspective", "roles": "role",
+                          "cultures": "culture", "expressions": "expression", "dataSources": "dataSource"}
+
+# Rules evaluated on the model as a whole, or navigating to other objects, are re-run on any model change
+MODEL_WIDE_SCOPES = {"Model"}
+CROSS_OBJECT_TOKENS = ("ReferencedBy", "DependsOn", "UsedIn", "InPerspective", "Model.", "Relationships")
+
+
+def hash_text(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def hash_rule(rule: dict) -> str:
+    """
+    Returns a hash of the parts of a BPA rule that influence its verdicts.
+    """
+    relevant = {key: rule.get(key) for key in ("Scope", "Expression", "Severity", "CompatibilityLevel")}
+    return hash_text(json.dumps(relevant, sort_keys=True))
+
+
+def get_rule_scopes(rule: dict) -> set:
+    return {scope.strip() for scope in (rule.get("Scope") or "").split(",") if scope.strip()}
+
+
+def is_model_wide_rule(rule: dict) -> bool:
+    """
+    Determines whether a rule must be re-evaluated on every model change.
+
+    Rules scoped to the model, or whose expression navigates to other objects (e.g. ReferencedBy or DependsOn),
+    can change verdict for objects that did not change themselves.
+    """
+    if get_rule_scopes(rule) & MODEL_WIDE_SCOPES:
+        return True
+    expression = rule.get("Expression") or ""
+    return any(token in expression for token in CROSS_OBJECT_TOKENS)
+
+
+def load_rules(rules_path: str) -> dict:
+    """
+    Loads a BPA rules file.
+
+    Returns:
+        dict: Rules keyed by rule ID.
+    """
+    with open(rules_path, "r", encoding="utf-8-sig") as f:
+        rules = json.load(f)
+    return {rule.get("ID"): rule for rule in rules if rule.get("ID")}
+
+
+def find_model_definition(folder_path: str):
+    """
+    Locates the model definition within a model folder using the same precedence as the PR validation pipeline:
+    a TMDL 'definition' folder, a folder containing database.json or a *.bim file.
+
+    Returns:
+        str or None: The path to pass to Tabular Editor, or None if the folder holds no model.
+    """
+    definition_folder = os.path.join(folder_path, "definition")
+    if os.path.isdir(definition_folder):
+        return definition_folder
+    if os.path.exists(os.path.join(folder_path, "database.json")):
+        return folder_path
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.lower().endswith(".bim"):
+            return os.path.join(folder_path, file_name)
+    return None
+
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    if len(name) >= 2 and name[0] == name[-1] and name[0] in ("'", '"'):
+        return name[1:-1].replace("''", "'")
+    return name
+
+
+def _parse_tmdl_declaration(line: str):
+    """
+    Splits a TMDL declaration such as "measure 'Total Sales' = SUM(...)" into keyword and object name.
+    """
+    match = re.match(r"^\s*(\w+)\s+('(?:[^']|'')*'|[^\s=:]+)", line)
+    if not match:
+        return None, None
+    return match.group(1), _unquote(match.group(2))
+
+
+def _split_tmdl_blocks(content: str, indent: int):
+    """
+    Splits TMDL content into blocks starting at declarations on the given indentation level.
+
+    Returns:
+        list[tuple]: (declaration line, block text) pairs. Text before the first declaration is returned with a None declaration.
+    """
+    blocks = []
+    current_decl, current_lines, pending_descriptions = None, [], []
+    prefix = "\t" * indent
+    for line in content.splitlines():
+        at_level = line.startswith(prefix) and len(line) > indent and not line[indent].isspace()
+        if at_level and line[indent:].startswith("///"):
+            # Description comments belong to the declaration that follows them
+            pending_descriptions.append(line)
+        elif at_level:
+            if current_lines:
+                blocks.append((current_decl, "\n".join(current_lines)))
+            current_decl, current_lines = line, pending_descriptions + [line]
+            pending_descriptions = []
+        else:
+            current_lines.extend(pending_descriptions + [line])
+            pending_descriptions = []
+    current_lines.extend(pending_descriptions)
+    if current_lines:
+        blocks.append((current_decl, "\n".join(current_lines)))
+    return blocks
+
+
+def _collect_tmdl_objects(definition_path: str) -> dict:
+    objects = {}
+    for root, _, files in os.walk(definition_path):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith(".tmdl"):
+                continue
+            with open(os.path.join(root, file_name), "r", encoding="utf-8-sig") as f:
+                content = f.read()
+
+            is_table_file = os.path.basename(root).lower() == "tables"
+            for declaration, text in _split_tmdl_blocks(content, 0):
+                keyword, name = _parse_tmdl_declaration(declaration) if declaration else (None, None)
+                if not keyword:
+                    continue
+
+                if is_table_file and keyword == "table":
+                    header_lines, members = [], []
+                    for member_decl, member_text in _split_tmdl_blocks(text, 1):
+                        member_keyword, member_name = _parse_tmdl_declaration(member_decl) if member_decl else (None, None)
+                        if member_keyword in TABLE_MEMBER_KEYWORDS:
+                            members.append((member_keyword, member_name, member_text))
+                        else:
+                            header_lines.append(member_text)
+
+                    table_hash = hash_text("\n".join(header_lines).rstrip())
+                    objects[f"table:{name}"] = {"type": "table", "hash": table_hash}
+                    for member_keyword, member_name, member_text in members:
+                        # Members inherit the table header hash, as rules may navigate to the parent table
+                        objects[f"member:{name}/{member_name}"] = {
+                            "type": member_keyword,
+                            "hash": hash_text(table_hash + member_text.rstrip()),
+                        }
+                else:
+                    objects[f"{keyword}:{name}"] = {"type": keyword, "hash": hash_text(text.rstrip())}
+    return objects
+
+
+def _collect_tmsl_objects(file_path: str) -> dict:
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        document = json.load(f)
+
+    model = document.get("model", document)
+    objects = {}
+
+    for table in model.get("tables", []) or []:
+        table_name = table.get("name")
+        header = {k: v for k, v in table.items() if k not in TMSL_TABLE_MEMBERS}
+        table_hash = hash_text(json.dumps(header, sort_keys=True))
+        objects[f"table:{table_name}"] = {"type": "table", "hash": table_hash}
+        for collection, keyword in TMSL_TABLE_MEMBERS.items():
+            for member in table.get(collection, []) or []:
+                objects[f"member:{table_name}/{member.get('name')}"] = {
+                    "type": keyword,
+                    "hash": hash_text(table_hash + json.dumps(member, sort_keys=True)),
+                }
+
+    for collection, keyword in TMSL_MODEL_COLLECTIONS.items():
+        for index, obj in enumerate(model.get(collection, []) or []):
+            name = obj.get("name", index)
+            objects[f"{keyword}:{name}"] = {"type": keyword, "hash": hash_text(json.dumps(obj, sort_keys=True))}
+
+    model_props = {k: v for k, v in model.items() if k != "tables" and k not in TMSL_MODEL_COLLECTIONS}
+    objects["model:Model"] = {"type": "model", "hash": hash_text(json.dumps(model_props, sort_keys=True))}
+    return objects
+
+
+def collect_model_objects(definition_path: str) -> dict:
+    """
+    Splits a semantic model definition (TMDL folder, database.json folder or model.bim) into individually hashed objects.
+
+    Tables are split into a table header object and one object per measure, column, partition and hierarchy,
+    so that a change to a single measure only invalidates that measure.
+
+    Args:
+        definition_path (str): The model definition path as returned by find_model_definition.
+
+    Returns:
+        dict: Object key -> {"type": TMDL keyword, "hash": definition hash}. Always contains the MODEL_OBJECT_KEY entry,
+              whose hash covers the whole model and is used for violations that cannot be attributed to a single object.
+    """
+    if os.path.isdir(definition_path):
+        database_json = os.path.join(definition_path, "database.json")
+        if os.path.exists(database_json) and not any(f.lower().endswith(".tmdl") for f in os.listdir(definition_path)):
+            objects = _collect_tmsl_objects(database_json)
+        else:
+            objects = _collect_tmdl_objects(definition_path)
+    else:
+        objects = _collect_tmsl_objects(definition_path)
+
+    model_hash = hash_text("".join(f"{key}={obj['hash']};" for key, obj in sorted(objects.items())))
+    objects[MODEL_OBJECT_KEY] = {"type": "model", "hash": model_hash}
+    return objects
+
+
+def parse_violation(line: str):
+    """
+    Parses a Tabular Editor BPA output line, e.g. `Measure 'Sales'[Total] violates rule "Rule name"`.
+    Azure DevOps and GitHub logging command prefixes are ignored.
+
+    Returns:
+        dict or None: {"object_type", "object_name", "rule_name"} or None if the line is not a rule violation.
+    """
+    line = re.sub(r"^(##vso\[[^\]]*\]|::\w+[^:]*::)", "", line.strip())
+    match = re.match(r'^(?P<left>.+?) violates rule "(?P<rule>.+)"\s*$', line)
+    if not match:
+        return None
+
+    left = match.group("left").strip()
+    quote_positions = [pos for pos in (left.find("'"), left.find("[")) if pos > 0]
+    if quote_positions:
+        split_at = min(quote_positions)
+        object_type, object_name = left[:split_at].strip(), left[split_at:].strip()
+    else:
+        object_type, _, object_name = left.partition(" ")
+
+    return {"object_type": object_type, "object_name": object_name.strip(), "rule_name": match.group("rule")}
+
+
+def resolve_object_key(object_type: str, object_name: str, objects: dict) -> str:
+    """
+    Maps an object reported by Tabular Editor to the key of the hashed object it is defined in.
+    Falls back to the owning table and finally to the whole model.
+    """
+    match = re.match(r"^('(?:[^']|'')*'|[^\[]+)?(?:\[(?P<member>[^\]]+)\])?", object_name)
+    table = _unquote(match.group(1)) if match and match.group(1) else None
+    member = match.group("member") if match else None
+    type_keyword = (object_type or "").replace(" ", "")
+    type_keyword = type_keyword[:1].lower() + type_keyword[1:]
+
+    candidates = []
+    if table and member:
+        candidates.append(f"member:{table}/{member}")
+    elif member:
+        candidates.extend(key for key in objects if key.startswith("member:") and key.endswith(f"/{member}"))
+    if table:
+        candidates.append(f"table:{table}")
+        candidates.append(f"{type_keyword}:{table}")
+    candidates.append(f"{type_keyword}:{_unquote(object_name)}")
+
+    return next((key for key in candidates if key in objects), MODEL_OBJECT_KEY)
+
+
+def run_tabular_editor(te_exec: str, definition_path: str, rules: list) -> list:
+    """
+    Runs the Tabular Editor Best Practice Analyzer for the given rules and returns the parsed violations.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as rules_file:
+        json.dump(rules, rules_file, indent=2)
+        rules_path = rules_file.name
+
+    try:
+        result = subprocess.run([te_exec, definition_path, "-A", rules_path], capture_output=True, text=True)
+    finally:
+        os.remove(rules_path)
+
+    violations = [violation for violation in map(parse_violation, result.stdout.splitlines()) if violation]
+
+    # Tabular Editor also exits with 1 when rules with severity 3 are violated. Any other non-zero exit means the
+    # model was not analyzed (crash, model not loadable, wrong path), so an empty result must not count as clean.
+    if result.returncode != 0:
+        severities = {rule.get("Name"): rule.get("Severity", 1) for rule in rules}
+        if not any(severities.get(violation["rule_name"], 3) >= 3 for violation in violations):
+            raise RuntimeError(f"Tabular Editor exited with code {result.returncode}: {(result.stderr or result.stdout).strip()}")
+
+    return violations
+
+
+def load_cache(cache_path: str) -> dict:
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {"version": CACHE_VERSION, "models": {}}
+
+
+def save_cache(cache: dict, cache_path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def select_rules_to_run(rules: dict, rule_hashes: dict, objects: dict, cached_model: dict) -> set:
+    """
+    Determines which rules have to be re-evaluated for a model, given the previously cached state.
+
+    Returns:
+        set: Rule IDs to run. Empty if every verdict can be served from the cache.
+    """
+    cached_objects = cached_model.get("objects", {})
+    cached_rules = cached_model.get("rules", {})
+
+    changed_keys = {key for key, obj in objects.items() if cached_objects.get(key) != obj["hash"]}
+    removed_keys = set(cached_objects) - set(objects)
+
+    rules_to_run = {rule_id for rule_id, rule_hash in rule_hashes.items() if cached_rules.get(rule_id) != rule_hash}
+
+    # A cached violation on a changed or removed object is only dropped if its rule is evaluated again
+    stale_keys = changed_keys | removed_keys
+    rules_to_run |= {violation.get("rule_id") for violation in cached_model.get("violations", []) if violation.get("object_key") in stale_keys and violation.get("rule_id") in rules}
+
+    changed_types = {objects[key]["type"] for key in changed_keys if key != MODEL_OBJECT_KEY}
+    changed_types |= {key.partition(":")[0] for key in removed_keys}
+    if not (changed_keys - {MODEL_OBJECT_KEY}) and not removed_keys:
+        return rules_to_run
+
+    changed_scopes = set()
+    for object_type in changed_types:
+        # Unknown object types may affect any rule
+        changed_scopes |= KEYWORD_SCOPES.get(object_type, {"*"})
+
+    for rule_id, rule in rules.items():
+        if is_model_wide_rule(rule) or "*" in changed_scopes or get_rule_scopes(rule) & changed_scopes:
+            rules_to_run.add(rule_id)
+
+    return rules_to_run
+
+
+def analyze_model(model_name: str, definition_path: str, rules: dict, cache: dict, te_exec: str) -> dict:
+    """
+    Evaluates the BPA rules for a single model, re-running Tabular Editor only for the rules affected by changed
+    objects and merging the result with cached verdicts for everything else. The cache is updated in place.
+
+    Cached verdicts are keyed by (rule ID, rule hash, object hash), so a verdict is reused only while both the rule
+    definition and the definition of the object it was reported on are unchanged.
+
+    Returns:
+        dict: {"violations": list, "rules_run": int, "rules_cached": int, "ran_analyzer": bool}
+    """
+    objects = collect_model_objects(definition_path)
+    rule_hashes = {rule_id: hash_rule(rule) for rule_id, rule in rules.items()}
+    cached_model = cache["models"].get(model_name, {})
+
+    rules_to_run = select_rules_to_run(rules, rule_hashes, objects, cached_model)
+
+    # Keep cached violations for rules not re-run. Rules with a violation on a changed object are always re-run.
+    violations = []
+    for violation in cached_model.get("violations", []):
+        rule_id = violation.get("rule_id")
+        if rule_id in rules_to_run:
+            continue
+        if rule_id in rules and rule_hashes.get(rule_id) != violation.get("rule_hash"):
+            continue
+        if rule_id not in rules and (rules_to_run or rule_id in cached_model.get("rules", {})):
+            # Rules defined outside the rules file (e.g. model annotations) are reported on every analyzer run
+            continue
+        violations.append(violation)
+
+    if rules_to_run:
+        rule_ids_by_name = {rule.get("Name"): rule_id for rule_id, rule in rules.items()}
+        results = run_tabular_editor(te_exec, definition_path, [rules[rule_id] for rule_id in sorted(rules_to_run)])
+        for result in results:
+            rule_id = rule_ids_by_name.get(result["rule_name"], result["rule_name"])
+            object_key = resolve_object_key(result["object_type"], result["object_name"], objects)
+            violations.append({
+                "rule_id": rule_id,
+                "rule_hash": rule_hashes.get(rule_id),
+                "object_key": object_key,
+                "object_hash": objects[object_key]["hash"],
+                "object_type": result["object_type"],
+                "object_name": result["object_name"],
+            })
+
+    cache["models"][model_name] = {
+        "objects": {key: obj["hash"] for key, obj in objects.items()},
+        "rules": rule_hashes,
+        "violations": violations,
+    }
+
+    return {
+        "violations": violations,
+        "rules_run": len(rules_to_run),
+        "rules_cached": len(rules) - len(rules_to_run & set(rules)),
+        "ran_analyzer": bool(rules_to_run),
+    }
@@ -0,0 +1,240 @@
+import os, re, json, time, atexit, threading
+from collections import deque
+from datetime import datetime, timezone
+import modules.trace_functions as tracing
+
+# Records the Fabric CLI commands (fabric_cli_functions.run_command) and the calls made with the requests library
+# (ADO, GitHub, Entra ID and fabric_cicd) of a run into a cassette file, or serves them back from a cassette instead
+# of calling Fabric. Controlled through environment variables, so every entry script supports it:
+#   FABRICOPS_RECORD=<file>        Record all interactions of the run into <file>
+#   FABRICOPS_REPLAY=<file>        Serve all interactions from <file>
+#   FABRICOPS_REPLAY_SPEED=<speed> 'recorded' (default) waits the recorded duration of every interaction,
+#                                  'instant' returns immediately and skips waits, a number is a speed factor (2 = twice as fast)
+# Secrets (credential environment variables, passwords, tokens and authorization headers) are redacted before they
+# are written. Requests are matched by their redacted command or method and URL; repeated requests are served in
+# recorded order, and once exhausted the last recorded response is served again.
+
+CASSETTE_VERSION = 1
+REDACTED = "<redacted>"
+
+# Values of these environment variables are replaced wherever they appear
+SECRET_VARIABLES = ("CLIENT_SECRET", "GITHUB_PAT", "GITHUB_TOKEN", "ADO_PAT", "AZURE_DEVOPS_PAT", "FAB_CLIENT_SECRET")
+
+SECRET_PATTERNS = [
+    (re.compile(r"(\s-p\s+)(\S+)"), rf"\g<1>{REDACTED}"),
+    (re.compile(r"(?i)([\w.]*(?:secret|password|(?<!continuation)token|apikey|accesskey)[\w.]*=)([^,\s&'\"]+)"), rf"\g<1>{REDACTED}"),
+    (re.compile(r'(?i)("[\w.]*(?:secret|password|(?<!continuation)token|apikey|accesskey|encrypted_value)[\w.]*"\s*:\s*)"[^"]*"'), rf'\g<1>"{REDACTED}"'),
+]
+
+TIMESTAMP_PATTERN = re.compile(r"(?<![\w-])\d{9,}(?![\w-])")
+
+# Response headers kept in the cassette; everything else (cookies, request IDs, ...) is dropped
+RESPONSE_HEADERS = ("content-type", "location", "retry-after", "x-ms-operation-id", "continuationtoken")
+
+_mode = None
+_file_path = None
+_speed = 1.0
+_secrets = set()
+_interactions = []
+_queues = {}
+_last = {}
+_misses = []
+_started = None
+_lock = threading.Lock()
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode for a request that is not in the cassette."""
+
+
+def is_enabled() -> bool:
+    return _mode is not None
+
+
+def get_mode() -> str:
+    """Returns 'record', 'replay' or None."""
+    return _mode
+
+
+def register_secret(value: str):
+    """Adds a value that is redacted wherever it appears in recorded requests and responses."""
+    if value and len(value) >= 4:
+        _secrets.add(value)
+
+
+def redact(text: str) -> str:
+    """Replaces secrets in a command, URL or body."""
+    if not text:
+        return text
+    for secret in _secrets:
+        text = text.replace(secret, REDACTED)
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def start(record_path: str = None, replay_path: str = None, speed: str = None):
+    """
+    Starts recording or replaying. Does nothing if neither a record nor a replay file is given or set.
+
+    Args:
+        record_path (str, optional): Cassette to write. Defaults to the FABRICOPS_RECORD environment variable.
+        replay_path (str, optional): Cassette to serve from. Defaults to the FABRICOPS_REPLAY environment variable.
+        speed (str, optional): Replay speed ('recorded', 'instant' or a factor). Defaults to FABRICOPS_REPLAY_SPEED.
+    """
+    global _mode, _file_path, _speed, _started
+    if _mode:
+        return
+    record_path = record_path or os.environ.get("FABRICOPS_RECORD")
+    replay_path = replay_path or os.environ.get("FABRICOPS_REPLAY")
+    if not record_path and not replay_path:
+        return
+
+    for name in SECRET_VARIABLES:
+        register_secret(os.environ.get(name))
+    _started = time.time()
+
+    if replay_path:
+        _mode, _file_path = "replay", replay_path
+        _load(replay_path)
+        speed = (speed or os.environ.get("FABRICOPS_REPLAY_SPEED") or "recorded").lower()
+        _speed = 0.0 if speed == "instant" else 1.0 if speed == "recorded" else float(speed)
+        if _speed == 0:
+            tracing.set_sleep_factor(0)
+        elif _speed != 1:
+            tracing.set_sleep_factor(1 / _speed)
+    else:
+        _mode, _file_path = "record", record_path
+
+    _instrument_requests()
+    atexit.register(finish)
+
+
+def _load(file_path: str):
+    with open(file_path, "r", encoding="utf-8") as f:
+        cassette = json.load(f)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise ValueError(f"Cassette {file_path} has version {cassette.get('version')}, expected {CASSETTE_VERSION}.")
+    for interaction in cassette.get("interactions", []):
+        _queues.setdefault(_get_key(interaction.get("kind"), interaction.get("request")), deque()).append(interaction)
+
+
+def _get_key(kind: str, request) -> str:
+    """Returns the key requests are matched by. Timestamps generated by the scripts (long digit runs) are ignored."""
+    key = f"fab {request}" if kind == "fab" else f"http {request.get('method')} {request.get('url')}"
+    return TIMESTAMP_PATTERN.sub("{n}", key)
+
+
+def _record(kind: str, request, response, started: float, duration: float, stderr: str = None):
+    interaction = {
+        "kind": kind,
+        "request": request,
+        "response": response,
+        "offset": round(started - _started, 3),
+        "duration": round(duration, 3),
+        "thread": threading.current_thread().name,
+    }
+    if stderr:
+        interaction["stderr"] = stderr
+    with _lock:
+        _interactions.append(interaction)
+
+
+def _replay(kind: str, request) -> dict:
+    """Returns the next recorded interaction for a request, waiting its recorded duration unless replaying instantly."""
+    key = _get_key(kind, request)
+    with _lock:
+        queue = _queues.get(key)
+        if queue:
+            interaction = queue.popleft()
+            _last[key] = interaction
+        else:
+            interaction = _last.get(key)
+        if interaction is None:
+            _misses.append(key)
+    if interaction is None:
+        raise CassetteMissError(f"No recorded response for {key}")
+    if _speed:
+        time.sleep(interaction.get("duration", 0) / _speed)
+    return interaction
+
+
+def run_command(command: str, execute) -> tuple:
+    """
+    Runs a Fabric CLI command through execute(command), recording its output and error output, or serves the
+    recorded ones.
+    """
+    if _mode == "replay":
+        interaction = _replay("fab", redact(command))
+        return interaction.get("response"), interaction.get("stderr", "")
+
+    started = time.time()
+    output, error_output = execute(command)
+    if _mode == "record":
+        _record("fab", redact(command), redact(output), started, time.time() - started, stderr=redact(error_output))
+    return output, error_output
+
+
+def _build_response(url: str, recorded: dict):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = recorded.get("status_code")
+    response.reason = recorded.get("reason")
+    response.headers = CaseInsensitiveDict(recorded.get("headers") or {})
+    response._content = (recorded.get("body") or "").encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+
+def _instrument_requests():
+    """Records or replays all calls made with the requests library. Installed below the tracing of requests."""
+    try:
+        import requests
+    except ImportError:
+        return
+
+    original_request = requests.Session.request
+    if getattr(original_request, "_fabricops_cassette", False):
+        return
+
+    def cassette_request(session, method, url, *args, **kwargs):
+        request = {"method": method.upper(), "url": redact(str(url))}
+        if _mode == "replay":
+            return _build_response(str(url), _replay("http", request).get("response"))
+
+        started = time.time()
+        response = original_request(session, method, url, *args, **kwargs)
+        body = kwargs.get("json") if kwargs.get("json") is not None else kwargs.get("data")
+        if body is not None:
+            request["body"] = redact(body if isinstance(body, str) else json.dumps(body, default=str))
+        _record("http", request, {
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": {name: value for name, value in response.headers.items() if name.lower() in RESPONSE_HEADERS},
+            "body": redact(response.text),
+        }, started, time.time() - started)
+        return response
+
+    cassette_request._fabricops_cassette = True
+    requests.Session.request = cassette_request
+
+
+def finish():
+    """Writes the cassette when recording, or reports requests missing from the cassette when replaying."""
+    if _mode == "record":
+        with _lock:
+            interactions = list(_interactions)
+        directory = os.path.dirname(os.path.abspath(_file_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(_file_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CASSETTE_VERSION,
+                "recorded": datetime.fromtimestamp(_started, timezone.utc).isoformat(timespec="seconds"),
+                "interactions": interactions,
+            }, f, indent=1)
+        print(f"Cassette with {len(interactions)} interaction(s) written to {_file_path}")
+    elif _mode == "replay" and _misses:
+        print(f"Cassette {_file_path} had no recorded response for {len(_misses)} request(s), e.g. {_misses[0]}")
@@ -1,7 +1,31 @@
-import subprocess, json, time, uuid
+import subprocess, json, time, uuid, os, re, shlex, tempfile
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.cassette_functions as cassette
+from modules.throttle_functions import ThrottleController
 
 EXIT_ON_ERROR = False
 
+# Command used to invoke the Fabric CLI. Can be overridden (e.g. with a mock Fabric CLI for local testing)
+# through the FABRICOPS_FAB_EXECUTABLE environment variable.
+FAB_EXECUTABLE = [part.strip('"') for part in shlex.split(os.environ.get("FABRICOPS_FAB_EXECUTABLE", "fab"), posix=os.name != "nt")]
+
+# Folder the Fabric CLI keeps its settings (config.json) and login (auth.json) in
+FAB_CONFIG_DIR = os.environ.get("FABRICOPS_FAB_CONFIG_DIR") or os.path.join(os.path.expanduser("~"), ".config", "fab")
+
+# Shared by all threads, so parallel callers back off together when Fabric or Power BI throttle
+THROTTLE = ThrottleController()
+
+# Records or replays all Fabric CLI and requests calls if FABRICOPS_RECORD or FABRICOPS_REPLAY is set
+cassette.start()
+
+# Configuration commands change the CLI settings for the whole process. When several scripts run in one process
+# (fabricops.py run), each of these commands runs once and later calls return its first output. Logins are tracked
+# by login().
+SESSION_COMMANDS = ("config set ",)
+_session_outputs = {}
+_session_principal = None
+
 def is_guid(value: str) -> bool:
     try:
         uuid_obj = uuid.UUID(value)
@@ -10,9 +34,70 @@ def is_guid(value: str) -> bool:
         return False
 
 def run_command(command: str) -> str:
+    if command.startswith(SESSION_COMMANDS):
+        if command not in _session_outputs:
+            _session_outputs[command] = _trace_command(command)
+        return _session_outputs[command]
+    return _trace_command(command)
+
+
+def _trace_command(command: str) -> str:
+    if not tracing.is_enabled():
+        return THROTTLE.call(command, lambda: _run_command(command))
+
+    attributes = get_command_attributes(command)
+    with tracing.span(f"fab {attributes.get('command.verb')}", **attributes) as span:
+        output = THROTTLE.call(command, lambda: _run_command(command))
+        if attributes.get("command.verb") == "api":
+            try:
+                span.set_attribute("status_code", json.loads(output).get("status_code"))
+            except (ValueError, AttributeError):
+                pass
+        return output
+
+
+def get_command_attributes(command: str) -> dict:
+    """
+    Returns trace attributes describing a Fabric CLI command, without arguments that may contain secrets.
+    """
+    match = re.match(r"\s*(\S+)(?:\s+(?:'([^']*)'|(\S+)))?", command)
+    verb = match.group(1) if match else ""
+    attributes = {"command.verb": verb}
+    if verb in ("auth", "config"):
+        return attributes
+
+    tokens = command.split()
+    if verb == "api":
+        path = next((token for token in tokens[1:] if not token.startswith("-") and token.lower() not in ("get", "post", "patch", "put", "delete", "powerbi", "fabric", "storage", "azure")), "")
+        attributes["http.method"] = tokens[tokens.index("-X") + 1].upper() if "-X" in tokens[:-1] else "GET"
+        attributes["endpoint"] = tracing.normalize_endpoint(path)
+        attributes["audience"] = tokens[tokens.index("-A") + 1] if "-A" in tokens[:-1] else "fabric"
+        workspace = re.search(r"(?:workspaces|groups)/([0-9a-fA-F-]{36})", path)
+        if workspace:
+            attributes["workspace_id"] = workspace.group(1)
+        return attributes
+
+    target = (match.group(2) or match.group(3) or "") if match else ""
+    workspace = re.search(r"/?([^/]+)\.Workspace", target)
+    if workspace:
+        attributes["workspace"] = workspace.group(1).replace("\\/", "/")
+    item_type = re.search(r"\.(\w+)/?$", target)
+    if item_type:
+        attributes["item_type"] = item_type.group(1)
+    return attributes
+
+
+def _run_command(command: str) -> tuple:
+    if cassette.is_enabled():
+        return cassette.run_command(command, _execute_command)
+    return _execute_command(command)
+
+
+def _execute_command(command: str) -> tuple:
+    """Runs a Fabric CLI command and returns its filtered output and its error output (stderr)."""
     try:
         result = subprocess.run(
-            ["fab", "-c", command],
+            FAB_EXECUTABLE + ["-c", command],
             capture_output=True,
             text=True,
             check=EXIT_ON_ERROR
@@ -22,13 +107,74 @@ def run_command(command: str) -> str:
         # Remove lines starting with ! (debug etc.)
         filtered_lines = [line for line in output.splitlines() if not line.strip().startswith("&#x27") and not line.strip().startswith("!")]
         clean_result = "\n".join(filtered_lines)
-        return clean_result
+
+        # CLI commands report throttling on stderr, it is only passed to the throttle controller
+        return clean_result, (result.stderr or "").strip() if result.returncode != 0 else ""
     except subprocess.CalledProcessError as e:
         print(f"Error running Fabric CLI command: {command}")
         print(f"Error message: {e.stderr.strip()}")
         if EXIT_ON_ERROR:
             raise
-        return e.stderr.strip()
+        return e.stderr.strip(), e.stderr.strip()
+
+
+def get_cli_config() -> dict:
+    """Returns the settings of the Fabric CLI from its config.json, or an empty dict if they cannot be read."""
+    try:
+        with open(os.path.join(FAB_CONFIG_DIR, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return config if isinstance(config, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def configure(settings: dict):
+    """
+    Sets Fabric CLI settings the CLI does not have yet, e.g. {"encryption_fallback_enabled": "true"}. The current
+    settings are read from the config.json of the CLI, so settings that are already in place cost no CLI launch.
+    """
+    # Recorded and replayed runs issue the same commands regardless of the local CLI state
+    config = {} if cassette.is_enabled() else get_cli_config()
+    for key, value in settings.items():
+        if str(config.get(key, "")).lower() != str(value).lower():
+            run_command(f"config set {key} {value}")
+
+
+def is_logged_in(client_id: str, tenant_id: str) -> bool:
+    """Returns True if `auth status` shows a session of the service principal in the tenant."""
+    status = run_command("auth status")
+    if "Logged in" not in status or "Not logged in" in status:
+        return False
+    return all(value in status for value in (client_id, tenant_id) if value)
+
+
+def login(client_id: str, client_secret: str, tenant_id: str, force: bool = False):
+    """
+    Logs the Fabric CLI in with a service principal, unless it already has a session of that principal. The session
+    is only checked if the CLI has a login (auth.json), so fresh build agents log in without checking first.
+
+    Args:
+        force (bool, optional): Logs in even if a session exists, e.g. to renew it. Default is False.
+    """
+    global _session_principal
+    if not force and _session_principal == (client_id, tenant_id):
+        return
+    has_login = not force and not cassette.is_enabled() and os.path.isfile(os.path.join(FAB_CONFIG_DIR, "auth.json"))
+    if not has_login or not is_logged_in(client_id, tenant_id):
+        run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+    _session_principal = (client_id, tenant_id)
+
+
+def print_throttle_summary():
+    """
+    Prints the concurrency limits, throttle and retry counts per endpoint family if any call was throttled.
+    """
+    metrics = THROTTLE.get_metrics()
+    if not any(family.get("throttled") for family in metrics.values()):
+        return
+    print("")
+    rows = [(name, family.get("calls"), family.get("throttled"), family.get("retries"), family.get("limit"), family.get("wait_seconds")) for name, family in metrics.items() if family.get("calls")]
+    misc.print_table(["Endpoint family", "Calls", "Throttled", "Retries", "Concurrency limit", "Waited (s)"], rows)
 
 
 def get_item(item_path: str, retry_count: int = 0):
@@ -38,7 +184,7 @@ def get_item(item_path: str, retry_count: int = 0):
             return json.loads(cli_response)
         except Exception as e:
             if attempt < retry_count:
-                time.sleep(2)
+                tracing.sleep(2, "retry")
             else:
                 return None
 
@@ -50,7 +196,7 @@ def get_item_id(item_path: str, retry_count: int = 0):
             return cli_response.strip()
         except Exception as e:
             if attempt < retry_count:
-                time.sleep(2)
+                tracing.sleep(2, "retry")
             else:
                 return None
             
@@ -64,6 +210,37 @@ def get_connection(connection_identifier):
         return json.loads(run_command(f"get .connections/{connection_identifier}.Connection -q . -f"))
 
 
+_connection_cache = {}
+
+def get_connection_cached(connection_identifier):
+    """
+    Returns a connection from a per-run cache, resolving it through get_connection on first use.
+    """
+    if connection_identifier not in _connection_cache:
+        _connection_cache[connection_identifier] = get_connection(connection_identifier)
+    return _connection_cache[connection_identifier]
+
+
+def add_cached_connections(connections: dict):
+    """
+    Adds connections resolved earlier (e.g. from a state snapshot) to the per-run cache, as {name or ID: connection}.
+    """
+    _connection_cache.update(connections)
+
+
+_credential_cache = {}
+
+def get_token_credential(client_id, client_secret, tenant_id):
+    """
+    Returns a ClientSecretCredential for the service principal, created once per process so its tokens are reused by later steps.
+    """
+    key = (tenant_id, client_id, client_secret)
+    if key not in _credential_cache:
+        from azure.identity import ClientSecretCredential
+        _credential_cache[key] = ClientSecretCredential(client_id=client_id, client_secret=client_secret, tenant_id=tenant_id)
+    return _credential_cache[key]
+
+
 def connection_exists(connection_identifier):
     if is_guid(connection_identifier): 
         connection_url = f"connections/{connection_identifier}"
@@ -77,6 +254,39 @@ def item_exists(item_path):
     return True if run_command(f"exists {item_path}").replace("*", "").strip().lower() == "true" else False
 
 
+def rename_workspace(workspace_id, display_name):
+    update_url = f"workspaces/{workspace_id}"
+    response = run_command(f"api -X patch {update_url} -i {json.dumps({'displayName': display_name})}")
+    return json.loads(response)
+
+
+def create_folder(workspace_id, display_name):
+    """Creates a folder at the root of a workspace. Returns the API response, 409 if the folder name is taken."""
+    response = run_command(f"api -X post workspaces/{workspace_id}/folders -i {json.dumps({'displayName': display_name})}")
+    return json.loads(response)
+
+
+def delete_folder(workspace_id, folder_id):
+    response = run_command(f"api -X delete workspaces/{workspace_id}/folders/{folder_id}")
+    return json.loads(response)
+
+
+def get_workspace(workspace_id):
+    response = json.loads(run_command(f"api -X get workspaces/{workspace_id}"))
+    if response.get("status_code") == 200:
+        return response.get("text")
+
+
+def update_workspace_spark_settings(workspace_id, spark_settings):
+    """
+    Updates the spark settings of a workspace in one request. spark_settings follows the structure of the
+    workspaces/{workspaceId}/spark/settings API, e.g. {"pool": {"starterPool": {"maxExecutors": 1}}}.
+    """
+    settings_url = f"workspaces/{workspace_id}/spark/settings"
+    response = run_command(f"api -X patch {settings_url} -i {json.dumps(spark_settings)}")
+    return json.loads(response)
+
+
 def get_git_connection(workspace_id):
     git_url = f"workspaces/{workspace_id}/git/connection"
     
@@ -87,7 +297,7 @@ def get_git_connection(workspace_id):
         git_connectionstate = json.loads(response).get("text").get("gitConnectionState")
         if git_connectionstate == "NotConnected":
             # Connection not ready yet, wait and retry
-            time.sleep(2)
+            tracing.sleep(2, "retry")
             retry_count += 1
         else:
             return json.loads(response).get("text")
@@ -200,7 +410,7 @@ def create_fabric_connection(connection_name, connection_type, credential_type,
                 print(f"Attempt {attempt} to create Fabric connection '{connection_name}' failed: {str(e)}")
                 if attempt == max_retries:
                     return None
-                time.sleep(2) # Wait before retrying 
+                tracing.sleep(2, "retry") # Wait before retrying 
         return 
     else:
         print(f"Connection type '{connection_type}' not supported!.")
@@ -239,6 +449,102 @@ def bind_semanticmodel_sqlendpoint(workspace_id, item_id, connection_id, sqlendp
     return json.loads(response)
 
 
+def get_item_definition(workspace_id, item_id):
+    """
+    Starts fetching the definition of an item. Returns the API response including headers, either the
+    definition (200) or a long running operation (202, see x-ms-operation-id).
+    """
+    definition_url = f"workspaces/{workspace_id}/items/{item_id}/getDefinition"
+    return json.loads(run_command(f"api -X post {definition_url} --show_headers"))
+
+
+def create_item_with_definition(workspace_id, display_name, item_type, definition=None, description=None):
+    """
+    Starts creating an item, optionally with a definition. Returns the API response including headers, either
+    the created item (201) or a long running operation (202, see x-ms-operation-id).
+    """
+    body = {"displayName": display_name, "type": item_type}
+    if description:
+        body["description"] = description
+    if definition:
+        body["definition"] = definition
+
+    return _post_with_body(f"workspaces/{workspace_id}/items", body)
+
+
+def update_item_definition(workspace_id, item_id, definition):
+    """
+    Starts replacing the definition of an item. Returns the API response including headers, either 200 or a long
+    running operation (202, see x-ms-operation-id).
+    """
+    return _post_with_body(f"workspaces/{workspace_id}/items/{item_id}/updateDefinition", {"definition": definition})
+
+
+def _post_with_body(url, body):
+    # Large definitions are passed as a file, as they can exceed the maximum command line length
+    body_json = json.dumps(body)
+    if len(body_json) <= 8000:
+        return json.loads(run_command(f"api -X post {url} -i {body_json} --show_headers"))
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        f.write(body_json)
+    try:
+        return json.loads(run_command(f"api -X post {url} -i {f.name} --show_headers"))
+    finally:
+        os.remove(f.name)
+
+
+def list_paginated(endpoint):
+    """
+    Returns all values of a paginated Fabric REST API listing (e.g. "connections" or "workspaces/{id}/roleAssignments").
+    """
+    values = []
+    continuation_token = None
+
+    while True:
+        command = endpoint
+        if continuation_token:
+            command += f"{'&' if '?' in endpoint else '?'}continuationToken={continuation_token}"
+
+        data = json.loads(run_command(f"api -X get {command}"))
+        if data.get("status_code") != 200:
+            break
+        values.extend((data.get("text") or {}).get("value", []))
+        continuation_token = (data.get("text") or {}).get("continuationToken")
+        if not continuation_token:
+            break
+
+    return values
+
+
+def get_role_assignments(endpoint):
+    """
+    Returns the roles of a workspace or connection by principal ID, both lower case, e.g. {"<principal id>": "admin"}.
+
+    Args:
+        endpoint (str): The resource, e.g. "workspaces/{id}" or "connections/{id}".
+    """
+    return {(assignment.get("principal") or {}).get("id", "").lower(): (assignment.get("role") or "").lower() for assignment in list_paginated(f"{endpoint}/roleAssignments")}
+
+
+def delete_resource(endpoint):
+    """
+    Deletes a Fabric REST API resource (e.g. "workspaces/{id}") and returns the status code of the response.
+    """
+    try:
+        return json.loads(run_command(f"api -X delete {endpoint}")).get("status_code")
+    except ValueError:
+        return None
+
+
+def get_git_connection_state(workspace_id):
+    """
+    Returns the git connection state of a workspace (e.g. NotConnected, Connected, ConnectedAndInitialized) without waiting.
+    """
+    response = json.loads(run_command(f"api -X get workspaces/{workspace_id}/git/connection"))
+    return (response.get("text") or {}).get("gitConnectionState")
+
+
 def list_all_workspace_items(workspace_id):
     all_items = []
     continuation_token = None
@@ -251,15 +557,77 @@ def list_all_workspace_items(workspace_id):
 
             response = run_command(f"api -X get {command}")
             data = json.loads(response)
-            all_items.extend(data.get("text").get("value", []))
-            continuation_token = data.get("continuationToken")
+            all_items.extend((data.get("text") or {}).get("value", []))
+            continuation_token = (data.get("text") or {}).get("continuationToken")
             if not continuation_token:
                 break
 
     return all_items
 
 
+def get_workspace_ids():
+    """
+    Resolves the IDs of all workspaces the identity has access to from a single (paginated) workspace listing.
+
+    Returns:
+        dict: Mapping of workspace display name to workspace ID.
+    """
+    workspace_ids = {}
+    continuation_token = None
+
+    while True:
+        command = "workspaces"
+        if continuation_token:
+            command += f"?continuationToken={continuation_token}"
+
+        data = json.loads(run_command(f"api -X get {command}"))
+        for workspace in (data.get("text") or {}).get("value", []):
+            workspace_ids[workspace.get("displayName")] = workspace.get("id")
+        continuation_token = (data.get("text") or {}).get("continuationToken")
+        if not continuation_token:
+            break
+
+    return workspace_ids
+
+
+def get_workspace_item_ids(workspace_id, item_type=None):
+    """
+    Resolves the IDs of all items in a workspace from a single (paginated) item listing.
+
+    Args:
+        workspace_id (str): The workspace ID.
+        item_type (str, optional): Only return items of this type, e.g. "SemanticModel".
+
+    Returns:
+        dict: Mapping of item display name to item ID, or of (display name, type) to item ID if no item_type is given.
+    """
+    item_ids = {}
+    for item in list_all_workspace_items(workspace_id):
+        if item_type is None:
+            item_ids[(item.get("displayName"), item.get("type"))] = item.get("id")
+        elif item.get("type") == item_type:
+            item_ids[item.get("displayName")] = item.get("id")
+    return item_ids
+
+
 def update_workspace_from_git(workspace_id, remote_commit_hash):
+    response = start_update_workspace_from_git(workspace_id, remote_commit_hash)
+
+    if response.get("status_code") == 202: #LRO
+        operation_id = response.get("headers").get("x-ms-operation-id")
+        poll_operation_status(operation_id)
+    else:
+        return response.get("text")
+
+
+def start_update_workspace_from_git(workspace_id, remote_commit_hash):
+    """
+    Starts updating a workspace from git without waiting for the operation to finish.
+
+    Returns:
+        dict: The API response including headers. A status code of 202 means a long running operation was started,
+            its ID is in the x-ms-operation-id header.
+    """
     update_url = f"workspaces/{workspace_id}/git/updateFromGit"
 
     post_data = {
@@ -273,29 +641,46 @@ def update_workspace_from_git(workspace_id, remote_commit_hash):
         }
     }
 
-    response = json.loads(run_command(f"api -X post {update_url} -i {json.dumps(post_data)} --show_headers"))
+    return json.loads(run_command(f"api -X post {update_url} -i {json.dumps(post_data)} --show_headers"))
 
-    if response.get("status_code") == 202: #LRO
-        operation_id = response.get("headers").get("x-ms-operation-id")
-        poll_operation_status(operation_id)
-    else:
+
+def get_operation_state(operation_id):
+    """
+    Returns the current state of a long running operation, or None if it could not be retrieved.
+    """
+    operation_state = json.loads(run_command(f"api -X get operations/{operation_id}"))
+    return operation_state.get("text")
+
+
+def get_operation_result(operation_id):
+    """
+    Returns the result of a succeeded long running operation, e.g. the definition returned by getDefinition.
+    """
+    response = json.loads(run_command(f"api -X get operations/{operation_id}/result"))
+    if response.get("status_code") == 200:
         return response.get("text")
 
 
 def poll_operation_status(operation_id):
+    with tracing.span("lro wait", operation_id=operation_id) as span:
+        operation_state = _poll_operation_status(operation_id)
+        span.set_attribute("status", (operation_state or {}).get("status", "Failed"))
+        return operation_state
+
+
+def _poll_operation_status(operation_id):
     # Poll the operation status until it's done or failed
     retry_count = 0
     max_retries = 5
     while retry_count < max_retries:
-        operation_url = f"operations/{operation_id}"
-        operation_state = json.loads(run_command(f"api -X get {operation_url}"))
-        state_status = operation_state.get("text").get("status")
+        operation_state = get_operation_state(operation_id) or {}
+        state_status = operation_state.get("status")
 
         if state_status in ["NotStarted", "Running"]:
-            time.sleep(2)
+            tracing.sleep(2, "poll")
             retry_count += 1
         elif state_status == "Succeeded":
-            return operation_state.get("text")
+            return operation_state
         else:
             return None
     
@@ -308,6 +693,39 @@ def takeover_semantic_model(workspace_id, semantic_model_id):
     return json.loads(response)
 
 
+def list_semantic_models_powerbi(workspace_id):
+    """
+    Lists all semantic models (datasets) of a workspace through the Power BI API, including their current owner (configuredBy).
+    """
+    response = json.loads(run_command(f"api -A powerbi -X get groups/{workspace_id}/datasets"))
+    if response.get("status_code") == 200:
+        return (response.get("text") or {}).get("value", [])
+    return []
+
+
+def trigger_semantic_model_refresh(workspace_id, semantic_model_id, refresh_body):
+    """
+    Starts an enhanced refresh of a semantic model through the Power BI API.
+
+    Returns:
+        dict: The API response including headers. The refresh request ID is part of the Location header.
+    """
+    refresh_url = f"groups/{workspace_id}/datasets/{semantic_model_id}/refreshes"
+    response = run_command(f"api -A powerbi -X post {refresh_url} -i {json.dumps(refresh_body)} --show_headers")
+    return json.loads(response)
+
+
+def get_semantic_model_refresh_status(workspace_id, semantic_model_id, request_id):
+    """
+    Returns the execution details of an enhanced refresh, or None if they could not be retrieved.
+    """
+    refresh_url = f"groups/{workspace_id}/datasets/{semantic_model_id}/refreshes/{request_id}"
+    response = json.loads(run_command(f"api -A powerbi -X get {refresh_url}"))
+    if response.get("status_code") == 200:
+        return response.get("text")
+    return None
+
+
 def generate_connection_string(workspace_name, item_type, database, client_id, client_secret):
     print(f"Generating connection string for {item_type} '{database}' in workspace '{workspace_name}'...")
     workspace_name_escaped = workspace_name.replace("/", "\\/")
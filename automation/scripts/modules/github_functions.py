@@ -1,5 +1,11 @@
 import requests
 import base64
+import modules.cassette_functions as cassette
+
+cassette.start()
+
+# One session per process, so steps run with fabricops.py reuse its connection pool
+_session = requests.Session()
 
 def build_headers(pat):
     """Build authorization headers for GitHub API using PAT."""
@@ -17,7 +23,7 @@ def get_repository(owner, repo_name, pat):
     headers = build_headers(pat)
     url = f"https://api.github.com/repos/{owner}/{repo_name}"
     
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
     
     return response.json()
@@ -28,7 +34,7 @@ def get_public_key(owner, repo_name, pat):
     headers = build_headers(pat)
     url = f"https://api.github.com/repos/{owner}/{repo_name}/actions/secrets/public-key"
     
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
     
     return response.json()
@@ -69,7 +75,7 @@ def create_or_update_secret(owner, repo_name, secret_name, secret_value, pat):
         "key_id": public_key_id
     }
     
-    response = requests.put(url, headers=headers, json=payload)
+    response = _session.put(url, headers=headers, json=payload)
     response.raise_for_status()
     
     return response.status_code in [201, 204]
@@ -80,7 +86,7 @@ def delete_secret(owner, repo_name, secret_name, pat):
     headers = build_headers(pat)
     url = f"https://api.github.com/repos/{owner}/{repo_name}/actions/secrets/{secret_name}"
     
-    response = requests.delete(url, headers=headers)
+    response = _session.delete(url, headers=headers)
     response.raise_for_status()
 
 
@@ -89,7 +95,7 @@ def list_secrets(owner, repo_name, pat):
     headers = build_headers(pat)
     url = f"https://api.github.com/repos/{owner}/{repo_name}/actions/secrets"
     
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     response.raise_for_status()
     
     return response.json()
@@ -100,6 +106,21 @@ def secret_exists(owner, repo_name, secret_name, pat):
     headers = build_headers(pat)
     url = f"https://api.github.com/repos/{owner}/{repo_name}/actions/secrets/{secret_name}"
     
-    response = requests.get(url, headers=headers)
+    response = _session.get(url, headers=headers)
     
     return response.status_code == 200
+
+
+def list_branches(owner, repo_name, pat):
+    """List the names of all branches of a repository."""
+    headers = build_headers(pat)
+    url = f"https://api.github.com/repos/{owner}/{repo_name}/branches?per_page=100"
+
+    branches = []
+    while url:
+        response = _session.get(url, headers=headers)
+        response.raise_for_status()
+        branches.extend(branch.get("name") for branch in response.json())
+        url = response.links.get("next", {}).get("url")
+
+    return branches
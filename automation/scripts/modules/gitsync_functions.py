@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+
+OPERATION_RUNNING_STATES = {"NotStarted", "Running"}
+
+
+def start_workspace_sync(workspace_name: str, skip_without_changes: bool = True, workspace_id: str = None) -> dict:
+    """
+    Resolves a workspace, fetches its git status and starts the update from git if the workspace is behind.
+
+    Args:
+        workspace_name (str): Name of the workspace to synchronize.
+        skip_without_changes (bool): Skip the update when the status reports no changed items.
+        workspace_id (str, optional): ID of the workspace, if already known. Otherwise it is resolved by name.
+
+    Returns:
+        dict: Sync state with 'workspace', 'workspace_id', 'status', 'message', 'operation_id' and 'start_time'.
+            Status is 'running' while a long running update operation is in progress.
+    """
+    state = {"workspace": workspace_name, "workspace_id": None, "status": None, "message": "", "operation_id": None, "start_time": time.time()}
+
+    if not workspace_id:
+        workspace_name_escaped = workspace_name.replace("/", "\\/")
+        workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+    if not fabcli.is_guid(workspace_id):
+        return {**state, "status": "failed", "message": "Workspace not found."}
+    state["workspace_id"] = workspace_id
+
+    git_status = fabcli.get_git_status(workspace_id)
+    if git_status is None:
+        return {**state, "status": "skipped", "message": "Git synchronization not possible."}
+    if git_status.get("workspaceHead") == git_status.get("remoteCommitHash"):
+        return {**state, "status": "up to date", "message": "Already up to date."}
+    if skip_without_changes and len(git_status.get("changes") or []) == 0:
+        return {**state, "status": "skipped", "message": "No changes detected."}
+
+    response = fabcli.start_update_workspace_from_git(workspace_id, git_status.get("remoteCommitHash"))
+    status_code = response.get("status_code")
+
+    if status_code == 202:
+        headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+        return {**state, "status": "running", "operation_id": headers.get("x-ms-operation-id")}
+    if status_code == 200:
+        return {**state, "status": "updated"}
+    return {**state, "status": "failed", "message": f"Update from git returned status code {status_code}: {response.get('text')}"}
+
+
+def sync_workspaces(workspace_names: list, skip_without_changes: bool = True, max_workers: int = 8, poll_interval: int = 3, timeout_minutes: int = 30, workspace_ids: dict = None) -> list:
+    """
+    Synchronizes multiple workspaces with git concurrently.
+
+    Git status is fetched for all workspaces in parallel, only workspaces whose workspaceHead differs from the
+    remoteCommitHash are updated, and all resulting long running operations are awaited together by one poll loop.
+
+    Args:
+        workspace_names (list[str]): Names of the workspaces to synchronize.
+        skip_without_changes (bool): Skip workspaces whose git status reports no changed items.
+        max_workers (int): Maximum number of workspaces resolved and started in parallel.
+        poll_interval (int): Seconds between two polling rounds.
+        timeout_minutes (int): Time after which operations still running are reported as failed.
+        workspace_ids (dict, optional): Known mapping of workspace name to ID, e.g. from fabcli.get_workspace_ids.
+
+    Returns:
+        list[dict]: One result per workspace (in input order) with 'workspace', 'status', 'message' and 'duration' in seconds.
+    """
+    def start(workspace_name):
+        try:
+            return start_workspace_sync(workspace_name, skip_without_changes, (workspace_ids or {}).get(workspace_name))
+        except Exception as e:
+            return {"workspace": workspace_name, "status": "failed", "message": str(e), "operation_id": None, "start_time": time.time()}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        states = list(executor.map(start, workspace_names))
+
+    for state in states:
+        if state.get("status") != "running":
+            state["end_time"] = time.time()
+        elif not state.get("operation_id"):
+            state.update({"status": "failed", "message": "Operation ID of the update could not be determined.", "end_time": time.time()})
+
+    # Await all long running operations from one poll loop
+    deadline = time.time() + timeout_minutes * 60
+    running = [state for state in states if state.get("status") == "running"]
+    while running:
+        tracing.sleep(poll_interval, "poll")
+
+        for state in running:
+            operation_state = fabcli.get_operation_state(state.get("operation_id")) or {}
+            operation_status = operation_state.get("status")
+
+            if operation_status in OPERATION_RUNNING_STATES:
+                continue
+
+            state["end_time"] = time.time()
+            if operation_status == "Succeeded":
+                state["status"] = "updated"
+            else:
+                error = (operation_state.get("error") or {}).get("message")
+                state.update({"status": "failed", "message": error or f"Update operation ended with status {operation_status}."})
+
+        running = [state for state in running if state.get("status") == "running"]
+
+        if running and time.time() > deadline:
+            for state in running:
+                state.update({"status": "failed", "message": f"Update did not finish within {timeout_minutes} minutes.", "end_time": time.time()})
+            break
+
+    for state in states:
+        if state.get("operation_id"):
+            tracing.record_span("lro git update", state.get("start_time"), state.get("end_time"), workspace=state.get("workspace"), operation_id=state.get("operation_id"), status=state.get("status"))
+
+    return [
+        {
+            "workspace": state.get("workspace"),
+            "status": state.get("status"),
+            "message": state.get("message"),
+            "duration": round(state.get("end_time") - state.get("start_time"), 1),
+        }
+        for state in states
+    ]
+
+
+def print_sync_summary(results: list):
+    """
+    Prints a summary table with the outcome and duration of each workspace synchronization.
+    """
+    rows = [(result.get("workspace"), result.get("status"), f"{result.get('duration')}s", result.get("message") or "") for result in results]
+    misc.print_table(["Workspace", "Outcome", "Duration", "Details"], rows)
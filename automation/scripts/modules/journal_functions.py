@@ -0,0 +1,102 @@
+import os, json, threading
+from datetime import datetime, timezone
+
+
+class SetupJournal:
+    """
+    Append-only journal of completed setup operations, used to resume a failed run from the point of failure.
+
+    Every line of the journal file is a JSON object. The first line describes the run (environment, action and hash of
+    the environment definition), every following line records one completed operation with its key, the IDs it
+    resolved and a timestamp. A final line marks the run as completed.
+
+    A journal is resumed only if it belongs to the same environment, action and definition and the run did not
+    complete. Otherwise a new journal is started, so a later regular run repeats all checks.
+    """
+
+    def __init__(self, file_path: str, environment: str, action: str, definition_hash: str):
+        self.file_path = file_path
+        self.entries = {}
+        self._lock = threading.Lock()
+        header = {"environment": environment, "action": action, "definition_hash": definition_hash}
+
+        previous_header, entries, completed = self._read()
+        if previous_header == header and not completed:
+            self.entries = entries
+        else:
+            directory = os.path.dirname(os.path.abspath(file_path))
+            os.makedirs(directory, exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({**header, "started": self._timestamp()}) + "\n")
+
+    @staticmethod
+    def _timestamp():
+        return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def _read(self):
+        if not os.path.exists(self.file_path):
+            return None, {}, False
+
+        header, entries, completed = None, {}, False
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Last line of a killed run may be incomplete
+                if header is None:
+                    header = {key: record.get(key) for key in ("environment", "action", "definition_hash")}
+                elif record.get("completed"):
+                    completed = True
+                elif record.get("key"):
+                    entries[record.get("key")] = record
+        return header, entries, completed
+
+    def _append(self, record: dict):
+        with self._lock:
+            with open(self.file_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.entries)
+
+    def is_done(self, key: str) -> bool:
+        return key in self.entries
+
+    def get_ids(self, key: str) -> dict:
+        return (self.entries.get(key) or {}).get("ids") or {}
+
+    def record(self, key: str, ids: dict = None):
+        """Records an operation as completed, together with the IDs it created or resolved."""
+        entry = {"key": key, "ids": ids or {}, "timestamp": self._timestamp()}
+        self.entries[key] = entry
+        self._append(entry)
+
+    def verify(self, workspace_ids: set, connection_ids: set) -> int:
+        """
+        Drops journaled operations whose workspace or connection no longer exists, so they are executed again.
+
+        Args:
+            workspace_ids (set): IDs of all existing workspaces, from one workspace listing.
+            connection_ids (set): IDs of all existing connections, from one connection listing.
+
+        Returns:
+            int: Number of dropped operations.
+        """
+        workspace_ids = {value.lower() for value in workspace_ids if value}
+        connection_ids = {value.lower() for value in connection_ids if value}
+        stale = [
+            key for key, entry in self.entries.items()
+            if ((entry.get("ids") or {}).get("workspace_id") and entry["ids"]["workspace_id"].lower() not in workspace_ids)
+            or ((entry.get("ids") or {}).get("connection_id") and entry["ids"]["connection_id"].lower() not in connection_ids)
+        ]
+        for key in stale:
+            self.entries.pop(key)
+        return len(stale)
+
+    def complete(self):
+        """Marks the run as completed, the next run starts a new journal."""
+        self._append({"completed": True, "timestamp": self._timestamp()})
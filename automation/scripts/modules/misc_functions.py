@@ -1,9 +1,14 @@
 import json, os, uuid, re, copy
-from ruamel.yaml import YAML
-from ruamel.yaml.comments import CommentedMap, CommentedSeq
+import modules.trace_functions as tracing
 
-yaml = YAML()
-yaml.indent(mapping=4, sequence=4, offset=2)
+# Round-trip YAML parser, created on first use so scripts that never touch YAML do not import ruamel.yaml
+_yaml = None
+
+# Folders of the environment definitions, parameter files and solution items. Can be overridden through environment
+# variables, e.g. to run the scripts against the synthetic environments of the benchmarks.
+ENVIRONMENTS_DIR = os.environ.get("FABRICOPS_ENVIRONMENTS_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "../../resources/environments"))
+PARAMETERS_DIR = os.environ.get("FABRICOPS_PARAMETERS_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "../../resources/parameters"))
+SOLUTION_DIR = os.environ.get("FABRICOPS_SOLUTION_DIR") or os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../solution"))
 
 # Color codes
 cdefault = '\033[0m'
@@ -17,6 +22,15 @@ cgreen_bold = '\033[1;32m'
 cblue_bold = '\033[1;34m'
 
 
+def get_yaml():
+    """Returns the shared ruamel.yaml round-trip parser (4 space indentation), importing ruamel.yaml on first use."""
+    global _yaml
+    if _yaml is None:
+        from ruamel.yaml import YAML
+        _yaml = YAML()
+        _yaml.indent(mapping=4, sequence=4, offset=2)
+    return _yaml
+
 def print_error(value, bold:bool = False):
     if bold:
         print(f"{cred_bold}{value}{cdefault}")
@@ -44,6 +58,7 @@ def print_info(value:str = "", bold:bool = False, end:str = "\n"):
         print(f"{value}", end=end)
         
 def print_header(value):
+    tracing.start_phase(value)
     print("")
     print(f"{cblue_bold}#################################################################################################################################{cdefault}")
     print(f"{cblue_bold}# {value.center(125)} #{cdefault}")
@@ -51,12 +66,24 @@ def print_header(value):
     
 
 def print_subheader(value):
+    tracing.start_phase(value, level=2)
     print("")
     print(f"{cyellow_bold}##################################################################################################################{cdefault}")
     print(f"{cyellow_bold}# {value.center(110)} #{cdefault}")
     print(f"{cyellow_bold}##################################################################################################################{cdefault}")
     
 
+def print_table(headers: list, rows: list):
+    """
+    Prints rows as a plain text table with columns sized to their widest value.
+    """
+    widths = [max([len(str(header))] + [len(str(row[i])) for row in rows]) for i, header in enumerate(headers)]
+    print_info("  ".join(str(header).ljust(widths[i]) for i, header in enumerate(headers)), bold=True)
+    print_info("  ".join("-" * width for width in widths))
+    for row in rows:
+        print_info("  ".join(str(value).ljust(widths[i]) for i, value in enumerate(row)))
+
+
 def flatten_dict(d, parent_key=''):
     items = []
     for k, v in d.items():
@@ -207,13 +234,14 @@ def manage_find_replace(
     comment: str = None,
     print_operations: bool = False
 ):
+    from ruamel.yaml.comments import CommentedMap, CommentedSeq
 
     if not os.path.isfile(yml_path):
         with open(yml_path, "w") as f:
             f.write("find_replace:\n")
 
     with open(yml_path, "r") as f:
-        data = yaml.load(f)
+        data = get_yaml().load(f)
 
     if 'find_replace' not in data or not isinstance(data['find_replace'], list):
         data['find_replace'] = CommentedSeq()
@@ -256,7 +284,7 @@ def manage_find_replace(
         raise ValueError("Action must be 'upsert' or 'delete'")
 
     with open(yml_path, "w") as f:
-        yaml.dump(data, f)
+        get_yaml().dump(data, f)
 
 def find_item(data, layer_name, unique_name):
     # Find the layer object in the layers list where name matches layer_name
@@ -297,7 +325,7 @@ def build_parameter_yml(yaml_file, all_environments):
     # Skip processing if no environments are provided
     if not all_environments.get("environments"):
         with open(yaml_file, 'r', encoding='utf-8') as file:
-            return yaml.load(file)
+            return get_yaml().load(file)
 
     # Find the environment dict where name == primary_env
     primary_env_obj = next(env for env in all_environments["environments"] if env["name"] == primary_env)
@@ -433,7 +461,7 @@ def get_semantic_model_bindings(yml_path: str, target_layer: str) -> list:
 
     try:
         with open(yml_path, 'r', encoding='utf-8') as f:
-            data = yaml.load(f)
+            data = get_yaml().load(f)
     except Exception as e:
         print_warning(f"Failed to load binding YAML from {yml_path}: {e}")
         return []
@@ -470,6 +498,78 @@ def get_semantic_model_bindings(yml_path: str, target_layer: str) -> list:
     return entries
 
 
+def get_semantic_model_refresh_settings(yml_path: str, target_layer: str) -> dict:
+    """
+    Parse semantic_model_refresh.yml and return the refresh settings of all semantic models in the given layer.
+    Models without an entry are refreshed as a whole with the default settings.
+
+    YAML structure example:
+        semantic_model_refresh:
+          - semantic_model_layer: Model
+            semantic_model: SpaceParts
+            type: Full
+            commit_mode: transactional
+            max_parallelism: 4
+            objects:
+              - table: Sales
+              - table: Orders
+                partition: Orders-2025
+
+    Args:
+        yml_path (str): Path to the YAML file containing the refresh settings.
+        target_layer (str): The semantic model layer to filter by (case-insensitive), e.g., "Model".
+
+    Returns:
+        dict: Mapping of semantic model name to its settings:
+            {
+                "type": str,
+                "commit_mode": str,
+                "max_parallelism": int | None,
+                "objects": list[dict]
+            }
+    """
+
+    if not os.path.exists(yml_path):
+        return {}
+
+    try:
+        with open(yml_path, 'r', encoding='utf-8') as f:
+            data = get_yaml().load(f)
+    except Exception as e:
+        print_warning(f"Failed to load refresh YAML from {yml_path}: {e}")
+        return {}
+
+    settings = {}
+    target_layer_norm = (target_layer or "").strip().lower()
+
+    for entry in (data or {}).get("semantic_model_refresh", []) or []:
+        semantic_model_layer = (entry or {}).get("semantic_model_layer")
+        semantic_model = (entry or {}).get("semantic_model")
+
+        if not semantic_model_layer or not semantic_model:
+            continue
+
+        if semantic_model_layer.strip().lower() != target_layer_norm:
+            continue
+
+        objects = []
+        for obj in (entry.get("objects") or []):
+            if obj and obj.get("table"):
+                target = {"table": str(obj.get("table"))}
+                if obj.get("partition"):
+                    target["partition"] = str(obj.get("partition"))
+                objects.append(target)
+
+        settings[str(semantic_model)] = {
+            "type": entry.get("type") or "Full",
+            "commit_mode": entry.get("commit_mode") or "transactional",
+            "max_parallelism": entry.get("max_parallelism"),
+            "objects": objects
+        }
+
+    return settings
+
+
 def build_parameter_yml_dynamic(yaml_file, dev_environment_data, target_environments=None):
     """
     Creates and updates parameter.yml with dynamic values based on dev environment scan.
@@ -725,6 +825,14 @@ def merge_permissions(layer_permissions, generic_permissions):
     return merged
 
 
+def _replace_expression_value(expr: str, new_value: str) -> str:
+    return re.sub(
+        r'^"[^"]+"(?=\s+meta\s+\[)',
+        lambda _: f'"{new_value}"',
+        expr
+    )
+
+
 def update_expression_tmsl(
     expression: str,
     config: dict,
@@ -734,28 +842,111 @@ def update_expression_tmsl(
     Returns a new config with the model expression updated.
     """
     updated = copy.deepcopy(config)
+    update_expressions_tmsl(updated, {expression: new_value})
+    return updated
 
-    def update_expression(expr: str) -> str:
-        return re.sub(
-            r'^"[^"]+"(?=\s+meta\s+\[)',
-            f'"{new_value}"',
-            expr
-        )
 
-    def walk(node):
-        if isinstance(node, dict):
-            if node.get("name") == expression and "expression" in node:
-                node["expression"] = update_expression(node["expression"])
+def update_expressions_tmsl(
+    config: dict,
+    replacements: dict
+) -> int:
+    """
+    Updates multiple model expressions in a single in-place walk of a TMSL document (model.bim/database.json).
+
+    Args:
+        config (dict): The parsed TMSL document. Modified in place.
+        replacements (dict): Mapping of expression name to the new value, e.g. {"SqlEndpoint": "...", "Database": "Curated"}.
 
-            for value in node.values():
-                walk(value)
+    Returns:
+        int: Number of expressions updated.
+    """
+    updated_count = 0
+    stack = [config]
 
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            name = node.get("name")
+            if name in replacements and "expression" in node:
+                expr = node["expression"]
+                # TMSL allows multi-line expressions to be stored as a list of lines
+                if isinstance(expr, list) and expr:
+                    expr[0] = _replace_expression_value(expr[0], replacements[name])
+                elif isinstance(expr, str):
+                    node["expression"] = _replace_expression_value(expr, replacements[name])
+                updated_count += 1
+            stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
         elif isinstance(node, list):
-            for item in node:
-                walk(item)
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
+
+    return updated_count
 
-    walk(updated)
-    return updated
+
+_JSON_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]:,]')
+
+
+def update_expressions_tmsl_text(
+    content: str,
+    replacements: dict
+) -> tuple:
+    """
+    Updates multiple model expressions directly in the JSON text of a TMSL document without materializing it.
+
+    The text is scanned token by token, tracking only the "name" and "expression" properties of each object.
+    Only the affected expression strings are rewritten, so all other formatting is preserved byte for byte.
+
+    Args:
+        content (str): The TMSL document as text.
+        replacements (dict): Mapping of expression name to the new value.
+
+    Returns:
+        tuple: (updated content, number of expressions updated)
+    """
+    edits = []
+    stack = []  # frames: [kind, current key, expecting key, name, expression span]
+
+    for token in _JSON_TOKEN.finditer(content):
+        value = token.group()
+        frame = stack[-1] if stack else None
+
+        if value == "{":
+            stack.append(["object", None, True, None, None])
+        elif value == "[":
+            # An expression stored as a list of lines is edited in its first line
+            stack.append(["array", frame[1] if frame and frame[0] == "object" else None, False, None, None])
+        elif value in ("}", "]"):
+            stack.pop()
+            if value == "}" and frame[3] in replacements and frame[4]:
+                edits.append((frame[4], replacements[frame[3]]))
+        elif value == ":":
+            frame[2] = False
+        elif value == ",":
+            if frame[0] == "object":
+                frame[2] = True
+        elif frame is None:
+            continue
+        elif frame[0] == "object" and frame[2]:
+            frame[1] = json.loads(value)
+        elif frame[0] == "object" and frame[1] == "name":
+            frame[3] = json.loads(value)
+        elif frame[0] == "object" and frame[1] == "expression":
+            frame[4] = token.span()
+        elif frame[0] == "array" and frame[1] == "expression" and len(stack) > 1 and stack[-2][4] is None:
+            stack[-2][4] = token.span()
+
+    if not edits:
+        return content, 0
+
+    parts, position = [], 0
+    for (start, end), new_value in sorted(edits):
+        original = content[start:end]
+        updated = _replace_expression_value(json.loads(original), new_value)
+        parts.append(content[position:start])
+        parts.append(json.dumps(updated, ensure_ascii=False) if updated != json.loads(original) else original)
+        position = end
+    parts.append(content[position:])
+
+    return "".join(parts), len(edits)
 
 
 def update_expression_tmdl(
@@ -777,4 +968,65 @@ def update_expression_tmdl(
     if count == 0:
         raise ValueError(f"{expression} expression not found")
 
-    return updated
\ No newline at end of file
+    return updated
+
+
+def update_expressions_tmdl(
+    content: str,
+    replacements: dict
+) -> tuple:
+    """
+    Updates multiple model expressions in TMDL content. Expressions not present in the content are skipped.
+
+    Args:
+        content (str): The TMDL content, e.g. of expressions.tmdl.
+        replacements (dict): Mapping of expression name to the new value.
+
+    Returns:
+        tuple: (updated content, number of expressions updated)
+    """
+    updated_count = 0
+    for expression, new_value in replacements.items():
+        try:
+            content = update_expression_tmdl(expression, content, new_value)
+            updated_count += 1
+        except ValueError:
+            continue
+
+    return content, updated_count
+
+
+def build_semantic_model_connection_string(workspace_name: str, semantic_model_name: str, semantic_model_id: str) -> str:
+    """
+    Builds the connection string used by a report definition (definition.pbir) bound to a published semantic model.
+    """
+    return (
+        f'Data Source="powerbi://api.powerbi.com/v1.0/myorg/{workspace_name}";'
+        f'initial catalog={semantic_model_name};'
+        'access mode=readonly;'
+        'integrated security=ClaimsToken;'
+        f'semanticmodelid={semantic_model_id};'
+    )
+
+
+def get_report_semantic_model_name(report_definition: dict):
+    """
+    Determines the name of the semantic model a report definition (definition.pbir) is bound to.
+
+    Returns:
+        str or None: The semantic model name from the 'initial catalog' of a connection binding,
+                     or from the folder name of a path binding. None if it cannot be determined.
+    """
+    dataset_reference = (report_definition or {}).get("datasetReference", {}) or {}
+
+    connection_string = (dataset_reference.get("byConnection") or {}).get("connectionString") or ""
+    match = re.search(r'initial catalog=([^;]+)', connection_string, re.IGNORECASE)
+    if match:
+        return match.group(1).strip().strip('"')
+
+    path = (dataset_reference.get("byPath") or {}).get("path") or ""
+    folder_name = os.path.basename(path.replace("\\", "/").rstrip("/"))
+    if folder_name.endswith(".SemanticModel"):
+        return folder_name.removesuffix(".SemanticModel")
+
+    return None
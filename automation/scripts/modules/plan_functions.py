@@ -0,0 +1,547 @@
+import json, hashlib, copy, time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+
+PLAN_VERSION = 1
+ITEM_CONNECTION_TYPES = {"Lakehouse", "SQLDatabase", "Warehouse"}
+
+
+def get_definition_hash(env_definition: dict) -> str:
+    """
+    Returns a stable hash of the merged environment definition, used to detect plans that are out of date.
+    """
+    return hashlib.sha256(json.dumps(env_definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def read_current_state(env_definition: dict, environment: str, max_workers: int = 8) -> dict:
+    """
+    Reads the current state of an environment with bulk listings issued in parallel.
+
+    Workspaces and connections are read with one listing each. For every workspace of the environment that exists,
+    items, role assignments, managed private endpoints, workspace identity and git connection state are read
+    concurrently. Role assignments of existing connections referenced by the definition are read as well.
+
+    Returns:
+        dict: {"workspaces": {name: {...}}, "connections": {name: {"id", "role_assignments"}}}
+    """
+    solution_name = env_definition.get("name")
+    workspace_names = [solution_name.format(layer=layer, environment=environment) for layer in env_definition.get("layers")]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        workspace_ids_future = executor.submit(fabcli.get_workspace_ids)
+        connections_future = executor.submit(fabcli.list_paginated, "connections")
+        workspace_ids = workspace_ids_future.result()
+
+        def read_workspace(workspace_id):
+            items = executor.submit(fabcli.list_all_workspace_items, workspace_id)
+            role_assignments = executor.submit(fabcli.list_paginated, f"workspaces/{workspace_id}/roleAssignments")
+            private_endpoints = executor.submit(fabcli.list_paginated, f"workspaces/{workspace_id}/managedPrivateEndpoints")
+            workspace = executor.submit(fabcli.get_workspace, workspace_id)
+            git_state = executor.submit(fabcli.get_git_connection_state, workspace_id)
+            return {
+                "id": workspace_id,
+                "items": {(item.get("displayName"), item.get("type")): item.get("id") for item in items.result()},
+                "role_assignments": {(assignment.get("principal") or {}).get("id", "").lower(): (assignment.get("role") or "").lower() for assignment in role_assignments.result()},
+                "private_endpoints": {endpoint.get("name"): endpoint.get("id") for endpoint in private_endpoints.result()},
+                "workspace_identity": ((workspace.result() or {}).get("workspaceIdentity") or {}).get("servicePrincipalId"),
+                "git_connection_state": git_state.result(),
+            }
+
+        # Workspace reads fan out into the same pool, so they are awaited from dedicated threads
+        with ThreadPoolExecutor(max_workers=max(1, len(workspace_names))) as workspace_executor:
+            workspace_futures = {name: workspace_executor.submit(read_workspace, workspace_ids[name]) for name in workspace_names if name in workspace_ids}
+            workspaces = {name: future.result() for name, future in workspace_futures.items()}
+
+        connections = {connection.get("displayName"): {"id": connection.get("id"), "role_assignments": {}} for connection in connections_future.result()}
+
+    referenced = set(get_connection_names(env_definition, environment)) & set(connections)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {name: executor.submit(fabcli.list_paginated, f"connections/{connections[name]['id']}/roleAssignments") for name in referenced}
+        for name, future in futures.items():
+            connections[name]["role_assignments"] = {(assignment.get("principal") or {}).get("id", "").lower(): assignment.get("role") for assignment in future.result()}
+
+    return {"workspaces": workspaces, "connections": connections}
+
+
+def read_teardown_state(env_definition: dict, environment: str, max_workers: int = 8) -> dict:
+    """
+    Reads only what is needed to tear down an environment: workspaces and connections with one listing each and the
+    managed private endpoints of existing workspaces that define private endpoints, all in parallel.
+
+    Returns:
+        dict: The same structure as read_current_state, limited to IDs and private endpoints.
+    """
+    solution_name = env_definition.get("name")
+    layers = env_definition.get("layers")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        workspace_ids_future = executor.submit(fabcli.get_workspace_ids)
+        connections_future = executor.submit(fabcli.list_paginated, "connections")
+        workspace_ids = workspace_ids_future.result()
+
+        workspaces = {}
+        endpoint_futures = {}
+        for layer, layer_definition in layers.items():
+            workspace_name = solution_name.format(layer=layer, environment=environment)
+            if workspace_name not in workspace_ids:
+                continue
+            workspaces[workspace_name] = {"id": workspace_ids[workspace_name], "private_endpoints": {}}
+            if layer_definition.get("private_endpoints"):
+                endpoint_futures[workspace_name] = executor.submit(fabcli.list_paginated, f"workspaces/{workspace_ids[workspace_name]}/managedPrivateEndpoints")
+
+        for workspace_name, future in endpoint_futures.items():
+            workspaces[workspace_name]["private_endpoints"] = {endpoint.get("name"): endpoint.get("id") for endpoint in future.result()}
+        connections = {connection.get("displayName"): {"id": connection.get("id")} for connection in connections_future.result()}
+
+    return {"workspaces": workspaces, "connections": connections}
+
+
+def get_connection_names(env_definition: dict, environment: str) -> list:
+    """
+    Returns the names of all connections an environment definition refers to (generic, git and item connections).
+    """
+    generic = env_definition.get("generic") or {}
+    names = []
+    if generic.get("is_primary"):
+        names += [connection.get("name") for connection in generic.get("fabric_connections") or []]
+    git_credentials = (generic.get("git_settings") or {}).get("myGitCredentials") or {}
+    if git_credentials.get("connection_name"):
+        names.append(git_credentials.get("connection_name"))
+    for layer, layer_definition in env_definition.get("layers").items():
+        for item_type, items in (layer_definition.get("items") or {}).items():
+            for item in items:
+                if item.get("connection_name") and item_type in ITEM_CONNECTION_TYPES:
+                    names.append(item.get("connection_name").format(layer=layer, environment=environment))
+    return names
+
+
+def build_plan(env_definition: dict, environment: str, state: dict, action: str = "create") -> dict:
+    """
+    Diffs the current state against the environment definition and returns the operations needed to converge.
+
+    Every operation has an 'id', an 'action' (see OPERATION_HANDLERS), a readable 'description', the 'params' needed
+    to execute it and the IDs of the operations it 'depends_on'. IDs of resources that already exist are stored in
+    'resolved_ids', so applying the plan needs no further reads. The plan never contains secrets.
+    """
+    operations = []
+    resolved_ids = {}
+
+    def add(operation_action, description, params, depends_on=None):
+        operation_id = f"op-{len(operations) + 1:03d}"
+        operations.append({"id": operation_id, "action": operation_action, "description": description, "params": params, "depends_on": [d for d in (depends_on or []) if d]})
+        return operation_id
+
+    generic = env_definition.get("generic") or {}
+    solution_name = env_definition.get("name")
+    layers = env_definition.get("layers")
+    connections = state.get("connections")
+    workspaces = state.get("workspaces")
+
+    for name, connection in connections.items():
+        resolved_ids[f"connection:{name}"] = connection.get("id")
+    for name, workspace in workspaces.items():
+        resolved_ids[f"workspace:{name}"] = workspace.get("id")
+
+    if action == "delete":
+        # Connections are independent of each other and of the workspaces, private endpoints are removed before their workspace
+        connection_names = list(dict.fromkeys(get_connection_names(env_definition, environment)))
+        git_credentials = (generic.get("git_settings") or {}).get("myGitCredentials") or {}
+        if not git_credentials.get("connection_name") and git_credentials.get("connectionId"):
+            # A git connection configured by ID is resolved to its name from the connection listing
+            connection_names += [name for name, connection in connections.items() if (connection.get("id") or "").lower() == git_credentials.get("connectionId").lower() and name not in connection_names]
+        for connection_name in connection_names:
+            if connection_name in connections:
+                add("delete_connection", f"Delete connection '{connection_name}'", {"connection_name": connection_name, "connection_id": connections[connection_name].get("id")})
+        for layer, layer_definition in layers.items():
+            workspace_name = solution_name.format(layer=layer, environment=environment)
+            if workspace_name not in workspaces:
+                continue
+            workspace = workspaces[workspace_name]
+            endpoint_operations = [
+                add("delete_private_endpoint", f"Delete private endpoint '{endpoint.get('name')}' in '{workspace_name}'",
+                    {"workspace_name": workspace_name, "workspace_id": workspace.get("id"), "endpoint_name": endpoint.get("name"), "endpoint_id": workspace.get("private_endpoints")[endpoint.get("name")]})
+                for endpoint in layer_definition.get("private_endpoints") or [] if endpoint.get("name") in workspace.get("private_endpoints")
+            ]
+            add("delete_workspace", f"Delete workspace '{workspace_name}'", {"workspace_name": workspace_name, "workspace_id": workspace.get("id")}, endpoint_operations)
+        return finalize_plan(env_definition, environment, action, operations, resolved_ids)
+
+    connection_permissions = generic.get("permissions") or {}
+
+    def plan_connection_roles(connection_name, permissions, depends_on):
+        existing = (connections.get(connection_name) or {}).get("role_assignments") or {}
+        for permission, definitions in (permissions or {}).items():
+            role = "Owner" if permission == "Admin" else "User"
+            for definition in definitions:
+                if (definition.get("id") or "").lower() not in existing:
+                    add("assign_connection_role", f"Grant {role} on connection '{connection_name}' to {definition.get('id')}",
+                        {"connection_name": connection_name, "identity_id": definition.get("id"), "identity_type": definition.get("type"), "role": role}, [depends_on])
+
+    # Generic connections
+    if generic.get("is_primary"):
+        for connection in generic.get("fabric_connections") or []:
+            operation_id = None
+            if connection.get("name") not in connections:
+                operation_id = add("create_fabric_connection", f"Create Fabric connection '{connection.get('name')}'",
+                                   {"connection_name": connection.get("name"), "connection_type": connection.get("type"), "auth_type": connection.get("auth_type")})
+            plan_connection_roles(connection.get("name"), connection_permissions, operation_id)
+
+    git_settings = generic.get("git_settings")
+    git_connection_name = ((git_settings or {}).get("myGitCredentials") or {}).get("connection_name")
+    git_connection_operation = None
+    if git_connection_name:
+        if git_connection_name not in connections:
+            provider_details = git_settings.get("gitProviderDetails")
+            if provider_details.get("gitProviderType").lower() == "github":
+                repo_url = f"https://github.com/{provider_details.get('ownerName')}/{provider_details.get('repositoryName')}"
+            else:
+                repo_url = f"https://dev.azure.com/{provider_details.get('organizationName')}/{provider_details.get('projectName')}/_git/{provider_details.get('repositoryName')}"
+            git_connection_operation = add("create_git_connection", f"Create source control connection '{git_connection_name}'",
+                                           {"connection_name": git_connection_name, "provider": provider_details.get("gitProviderType"), "repo_url": repo_url})
+        plan_connection_roles(git_connection_name, connection_permissions, git_connection_operation)
+
+    # Workspaces
+    workspace_operations = {}
+    identity_acl = []
+    for layer, layer_definition in layers.items():
+        workspace_name = solution_name.format(layer=layer, environment=environment)
+        workspace = workspaces.get(workspace_name) or {}
+        capacity_name = layer_definition.get("capacity_name", generic.get("capacity_name"))
+
+        workspace_operation = None
+        if not workspace:
+            workspace_operation = add("create_workspace", f"Create workspace '{workspace_name}' on capacity '{capacity_name}'", {"workspace_name": workspace_name, "capacity_name": capacity_name})
+        workspace_operations[workspace_name] = workspace_operation
+
+        permissions = misc.merge_permissions(layer_definition.get("permissions"), generic.get("permissions"))
+        for permission, definitions in (permissions or {}).items():
+            for definition in definitions:
+                if definition.get("type").lower() == "workspaceidentity":
+                    identity_acl.append((workspace_name, definition.get("name").format(layer=layer, environment=environment)))
+                elif (workspace.get("role_assignments") or {}).get((definition.get("id") or "").lower()) != permission.lower():
+                    add("assign_workspace_role", f"Grant {permission} on '{workspace_name}' to {definition.get('id')}",
+                        {"workspace_name": workspace_name, "identity_id": definition.get("id"), "role": permission.lower()}, [workspace_operation])
+
+        if layer_definition.get("create_workspace_identity", False) and not workspace.get("workspace_identity"):
+            workspace_operations[f"identity:{workspace_name}"] = add("create_workspace_identity", f"Create workspace identity for '{workspace_name}'", {"workspace_name": workspace_name}, [workspace_operation])
+
+        item_operations = {}
+        for item_type, items in (layer_definition.get("items") or {}).items():
+            for item in items:
+                if item.get("skip_item_creation", False) or (item.get("item_name"), item_type) in (workspace.get("items") or {}):
+                    continue
+                item_operations[(item.get("item_name"), item_type)] = add("create_item", f"Create {item_type} '{item.get('item_name')}' in '{workspace_name}'",
+                    {"workspace_name": workspace_name, "item_type": item_type, "item_name": item.get("item_name"), "item_folder": item.get("item_folder")}, [workspace_operation])
+
+        for endpoint in layer_definition.get("private_endpoints") or []:
+            if endpoint.get("name") not in (workspace.get("private_endpoints") or {}):
+                add("create_private_endpoint", f"Create private endpoint '{endpoint.get('name')}' in '{workspace_name}'",
+                    {"workspace_name": workspace_name, "endpoint_name": endpoint.get("name"), "target_id": endpoint.get("id"),
+                     "subresource_type": misc.get_private_endpoint_resource_type(endpoint.get("id")), "auto_approve": bool(endpoint.get("auto_approve"))}, [workspace_operation])
+
+        git_operation = None
+        if git_connection_name and layer_definition.get("git_directoryName") and workspace.get("git_connection_state") in (None, "NotConnected"):
+            git_operation = add("connect_workspace_git", f"Connect '{workspace_name}' to git folder '{layer_definition.get('git_directoryName')}'",
+                {"workspace_name": workspace_name, "git_settings": git_settings, "connection_name": git_connection_name, "directory_name": layer_definition.get("git_directoryName")},
+                [workspace_operation, git_connection_operation] + list(item_operations.values()))
+
+        # Item connections, items skipped during creation are created by the git update
+        for item_type, items in (layer_definition.get("items") or {}).items():
+            for item in items:
+                if not (item.get("connection_name") and item_type in ITEM_CONNECTION_TYPES):
+                    continue
+                connection_name = item.get("connection_name").format(layer=layer, environment=environment)
+                connection_operation = None
+                if connection_name not in connections:
+                    connection_operation = add("create_item_connection", f"Create SQL connection '{connection_name}' for {item_type} '{item.get('item_name')}'",
+                        {"connection_name": connection_name, "workspace_name": workspace_name, "item_type": item_type, "item_name": item.get("item_name")},
+                        [workspace_operation, git_operation, item_operations.get((item.get("item_name"), item_type))])
+                plan_connection_roles(connection_name, permissions, connection_operation)
+
+    for workspace_name, identity_workspace_name in identity_acl:
+        identity_workspace = workspaces.get(identity_workspace_name) or {}
+        if identity_workspace.get("workspace_identity") and (workspaces.get(workspace_name) or {}).get("role_assignments", {}).get(identity_workspace.get("workspace_identity").lower()) == "admin":
+            continue
+        add("assign_workspace_identity_role", f"Grant Admin on '{workspace_name}' to the identity of '{identity_workspace_name}'",
+            {"workspace_name": workspace_name, "identity_workspace_name": identity_workspace_name},
+            [workspace_operations.get(workspace_name), workspace_operations.get(f"identity:{identity_workspace_name}")])
+
+    return finalize_plan(env_definition, environment, action, operations, resolved_ids)
+
+
+def finalize_plan(env_definition, environment, action, operations, resolved_ids) -> dict:
+    return {
+        "version": PLAN_VERSION,
+        "environment": environment,
+        "action": action,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "definition_hash": get_definition_hash(env_definition),
+        "resolved_ids": resolved_ids,
+        "operations": operations,
+    }
+
+
+def print_plan(plan: dict):
+    """
+    Prints the operations of a plan as a table.
+    """
+    if not plan.get("operations"):
+        misc.print_success("No changes. The environment matches its definition.")
+        return
+    rows = [(operation.get("id"), operation.get("description"), ", ".join(operation.get("depends_on")) or "-") for operation in plan.get("operations")]
+    misc.print_table(["Id", "Operation", "Depends on"], rows)
+    misc.print_info(f"\n{len(rows)} operation(s) planned.", bold=True)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Apply
+# ---------------------------------------------------------------------------------------------------------------------
+
+def _escaped(name: str) -> str:
+    return name.replace("/", "\\/")
+
+
+def _resolve_workspace_id(context, workspace_name):
+    workspace_id = context["ids"].get(f"workspace:{workspace_name}")
+    if not workspace_id:
+        workspace_id = fabcli.run_command(f"get '{_escaped(workspace_name)}.Workspace' -q id -f").strip()
+        context["ids"][f"workspace:{workspace_name}"] = workspace_id
+    return workspace_id
+
+
+def _resolve_connection_id(context, connection_name):
+    connection_id = context["ids"].get(f"connection:{connection_name}")
+    if not connection_id:
+        connection_id = (fabcli.get_connection(connection_name) or {}).get("id")
+        context["ids"][f"connection:{connection_name}"] = connection_id
+    return connection_id
+
+
+def _create_fabric_connection(params, context):
+    connection = fabcli.create_fabric_connection(params["connection_name"], params["connection_type"], params["auth_type"], context["tenant_id"], context["client_id"], context["client_secret"])
+    if not connection:
+        raise RuntimeError("Connection could not be created.")
+    context["ids"][f"connection:{params['connection_name']}"] = connection.get("id")
+
+
+def _create_git_connection(params, context):
+    if params["provider"].lower() == "github":
+        fabcli.create_github_connection(params["connection_name"], params["repo_url"], context["github_pat"])
+    else:
+        fabcli.create_azuredevops_connection(params["connection_name"], params["repo_url"], context["tenant_id"], context["client_id"], context["client_secret"])
+    if not _resolve_connection_id(context, params["connection_name"]):
+        raise RuntimeError("Connection could not be created.")
+
+
+def _assign_connection_role(params, context):
+    fabcli.add_connection_roleassignment(_resolve_connection_id(context, params["connection_name"]), params["identity_id"], params["identity_type"], params["role"])
+
+
+def _create_workspace(params, context):
+    fabcli.run_command(f"create '{_escaped(params['workspace_name'])}.Workspace' -P capacityname={params['capacity_name']}")
+    if not fabcli.is_guid(_resolve_workspace_id(context, params["workspace_name"])):
+        raise RuntimeError("Workspace could not be created.")
+
+
+def _assign_workspace_role(params, context):
+    fabcli.run_command(f"acl set '{_escaped(params['workspace_name'])}.Workspace' -I {params['identity_id']} -R {params['role']} -f")
+
+
+def _create_workspace_identity(params, context):
+    workspace_name = _escaped(params["workspace_name"])
+    fabcli.run_command(f"create '{workspace_name}.Workspace/.managedidentities/{workspace_name}.ManagedIdentity'")
+
+
+def _create_item(params, context):
+    item_folder = f"{params['item_folder']}/" if params.get("item_folder") else ""
+    fabcli.run_command(f"create '{_escaped(params['workspace_name'])}.Workspace/{item_folder}{params['item_name']}.{params['item_type']}'")
+
+
+def _create_private_endpoint(params, context):
+    fabcli.run_command(
+        f"create '{_escaped(params['workspace_name'])}.Workspace/.managedprivateendpoints/{params['endpoint_name']}.ManagedPrivateEndpoint'"
+        f" -P targetPrivateLinkResourceId={params['target_id']},targetSubresourceType={params['subresource_type']},"
+        f"autoApproveEnabled={'true' if params['auto_approve'] else 'false'}"
+    )
+
+
+def _connect_workspace_git(params, context):
+    workspace_id = _resolve_workspace_id(context, params["workspace_name"])
+    git_settings = copy.deepcopy(params["git_settings"])
+    git_settings["myGitCredentials"].pop("connection_name", None)
+    git_settings["myGitCredentials"]["connectionId"] = _resolve_connection_id(context, params["connection_name"])
+    git_settings["gitProviderDetails"]["directoryName"] = params["directory_name"]
+
+    if not fabcli.connect_workspace_to_git(workspace_id, git_settings):
+        raise RuntimeError("Connecting to git failed. Please verify connection and tenant settings.")
+    init_response = fabcli.initialize_git_connection(workspace_id)
+    if init_response and init_response.get("requiredAction") != "None" and init_response.get("remoteCommitHash"):
+        fabcli.update_workspace_from_git(workspace_id, init_response.get("remoteCommitHash"))
+
+
+def _assign_workspace_identity_role(params, context):
+    identity_id = fabcli.run_command(f"get '{_escaped(params['identity_workspace_name'])}.Workspace' -q workspaceIdentity.servicePrincipalId -f").strip()
+    if not fabcli.is_guid(identity_id):
+        raise RuntimeError(f"Workspace identity of '{params['identity_workspace_name']}' not found.")
+    fabcli.run_command(f"acl set '{_escaped(params['workspace_name'])}.Workspace' -I {identity_id} -R admin -f")
+
+
+def _create_item_connection(params, context):
+    item_path = f"/{_escaped(params['workspace_name'])}.Workspace/{params['item_name']}.{params['item_type']}"
+
+    # Lakehouse SQL endpoints are provisioned asynchronously after the lakehouse is created
+    deadline = time.time() + 60
+    while True:
+        properties = (fabcli.get_item(item_path, retry_count=2) or {}).get("properties") or {}
+        server = properties.get("serverFqdn") if params["item_type"] == "SQLDatabase" else properties.get("connectionString")
+        if server or time.time() > deadline:
+            break
+        tracing.sleep(2, "sql endpoint provisioning")
+
+    if not server:
+        raise RuntimeError(f"Connection details of {params['item_type']} '{params['item_name']}' could not be retrieved.")
+
+    database = params["item_name"] if params["item_type"] in ("Lakehouse", "Warehouse") else properties.get("databaseName")
+    fabcli.create_sql_connection(params["connection_name"], server, database, context["tenant_id"], context["client_id"], context["client_secret"])
+    if not _resolve_connection_id(context, params["connection_name"]):
+        raise RuntimeError("Connection could not be created.")
+
+
+# Deletes use the IDs read with the plan, objects that were deleted in the meantime count as deleted
+
+def _delete(endpoint):
+    status_code = fabcli.delete_resource(endpoint)
+    if status_code not in (200, 202, 204, 404):
+        raise RuntimeError(f"Delete returned status code {status_code}.")
+
+
+def _delete_connection(params, context):
+    _delete(f"connections/{params['connection_id']}")
+
+
+def _delete_private_endpoint(params, context):
+    _delete(f"workspaces/{params['workspace_id']}/managedPrivateEndpoints/{params['endpoint_id']}")
+
+
+def _delete_workspace(params, context):
+    _delete(f"workspaces/{params['workspace_id']}")
+
+
+OPERATION_HANDLERS = {
+    "create_fabric_connection": _create_fabric_connection,
+    "create_git_connection": _create_git_connection,
+    "assign_connection_role": _assign_connection_role,
+    "create_workspace": _create_workspace,
+    "assign_workspace_role": _assign_workspace_role,
+    "create_workspace_identity": _create_workspace_identity,
+    "create_item": _create_item,
+    "create_private_endpoint": _create_private_endpoint,
+    "connect_workspace_git": _connect_workspace_git,
+    "assign_workspace_identity_role": _assign_workspace_identity_role,
+    "create_item_connection": _create_item_connection,
+    "delete_connection": _delete_connection,
+    "delete_private_endpoint": _delete_private_endpoint,
+    "delete_workspace": _delete_workspace,
+}
+
+
+def apply_plan(plan: dict, context: dict, max_workers: int = 8, journal=None) -> list:
+    """
+    Executes the operations of a plan with maximal parallelism.
+
+    An operation starts as soon as all operations it depends on have succeeded. Operations depending on a failed
+    operation are skipped. Results are printed as the operations complete. With a journal, operations completed by a
+    previous (failed) apply of the same plan are not executed again.
+
+    Args:
+        plan (dict): The plan as returned by build_plan.
+        context (dict): Credentials used by the operations ('tenant_id', 'client_id', 'client_secret', 'github_pat').
+        max_workers (int): Maximum number of operations executed at the same time.
+        journal (SetupJournal, optional): Journal recording completed operations.
+
+    Returns:
+        list[dict]: One result per operation with 'id', 'description', 'status' (succeeded, failed or skipped),
+            'message' and 'duration' in seconds.
+    """
+    context = {**context, "ids": dict(plan.get("resolved_ids") or {})}
+    operations = {operation.get("id"): operation for operation in plan.get("operations")}
+    results = {}
+    running = {}
+
+    def execute(operation):
+        start_time = time.time()
+        with tracing.span(f"operation {operation.get('action')}", operation_id=operation.get("id")):
+            OPERATION_HANDLERS[operation.get("action")](operation.get("params"), context)
+        return round(time.time() - start_time, 1)
+
+    def record(operation, status, message="", duration=0):
+        results[operation.get("id")] = {"id": operation.get("id"), "description": operation.get("description"), "status": status, "message": message, "duration": duration}
+        if status == "succeeded" and journal is not None and not journal.is_done(operation.get("id")):
+            journal.record(operation.get("id"))
+        if status == "succeeded":
+            misc.print_success(f"✔ {operation.get('id')} {operation.get('description')} ({duration}s)")
+        elif status == "failed":
+            misc.print_error(f"✖ {operation.get('id')} {operation.get('description')}: {message}")
+        else:
+            misc.print_warning(f"⚠ {operation.get('id')} {operation.get('description')}: {message}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while len(results) < len(operations):
+            completed = len(results)
+            for operation_id, operation in operations.items():
+                if operation_id in results or operation_id in running.values():
+                    continue
+                dependencies = [results.get(dependency, {}).get("status") for dependency in operation.get("depends_on")]
+                if journal is not None and journal.is_done(operation_id):
+                    results[operation_id] = {"id": operation_id, "description": operation.get("description"), "status": "succeeded", "message": "Completed in previous run", "duration": 0}
+                    misc.print_warning(f"⚠ {operation_id} {operation.get('description')}: Completed in previous run")
+                elif any(status in ("failed", "skipped") for status in dependencies):
+                    record(operation, "skipped", "A dependency did not succeed.")
+                elif operation.get("action") not in OPERATION_HANDLERS:
+                    record(operation, "failed", f"Unknown operation '{operation.get('action')}'.")
+                elif any(dependency not in operations for dependency in operation.get("depends_on")):
+                    record(operation, "failed", f"Depends on operations not in the plan: {', '.join(dependency for dependency in operation.get('depends_on') if dependency not in operations)}.")
+                elif all(status == "succeeded" for status in dependencies):
+                    running[executor.submit(execute, operation)] = operation_id
+
+            if not running:
+                if len(results) == completed:
+                    # Nothing runs and nothing was decided, the remaining operations wait for each other
+                    for operation_id, operation in operations.items():
+                        if operation_id not in results:
+                            record(operation, "failed", "Dependencies can never complete (circular dependency).")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                operation = operations[running.pop(future)]
+                try:
+                    record(operation, "succeeded", duration=future.result())
+                except Exception as e:
+                    record(operation, "failed", str(e))
+
+    return [results[operation_id] for operation_id in operations]
+
+
+def save_plan(plan: dict, file_path: str):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+
+
+def load_plan(file_path: str) -> dict:
+    """
+    Reads a plan file.
+
+    Raises:
+        ValueError: If an operation depends on an operation that is not in the plan (e.g. a hand-edited or truncated file).
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+
+    operation_ids = {operation.get("id") for operation in plan.get("operations") or []}
+    unknown = sorted({dependency for operation in plan.get("operations") or [] for dependency in operation.get("depends_on") or [] if dependency not in operation_ids})
+    if unknown:
+        raise ValueError(f"Plan {file_path} has dependencies on operations that are not in the plan: {', '.join(unknown)}")
+    return plan
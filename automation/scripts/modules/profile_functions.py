@@ -0,0 +1,168 @@
+import os, sys, signal, atexit, threading, cProfile, pstats
+from datetime import datetime, timezone
+
+# Profiles where an entry script spends its time. cProfile measures the calls of the run deterministically (written
+# as .pstats, open with snakeviz or pstats), a stack sampler records the stacks of all threads, including thread pool
+# workers, as collapsed stacks (written as .folded, open with speedscope, flamegraph.pl or https://www.speedscope.app).
+
+SAMPLE_INTERVAL = 0.01
+TOP_FUNCTIONS = 15
+
+_profiler = None
+_sampler = None
+_profile_path = None
+_script = None
+
+
+class StackSampler:
+    """
+    Samples the stacks of all threads at a fixed interval and counts them as collapsed stacks.
+
+    Samples are taken in a SIGALRM handler of the main thread where available, so no additional Python thread runs
+    while cProfile (which records all threads since Python 3.12) is active. Elsewhere a background thread samples.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._labels = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._previous_handler = None
+
+    def start(self):
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGALRM, self.sample)
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        else:
+            self._thread = threading.Thread(target=self.sample_thread, name="fabricops-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+        else:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler or signal.SIG_DFL)
+
+    def sample_thread(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self, signum=None, current_frame=None):
+        own_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                # The signal handler gets the interrupted frame of the main thread, so the handler itself is skipped
+                if current_frame is None:
+                    continue
+                frame = current_frame
+            stack = []
+            while frame is not None:
+                label = self._labels.get(frame.f_code)
+                if label is None:
+                    code = frame.f_code
+                    label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                stack.append(label)
+                frame = frame.f_back
+            # Thread pool workers are grouped under one root, their names only differ by index
+            thread_name = thread_names.get(thread_id, "thread").rsplit("_", 1)[0]
+            key = ";".join([thread_name] + stack[::-1])
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+
+def start(profile_path: str = None, script: str = None):
+    """
+    Profiles the rest of this process and writes the profile when the process exits.
+
+    Args:
+        profile_path (str, optional): Path prefix of the profile files (<prefix>.pstats and <prefix>.folded), or an
+            existing folder to write <script>_<timestamp>.* into. Defaults to the FABRICOPS_PROFILE environment
+            variable; nothing is profiled if neither is set.
+        script (str, optional): Name of the script. Defaults to the name of the running script.
+    """
+    global _profiler, _sampler, _profile_path, _script
+    profile_path = profile_path or os.environ.get("FABRICOPS_PROFILE")
+    if not profile_path or _profiler:
+        return
+
+    _profile_path = profile_path
+    _script = script or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    _sampler = StackSampler()
+    _sampler.start()
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+    atexit.register(finish)
+
+
+def get_profile_prefix() -> str:
+    if os.path.isdir(_profile_path):
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        return os.path.join(_profile_path, f"{_script}_{timestamp}")
+    return os.path.splitext(_profile_path)[0] if _profile_path.endswith((".pstats", ".folded")) else _profile_path
+
+
+def remove_sampler(stats: pstats.Stats):
+    """
+    Removes the calls of the stack sampler from cProfile statistics. Functions only called by the sampler are
+    dropped, functions also called by the script lose the sampler's share.
+    """
+    sampler = {key for key in stats.stats if key[0] == __file__ and key[2] in ("sample", "sample_thread")}
+    changed = True
+    while changed:
+        changed = False
+        for key in list(stats.stats):
+            if key in sampler:
+                continue
+            calls, primitive_calls, own_time, cumulative_time, callers = stats.stats[key]
+            sampler_callers = [caller for caller in callers if caller in sampler]
+            if not sampler_callers:
+                continue
+            callers = dict(callers)
+            for caller in sampler_callers:
+                caller_calls, caller_primitive_calls, caller_own_time, caller_cumulative_time = callers.pop(caller)
+                calls -= caller_calls
+                primitive_calls -= caller_primitive_calls
+                own_time -= caller_own_time
+                cumulative_time -= caller_cumulative_time
+            stats.stats[key] = (calls, primitive_calls, max(own_time, 0), max(cumulative_time, 0), callers)
+            if not callers:
+                sampler.add(key)
+            changed = True
+    for key in sampler:
+        stats.stats.pop(key, None)
+
+
+def finish():
+    """Stops profiling, writes the .pstats and .folded files and prints the functions with the most own time."""
+    global _profiler
+    if not _profiler:
+        return
+    _profiler.disable()
+    _sampler.stop()
+    import modules.misc_functions as misc
+
+    prefix = get_profile_prefix()
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    with open(f"{prefix}.folded", "w", encoding="utf-8") as f:
+        for stack, count in sorted(_sampler.stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+    stats = pstats.Stats(_profiler)
+    remove_sampler(stats)
+    stats.dump_stats(f"{prefix}.pstats")
+
+    rows = []
+    for (file_name, line, function), (_, calls, own_time, cumulative_time, _) in sorted(stats.stats.items(), key=lambda entry: entry[1][2], reverse=True)[:TOP_FUNCTIONS]:
+        location = f"{os.path.basename(file_name)}:{line}" if line else file_name
+        rows.append((f"{function} ({location})", calls, f"{own_time:.3f}s", f"{cumulative_time:.3f}s"))
+
+    print("")
+    misc.print_info(f"Top {len(rows)} functions by own time:", bold=True)
+    misc.print_table(["Function", "Calls", "Own time", "Cumulative"], rows)
+    print(f"Profile written to {prefix}.pstats and {prefix}.folded ({_sampler.samples} samples of all threads)")
+    _profiler = None
@@ -0,0 +1,196 @@
+import os, json, math, atexit
+from datetime import datetime, timezone
+import modules.trace_functions as tracing
+
+REPORT_VERSION = 1
+
+_report_path = None
+_context = {}
+
+
+def start(report_path: str = None, **context):
+    """
+    Collects spans for this process and writes a performance report to report_path when the process exits.
+
+    Args:
+        report_path (str, optional): Report file, or an existing folder to write <script>_<timestamp>.json into.
+            Defaults to the FABRICOPS_REPORT environment variable; no report is written if neither is set.
+        **context: Values stored with the report, e.g. the environment.
+    """
+    global _report_path, _context
+    report_path = report_path or os.environ.get("FABRICOPS_REPORT")
+    if not report_path or _report_path:
+        return
+
+    _report_path = report_path
+    _context = {key: value for key, value in context.items() if value is not None}
+    tracing.start(collect=True)
+    atexit.register(write_report)
+
+
+def percentile(values: list, percent: float) -> float:
+    """Returns the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def get_call_type(span: dict):
+    """Returns the call type a span is reported under, or None for spans that are not calls."""
+    attributes = span.get("attributes")
+    if span.get("name").startswith("fab "):
+        if attributes.get("command.verb") == "api":
+            audience = "" if attributes.get("audience") == "fabric" else f"{attributes.get('audience')} "
+            return f"fab api {audience}{attributes.get('http.method')} {attributes.get('endpoint')}"
+        return span.get("name")
+    if span.get("name").startswith("http "):
+        return f"http {attributes.get('http.method')} {attributes.get('http.host')}{attributes.get('endpoint')}"
+    return None
+
+
+def _summarize(durations: list) -> dict:
+    return {
+        "count": len(durations),
+        "total": round(sum(durations), 3),
+        "p50": round(percentile(durations, 50), 3),
+        "p95": round(percentile(durations, 95), 3),
+        "max": round(max(durations), 3),
+    }
+
+
+def build_report(spans: list, context: dict = None, throttle_metrics: dict = None) -> dict:
+    """
+    Aggregates the spans of a run into a performance report.
+
+    Returns:
+        dict: Wall time, startup time (interpreter start, imports and argument parsing before tracing started, and
+            Fabric CLI configuration and login), wall time per phase, call counts by CLI verb and endpoint, latency percentiles per call type,
+            long running operation durations, sleep time and retry/throttle counts.
+    """
+    spans_by_id = {span.get("span_id"): span for span in spans}
+    root = next((span for span in spans if not span.get("parent_id")), None)
+
+    phases = []
+    for span in sorted(spans, key=lambda span: span.get("start")):
+        if span.get("attributes").get("phase"):
+            parent = spans_by_id.get(span.get("parent_id")) or {}
+            name = f"{parent.get('name')} / {span.get('name')}" if (parent.get("attributes") or {}).get("phase") else span.get("name")
+            phases.append({"name": name, "seconds": round(span.get("duration"), 3)})
+
+    by_verb, by_endpoint, latencies, lro, sleeps = {}, {}, {}, {}, {}
+    retries = 0
+    startup = {"process_seconds": None, "cli_setup_seconds": 0.0, "cli_setup_calls": 0}
+    for span in spans:
+        attributes = span.get("attributes")
+        call_type = get_call_type(span)
+        if span.get("name") == "startup" and span.get("parent_id") == (root or {}).get("span_id"):
+            startup["process_seconds"] = round(span.get("duration"), 3)
+        elif attributes.get("command.verb") in ("config", "auth"):
+            startup["cli_setup_seconds"] += span.get("duration")
+            startup["cli_setup_calls"] += 1
+        if call_type:
+            latencies.setdefault(call_type, []).append(span.get("duration"))
+            retries += attributes.get("retry_count", 0)
+            if span.get("name").startswith("fab "):
+                by_verb[attributes.get("command.verb")] = by_verb.get(attributes.get("command.verb"), 0) + 1
+            if attributes.get("endpoint"):
+                by_endpoint[call_type] = by_endpoint.get(call_type, 0) + 1
+        elif span.get("name").startswith("lro"):
+            lro.setdefault(span.get("name"), []).append(span.get("duration"))
+        elif span.get("name") == "sleep":
+            reason = attributes.get("reason") or "other"
+            sleeps[reason] = sleeps.get(reason, 0) + span.get("duration")
+
+    return {
+        "version": REPORT_VERSION,
+        "script": (root or {}).get("name"),
+        "started": datetime.fromtimestamp((root or {}).get("start", 0), timezone.utc).isoformat(timespec="seconds"),
+        "context": context or {},
+        "wall_seconds": round((root or {}).get("duration", 0), 3),
+        "startup": {**startup, "cli_setup_seconds": round(startup["cli_setup_seconds"], 3)},
+        "phases": phases,
+        "calls": {
+            "total": sum(len(durations) for durations in latencies.values()),
+            "by_verb": dict(sorted(by_verb.items())),
+            "by_endpoint": dict(sorted(by_endpoint.items())),
+        },
+        "latency": {call_type: _summarize(durations) for call_type, durations in sorted(latencies.items())},
+        "lro": {name: _summarize(durations) for name, durations in sorted(lro.items())},
+        "sleep": {"total_seconds": round(sum(sleeps.values()), 3), "by_reason": {reason: round(seconds, 3) for reason, seconds in sorted(sleeps.items())}},
+        "retries": retries,
+        "throttled": {family: metrics.get("throttled") for family, metrics in (throttle_metrics or {}).items() if metrics.get("throttled")},
+    }
+
+
+def write_report(report_path: str = None):
+    """Builds the report of this run and writes it as JSON."""
+    import modules.fabric_cli_functions as fabcli
+
+    report_path = report_path or _report_path
+    tracing.finish()
+    report = build_report(tracing.get_spans(), _context, fabcli.THROTTLE.get_metrics())
+
+    if os.path.isdir(report_path):
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        report_path = os.path.join(report_path, f"{os.path.splitext(report.get('script') or 'run')[0]}_{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Performance report written to {report_path}")
+
+
+def _get_metrics(report: dict) -> dict:
+    """Flattens the comparable values of a report into {metric: (value, unit)}."""
+    metrics = {"wall time": (report.get("wall_seconds", 0), "s")}
+    startup = report.get("startup") or {}
+    if startup.get("process_seconds") is not None:
+        metrics["startup process"] = (startup.get("process_seconds"), "s")
+    if "cli_setup_seconds" in startup:
+        metrics["startup CLI setup"] = (startup.get("cli_setup_seconds"), "s")
+    for phase in report.get("phases", []):
+        metrics[f"phase {phase.get('name')}"] = (phase.get("seconds"), "s")
+    metrics["calls total"] = (report.get("calls", {}).get("total", 0), "calls")
+    for verb, count in report.get("calls", {}).get("by_verb", {}).items():
+        metrics[f"calls fab {verb}"] = (count, "calls")
+    for endpoint, count in report.get("calls", {}).get("by_endpoint", {}).items():
+        metrics[f"calls {endpoint}"] = (count, "calls")
+    for call_type, latency in report.get("latency", {}).items():
+        metrics[f"p95 {call_type}"] = (latency.get("p95"), "s")
+    metrics["sleep total"] = (report.get("sleep", {}).get("total_seconds", 0), "s")
+    metrics["retries"] = (report.get("retries", 0), "calls")
+    return metrics
+
+
+def compare_reports(baseline: dict, current: dict, threshold_percent: float = 20, min_seconds: float = 1.0) -> list:
+    """
+    Compares two performance reports.
+
+    A metric regresses if it grew by more than threshold_percent. Time metrics must also have grown by at least
+    min_seconds, so noise on very short phases or calls is not reported. Calls to endpoints not called in the baseline
+    count as regression.
+
+    Returns:
+        list[dict]: One entry per metric with 'metric', 'baseline', 'current', 'change' (percent or None) and 'regression'.
+    """
+    baseline_metrics = _get_metrics(baseline)
+    current_metrics = _get_metrics(current)
+    results = []
+
+    for metric in list(baseline_metrics) + [metric for metric in current_metrics if metric not in baseline_metrics]:
+        baseline_value, unit = baseline_metrics.get(metric, (None, None))
+        current_value, current_unit = current_metrics.get(metric, (None, unit))
+        unit = unit or current_unit
+        change = None
+        regression = False
+
+        if baseline_value is None:
+            regression = unit == "calls" and bool(current_value)
+        elif current_value is not None:
+            change = round((current_value - baseline_value) / baseline_value * 100, 1) if baseline_value else None
+            grew = current_value > baseline_value * (1 + threshold_percent / 100)
+            significant = current_value - baseline_value >= (min_seconds if unit == "s" else 1)
+            regression = grew and significant
+
+        results.append({"metric": metric, "unit": unit, "baseline": baseline_value, "current": current_value, "change": change, "regression": regression})
+    return results
@@ -0,0 +1,186 @@
+import base64, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import modules.fabric_cli_functions as fabcli
+import modules.trace_functions as tracing
+
+# Items are created tier by tier, so items referenced by other items exist (and have their new IDs) first.
+# Item types not listed are created in the last tier.
+ITEM_TYPE_TIERS = [
+    ["Lakehouse", "Warehouse", "SQLDatabase", "Eventhouse", "Environment", "VariableLibrary"],
+    ["KQLDatabase", "Notebook", "SparkJobDefinition", "SemanticModel", "MirroredDatabase"],
+    ["Report", "DataPipeline", "KQLQueryset", "KQLDashboard", "Eventstream"],
+]
+
+# Item types created automatically by Fabric together with their parent item
+SKIPPED_ITEM_TYPES = {"SQLEndpoint", "Dashboard"}
+
+# Item types that are empty shells without their definition, so seeding fails if it cannot be fetched
+DEFINITION_REQUIRED_ITEM_TYPES = {"Notebook", "SparkJobDefinition", "SemanticModel", "Report", "DataPipeline"}
+
+
+def get_item_tier(item_type: str) -> int:
+    for tier, item_types in enumerate(ITEM_TYPE_TIERS):
+        if item_type in item_types:
+            return tier
+    return len(ITEM_TYPE_TIERS)
+
+
+def wait_for_operation(response: dict, poll_interval: int = 2, timeout_seconds: int = 600):
+    """
+    Resolves an API response that may be a long running operation.
+
+    Returns:
+        dict | None: The response body (or the operation result) on success, otherwise None.
+    """
+    status_code = response.get("status_code")
+    if status_code in (200, 201):
+        return response.get("text") or {}
+    if status_code != 202:
+        return None
+
+    headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+    operation_id = headers.get("x-ms-operation-id")
+    deadline = time.time() + timeout_seconds
+    with tracing.span("lro wait", operation_id=operation_id) as span:
+        while operation_id and time.time() < deadline:
+            status = (fabcli.get_operation_state(operation_id) or {}).get("status")
+            span.set_attribute("status", status)
+            if status == "Succeeded":
+                return fabcli.get_operation_result(operation_id) or {}
+            if status not in ("NotStarted", "Running"):
+                return None
+            tracing.sleep(poll_interval, "poll")
+    return None
+
+
+def rewrite_definition(definition: dict, id_mapping: dict) -> dict:
+    """
+    Replaces all source IDs (workspace and item IDs) in the base64 encoded definition parts with their target IDs.
+    """
+    parts = []
+    for part in definition.get("parts", []):
+        part = dict(part)
+        if part.get("payloadType", "InlineBase64") == "InlineBase64" and id_mapping:
+            try:
+                payload = base64.b64decode(part.get("payload", "")).decode("utf-8")
+            except (ValueError, UnicodeDecodeError):
+                parts.append(part)  # Binary payload, nothing to rewrite
+                continue
+            for source_id, target_id in id_mapping.items():
+                payload = payload.replace(source_id, target_id)
+            part["payload"] = base64.b64encode(payload.encode("utf-8")).decode("ascii")
+        parts.append(part)
+    return {**definition, "parts": parts}
+
+
+def find_source_ids(definition: dict, source_ids) -> set:
+    """Returns the source IDs that appear in the base64 encoded definition parts."""
+    found = set()
+    for part in (definition or {}).get("parts", []):
+        if part.get("payloadType", "InlineBase64") != "InlineBase64":
+            continue
+        try:
+            payload = base64.b64decode(part.get("payload", "")).decode("utf-8")
+        except (ValueError, UnicodeDecodeError):
+            continue
+        found |= {source_id for source_id in source_ids if source_id in payload}
+    return found
+
+
+def seed_workspace(source_workspace_id: str, target_workspace_id: str, max_workers: int = 8, log=None) -> bool:
+    """
+    Seeds a workspace with copies of all items of a source workspace, as a fast alternative to a full update from git.
+
+    Item definitions are fetched concurrently with getDefinition, then items are created with their definitions in
+    parallel, tier by tier (see ITEM_TYPE_TIERS) so dependencies exist before the items referencing them. References
+    to the source workspace and source items are rewritten to the target workspace and the newly created items.
+    Items referencing items of their own or a later tier (e.g. a notebook running a notebook) are created with the
+    source IDs and get their definition updated once all items exist.
+
+    Args:
+        source_workspace_id (str): ID of the workspace to copy items from (e.g. the dev workspace of the layer).
+        target_workspace_id (str): ID of the (empty) workspace to seed.
+        max_workers (int): Maximum number of concurrent getDefinition and create calls.
+        log (callable, optional): Called with a message for every item that could not be seeded.
+
+    Returns:
+        bool: True if all items were seeded, False if any item failed.
+    """
+    log = log or (lambda message: None)
+    items = [item for item in fabcli.list_all_workspace_items(source_workspace_id) if item.get("type") not in SKIPPED_ITEM_TYPES]
+    existing = fabcli.get_workspace_item_ids(target_workspace_id)
+
+    def fetch_definition(item):
+        return (wait_for_operation(fabcli.get_item_definition(source_workspace_id, item.get("id"))) or {}).get("definition")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(fetch_definition, item): item for item in items}
+        definitions = {}
+        for future in as_completed(futures):
+            try:
+                definitions[futures[future].get("id")] = future.result()
+            except Exception:
+                definitions[futures[future].get("id")] = None
+
+        id_mapping = {source_workspace_id: target_workspace_id}
+        succeeded = True
+
+        def create_item(item, id_mapping):
+            target_item_id = existing.get((item.get("displayName"), item.get("type")))
+            if target_item_id:
+                return target_item_id
+            definition = definitions.get(item.get("id"))
+            if not definition and item.get("type") in DEFINITION_REQUIRED_ITEM_TYPES:
+                raise RuntimeError("definition could not be fetched from the source workspace")
+            response = fabcli.create_item_with_definition(
+                target_workspace_id,
+                item.get("displayName"),
+                item.get("type"),
+                rewrite_definition(definition, id_mapping) if definition else None,
+                item.get("description"),
+            )
+            created = wait_for_operation(response)
+            if created is None:
+                raise RuntimeError(f"create returned status code {response.get('status_code')}: {response.get('text')}")
+            return created.get("id") or fabcli.get_workspace_item_ids(target_workspace_id).get((item.get("displayName"), item.get("type")))
+
+        # Created items with the source item IDs their definition still references
+        pending_references = {}
+        source_item_ids = {item.get("id") for item in items}
+
+        for tier in range(len(ITEM_TYPE_TIERS) + 1):
+            tier_items = [item for item in items if get_item_tier(item.get("type")) == tier]
+            tier_id_mapping = dict(id_mapping)
+            futures = {executor.submit(create_item, item, tier_id_mapping): item for item in tier_items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    target_item_id = future.result()
+                    if target_item_id:
+                        id_mapping[item.get("id")] = target_item_id
+                        unresolved = find_source_ids(definitions.get(item.get("id")), source_item_ids - set(tier_id_mapping))
+                        if unresolved and (item.get("displayName"), item.get("type")) not in existing:
+                            pending_references[item.get("id")] = unresolved
+                except Exception as e:
+                    succeeded = False
+                    log(f"{item.get('displayName')}.{item.get('type')}: {e}")
+
+        def update_references(item):
+            missing = pending_references[item.get("id")] - set(id_mapping)
+            if missing:
+                raise RuntimeError(f"references items that were not seeded ({', '.join(sorted(missing))})")
+            definition = rewrite_definition(definitions.get(item.get("id")), id_mapping)
+            response = fabcli.update_item_definition(target_workspace_id, id_mapping[item.get("id")], definition)
+            if wait_for_operation(response) is None:
+                raise RuntimeError(f"updating references returned status code {response.get('status_code')}: {response.get('text')}")
+
+        futures = {executor.submit(update_references, item): item for item in items if item.get("id") in pending_references}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                succeeded = False
+                log(f"{item.get('displayName')}.{item.get('type')}: {e}")
+
+    return succeeded
@@ -0,0 +1,308 @@
+import os, subprocess, time, json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+
+
+def resolve_lakehouse_connection(env_definition: dict, environment: str, lakehouse_ws_layer: str, lakehouse_name: str) -> dict:
+    """
+    Resolves connection ID, SQL endpoint and database name of a lakehouse connection, using the per-run connection cache.
+
+    Returns:
+        dict: Parsed connection details (see misc.parse_fabric_connection), or an empty dict if unresolved.
+    """
+    connection_name_template = misc.get_lakehouse_connection_template(env_definition, lakehouse_ws_layer, lakehouse_name)
+    if not connection_name_template:
+        return {}
+
+    try:
+        connection = fabcli.get_connection_cached(connection_name_template.format(environment=environment))
+    except Exception:
+        return {}
+
+    return misc.parse_fabric_connection(connection)
+
+
+def bind_semantic_models(
+    workspace_id: str,
+    workspace_name: str,
+    bindings: list,
+    env_definition: dict,
+    environment: str,
+    owner_ids: set = None,
+    max_workers: int = 4
+) -> list:
+    """
+    Binds the semantic models of a workspace to their lakehouse SQL endpoints as one batch operation.
+
+    Semantic model IDs and current owners are resolved from one workspace listing each, connections come from the
+    per-run connection cache, and the takeover and bind calls are issued concurrently with a bounded pool.
+    Takeover is only performed for models not already owned by one of the given owner IDs.
+
+    Args:
+        workspace_id (str): ID of the workspace holding the semantic models.
+        workspace_name (str): Name of the workspace, used for messages.
+        bindings (list): Binding entries as returned by misc.get_semantic_model_bindings.
+        env_definition (dict): The merged environment definition.
+        environment (str): The environment name used to format connection names.
+        owner_ids (set, optional): Identities (e.g. the service principal client ID) that count as the current owner.
+        max_workers (int): Maximum number of concurrent bind requests.
+
+    Returns:
+        list[dict]: One result per semantic model with 'semantic_model', 'lakehouse', 'status' and 'message'.
+    """
+    results = []
+    semantic_model_ids = fabcli.get_workspace_item_ids(workspace_id, "SemanticModel")
+
+    owner_ids = {owner.lower() for owner in (owner_ids or set()) if owner}
+    model_owners = {}
+    if owner_ids:
+        model_owners = {model.get("id"): (model.get("configuredBy") or "").lower() for model in fabcli.list_semantic_models_powerbi(workspace_id)}
+
+    tasks = []
+    for binding in bindings:
+        lakehouse_name = binding.get("lakehouse_name")
+        conn_details = resolve_lakehouse_connection(env_definition, environment, binding.get("lakehouse_ws_layer"), lakehouse_name)
+
+        if not (conn_details.get("connection_id") and conn_details.get("sqlendpoint") and conn_details.get("database_name")):
+            results.append({"semantic_model": None, "lakehouse": lakehouse_name, "status": "skipped",
+                            "message": f"Connection information for {lakehouse_name} is incomplete. Skipping all models for this lakehouse."})
+            continue
+
+        for semantic_model_name in binding.get("semantic_models", []):
+            semantic_model_id = semantic_model_ids.get(semantic_model_name)
+            if not semantic_model_id:
+                results.append({"semantic_model": semantic_model_name, "lakehouse": lakehouse_name, "status": "skipped",
+                                "message": f"Semantic model '{semantic_model_name}' not found in workspace {workspace_name}. Skip binding."})
+                continue
+            tasks.append((semantic_model_name, semantic_model_id, lakehouse_name, conn_details))
+
+    def bind(semantic_model_name, semantic_model_id, lakehouse_name, conn_details):
+        owner = model_owners.get(semantic_model_id)
+        if owner_ids and owner is not None and owner not in owner_ids:
+            fabcli.takeover_semantic_model(workspace_id, semantic_model_id)
+
+        resp = fabcli.bind_semanticmodel_sqlendpoint(
+            workspace_id=workspace_id,
+            item_id=semantic_model_id,
+            connection_id=conn_details.get("connection_id"),
+            sqlendpoint=conn_details.get("sqlendpoint"),
+            database_name=conn_details.get("database_name"),
+        )
+        status = (resp or {}).get("status_code")
+        if status == 200:
+            return {"semantic_model": semantic_model_name, "lakehouse": lakehouse_name, "status": "succeeded",
+                    "message": f"Binding '{semantic_model_name}' to SQL endpoint for lakehouse '{lakehouse_name}' successfully done."}
+        return {"semantic_model": semantic_model_name, "lakehouse": lakehouse_name, "status": "failed",
+                "message": f"Binding call returned non-success (status code {status}) for '{semantic_model_name}': {resp}"}
+
+    if tasks:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(bind, *task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    semantic_model_name, _, lakehouse_name, _ = futures[future]
+                    results.append({"semantic_model": semantic_model_name, "lakehouse": lakehouse_name, "status": "failed",
+                                    "message": f"Binding '{semantic_model_name}' failed: {e}"})
+
+    return results
+
+
+REFRESH_TERMINAL_STATES = {"Completed", "Failed", "Cancelled", "Disabled", "TimedOut"}
+
+
+def get_repository_semantic_models(layer_path: str) -> list:
+    """
+    Returns the names of all semantic models (*.SemanticModel folders) stored in a layer folder of the solution repository.
+    """
+    semantic_models = []
+    for root, dirs, _ in os.walk(layer_path):
+        for folder in dirs:
+            if folder.endswith(".SemanticModel"):
+                semantic_models.append(folder.removesuffix(".SemanticModel"))
+    return sorted(semantic_models)
+
+
+def get_changed_semantic_models(layer_path: str, since_ref: str):
+    """
+    Returns the names of the semantic models in a layer folder whose definition changed since the given git reference.
+
+    Returns:
+        set | None: The changed semantic model names, or None if the changes could not be determined with git.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", layer_path, "diff", "--name-only", "--relative", since_ref, "--", "."],
+            capture_output=True,
+            text=True
+        )
+    except OSError:
+        return None
+
+    if result.returncode != 0:
+        return None
+
+    changed = set()
+    for path in result.stdout.splitlines():
+        for part in path.replace("\\", "/").split("/"):
+            if part.endswith(".SemanticModel"):
+                changed.add(part.removesuffix(".SemanticModel"))
+    return changed
+
+
+def save_changed_semantic_models(file_path: str, solution_path: str, layers: list, since_ref: str):
+    """
+    Writes the semantic models changed since a git reference per layer folder to a file. Built where the repository
+    is checked out, so release stages without a git checkout can refresh only the changed models.
+    Layers whose changes cannot be determined with git are written as null.
+    """
+    changed = {}
+    for layer in layers:
+        semantic_models = get_changed_semantic_models(os.path.join(solution_path, layer.lower()), since_ref)
+        changed[layer.lower()] = sorted(semantic_models) if semantic_models is not None else None
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({"since": since_ref, "layers": changed}, f, indent=2)
+    misc.print_info(f"Changed semantic models of {len(changed)} layer(s) written to {file_path}")
+
+
+def load_changed_semantic_models(file_path: str, layer: str):
+    """
+    Returns the changed semantic models of a layer from a file written by save_changed_semantic_models.
+
+    Returns:
+        set | None: The changed semantic model names, or None if the file has no list for the layer.
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            semantic_models = (json.load(f).get("layers") or {}).get(layer.lower())
+    except (OSError, ValueError, AttributeError):
+        return None
+    return set(semantic_models) if isinstance(semantic_models, list) else None
+
+
+def build_refresh_body(settings: dict = None) -> dict:
+    """
+    Builds the enhanced refresh request body from the settings of semantic_model_refresh.yml.
+    Table and partition targets are only included when objects are configured.
+    """
+    settings = settings or {}
+    body = {
+        "type": settings.get("type") or "Full",
+        "commitMode": settings.get("commit_mode") or "transactional",
+        "retryCount": 1
+    }
+    if settings.get("max_parallelism"):
+        body["maxParallelism"] = int(settings.get("max_parallelism"))
+    if settings.get("objects"):
+        body["objects"] = settings.get("objects")
+    return body
+
+
+def get_refresh_request_id(response: dict):
+    """
+    Extracts the refresh request ID from the response headers of an enhanced refresh request.
+    """
+    headers = {key.lower(): value for key, value in ((response or {}).get("headers") or {}).items()}
+    location = headers.get("location")
+    if location:
+        return location.rstrip("/").split("/")[-1]
+    return headers.get("x-ms-request-id") or headers.get("requestid")
+
+
+def refresh_semantic_models(refresh_targets: list, max_per_capacity: int = 2, poll_interval: int = 15, timeout_minutes: int = 120) -> list:
+    """
+    Runs enhanced refreshes for a set of semantic models in parallel and tracks all of them from a single poller.
+
+    Refreshes are started as soon as their capacity has a free slot, so no more than max_per_capacity refreshes
+    run at the same time on one capacity. Starting refreshes is done concurrently, polling is done by one loop
+    for all refreshes in flight.
+
+    Args:
+        refresh_targets (list[dict]): Refreshes to run, each with 'workspace_id', 'workspace_name', 'capacity_id',
+            'semantic_model', 'semantic_model_id' and 'body' (see build_refresh_body).
+        max_per_capacity (int): Maximum number of concurrent refreshes per capacity.
+        poll_interval (int): Seconds between two polling rounds.
+        timeout_minutes (int): Time after which refreshes still running are reported as failed.
+
+    Returns:
+        list[dict]: One result per semantic model with 'semantic_model', 'workspace', 'status' and 'message'.
+            Status is 'Completed' for successful refreshes.
+    """
+    results = []
+    pending = deque(refresh_targets)
+    in_flight = {}
+    running_per_capacity = {}
+    deadline = time.time() + timeout_minutes * 60
+
+    def result(target, status, message):
+        return {"semantic_model": target.get("semantic_model"), "workspace": target.get("workspace_name"), "status": status, "message": message}
+
+    def start(target):
+        response = fabcli.trigger_semantic_model_refresh(target.get("workspace_id"), target.get("semantic_model_id"), target.get("body"))
+        if response.get("status_code") == 202:
+            return get_refresh_request_id(response), None
+        return None, f"Refresh request returned non-success (status code {response.get('status_code')}): {response.get('text')}"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        while pending or in_flight:
+            # Start refreshes for all capacities with free slots
+            startable = []
+            for target in list(pending):
+                capacity_id = target.get("capacity_id")
+                if running_per_capacity.get(capacity_id, 0) < max(1, max_per_capacity):
+                    running_per_capacity[capacity_id] = running_per_capacity.get(capacity_id, 0) + 1
+                    pending.remove(target)
+                    startable.append(target)
+
+            futures = {executor.submit(start, target): target for target in startable}
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    request_id, error = future.result()
+                except Exception as e:
+                    request_id, error = None, str(e)
+
+                if request_id:
+                    misc.print_info(f"Refresh of '{target.get('semantic_model')}' in workspace {target.get('workspace_name')} started.")
+                    in_flight[request_id] = {"target": target, "start_time": time.time()}
+                else:
+                    running_per_capacity[target.get("capacity_id")] -= 1
+                    results.append(result(target, "Failed", error or "Refresh request ID could not be determined."))
+
+            if not in_flight:
+                continue
+
+            tracing.sleep(poll_interval, "poll")
+
+            # Single polling round for all refreshes in flight
+            for request_id, refresh in list(in_flight.items()):
+                target = refresh.get("target")
+                details = fabcli.get_semantic_model_refresh_status(target.get("workspace_id"), target.get("semantic_model_id"), request_id) or {}
+                status = details.get("extendedStatus") or details.get("status")
+
+                if status in REFRESH_TERMINAL_STATES:
+                    duration = int(time.time() - refresh.get("start_time"))
+                    if status == "Completed":
+                        message = f"Refresh of '{target.get('semantic_model')}' completed in {duration}s."
+                    else:
+                        errors = [m.get("message") for m in details.get("messages", []) if m.get("message")]
+                        message = f"Refresh of '{target.get('semantic_model')}' ended with status {status} after {duration}s. {' '.join(errors)}".strip()
+                    results.append(result(target, status, message))
+                    tracing.record_span("lro semantic model refresh", refresh.get("start_time"), workspace=target.get("workspace_name"), semantic_model=target.get("semantic_model"), status=status)
+                    running_per_capacity[target.get("capacity_id")] -= 1
+                    del in_flight[request_id]
+
+            if time.time() > deadline:
+                for refresh in in_flight.values():
+                    results.append(result(refresh.get("target"), "Failed", f"Refresh of '{refresh.get('target').get('semantic_model')}' did not finish within {timeout_minutes} minutes."))
+                for target in pending:
+                    results.append(result(target, "Failed", f"Refresh of '{target.get('semantic_model')}' was not started within {timeout_minutes} minutes."))
+                break
+
+    return results
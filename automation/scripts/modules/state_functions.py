@@ -0,0 +1,190 @@
+import os, sys, json, time
+from datetime import datetime, timezone
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.plan_functions as planfunc
+
+# Snapshot of the resolved Fabric state of environments (fabric_state.json): workspaces, items with their SQL endpoint
+# and database properties, and connections. Written by the parameter file scanners (--state), read by later steps of
+# a pipeline (--state) instead of discovering the same IDs again. A snapshot is only used if it has the current
+# version, is younger than FABRICOPS_STATE_MAX_AGE_HOURS (default 24), was scanned from the current environment
+# definition and its workspace IDs match a single listing of the current workspaces. Otherwise the scripts fall back
+# to discovery. Connections whose ID no longer matches a single listing of the current connections are dropped from
+# the snapshot and resolved again.
+
+STATE_VERSION = 1
+DEFAULT_MAX_AGE_HOURS = 24
+
+# Item types whose SQL endpoint and database properties are resolved
+SCANNED_ITEM_TYPES = {"Lakehouse", "SQLDatabase", "Warehouse"}
+
+
+def scan_environment(environment: str, env_definition: dict) -> tuple:
+    """
+    Resolves the workspaces of an environment with their items, the SQL endpoint and database properties of
+    lakehouses, SQL databases and warehouses, and the connections of these items.
+
+    Returns:
+        tuple: (layers, connections) as stored by build_environment_state. Layers without a workspace are left out.
+    """
+    solution_name = env_definition.get("name")
+    layers, connections = [], {}
+
+    for layer_name, layer_definition in env_definition.get("layers").items():
+        workspace_name = solution_name.format(layer=layer_name, environment=environment)
+        workspace_name_escaped = workspace_name.replace("/", "\\/")
+        workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+        print(f"Getting data for {workspace_id}, {workspace_name}")
+        if not misc.is_guid(workspace_id):
+            continue
+
+        layer = {"name": layer_name, "workspace_name": workspace_name, "workspace_id": workspace_id, "items": []}
+        for item in fabcli.list_all_workspace_items(workspace_id):
+            item_type = item.get("type")
+            fabric_item = {"unique_name": f"{item.get('displayName')}.{item_type}", "name": item.get("displayName"), "id": item.get("id"), "type": item_type}
+
+            if item_type in SCANNED_ITEM_TYPES:
+                item_details = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item.get('displayName')}.{item_type}", retry_count=2) or {}
+                properties = item_details.get("properties") or {}
+                sqlendpoint_properties = properties.get("sqlEndpointProperties") or {}
+                fabric_item.update({
+                    "connectionString": sqlendpoint_properties.get("connectionString") if item_type == "Lakehouse" else properties.get("connectionString"),
+                    "databaseName": properties.get("databaseName") if item_type == "SQLDatabase" else item_details.get("displayName") if item_type == "Warehouse" else None,
+                    "serverFqdn": properties.get("serverFqdn") if item_type == "SQLDatabase" else None,
+                    "sqlEndpointId": sqlendpoint_properties.get("id") if item_type == "Lakehouse" else None,
+                })
+
+            layer["items"].append(fabric_item)
+
+        # Connections of the items defined in the layer
+        for item_type, items in (layer_definition.get("items") or {}).items():
+            for item in items:
+                if item.get("connection_name") and item_type in SCANNED_ITEM_TYPES:
+                    connection_name = item.get("connection_name").format(layer=layer_name, environment=environment)
+                    if fabcli.connection_exists(connection_name):
+                        connection = fabcli.get_item(f".connections/{connection_name}.Connection")
+                        connections[connection_name] = connection
+                        scanned_item = next((i for i in layer["items"] if i.get("unique_name") == f"{item.get('item_name')}.{item_type}"), None)
+                        if scanned_item and connection:
+                            scanned_item["connectionId"] = connection.get("id")
+
+        layers.append(layer)
+
+    return layers, connections
+
+
+def build_environment_state(env_definition: dict, layers: list, connections: dict) -> dict:
+    """
+    Returns the snapshot of one environment.
+
+    Args:
+        env_definition (dict): The merged environment definition the environment was scanned with.
+        layers (list): Scanned layers as built by the parameter file scanners ('name', 'workspace_name',
+            'workspace_id' and 'items' with 'unique_name', 'id', 'type', 'sqlEndpointId', 'connectionString', ...).
+        connections (dict): Resolved connections by name, as returned by fabcli.get_connection.
+    """
+    return {
+        "scanned": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "definition_hash": planfunc.get_definition_hash(env_definition),
+        "layers": layers,
+        "connections": connections,
+    }
+
+
+def save_state(file_path: str, environments: dict):
+    """
+    Writes scanned environments ({name: build_environment_state(...)}) to a state file. Environments already in the
+    file that were not scanned again are kept, so steps scanning different environments can share one file.
+    """
+    state = read_state(file_path) or {}
+    if state.get("version") != STATE_VERSION:
+        state = {}
+
+    state = {
+        "version": STATE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "created_by": os.path.basename(sys.argv[0]),
+        "environments": {**state.get("environments", {}), **environments},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    misc.print_info(f"State of {len(environments)} environment(s) written to {file_path}")
+
+
+def read_state(file_path: str) -> dict:
+    """Returns the content of a state file, or None if it does not exist or is not valid JSON."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_state(file_path: str, environment: str, env_definition: dict) -> dict:
+    """
+    Returns the snapshot of an environment from a state file if it is still valid, and adds its connections to the
+    connection cache of fabric_cli_functions. Validation costs one workspace listing, and one connection listing if
+    the snapshot has connections. Connections deleted or recreated since the scan are left out of the snapshot.
+
+    Returns:
+        dict: The environment snapshot, or None (with a warning) if the state file cannot be used.
+    """
+    state = read_state(file_path)
+    if state is None:
+        misc.print_warning(f"State file {file_path} not found or unreadable. Resolving the environment from Fabric.")
+        return None
+    if state.get("version") != STATE_VERSION:
+        misc.print_warning(f"State file {file_path} has version {state.get('version')}, expected {STATE_VERSION}. Resolving the environment from Fabric.")
+        return None
+
+    environment_state = state.get("environments", {}).get(environment)
+    if not environment_state:
+        misc.print_warning(f"State file {file_path} has no state of {environment}. Resolving the environment from Fabric.")
+        return None
+
+    max_age_hours = float(os.environ.get("FABRICOPS_STATE_MAX_AGE_HOURS") or DEFAULT_MAX_AGE_HOURS)
+    age_hours = (time.time() - datetime.fromisoformat(environment_state.get("scanned")).timestamp()) / 3600
+    if age_hours > max_age_hours:
+        misc.print_warning(f"State of {environment} in {file_path} is {age_hours:.1f} hours old (maximum {max_age_hours:g}). Resolving the environment from Fabric.")
+        return None
+    if environment_state.get("definition_hash") != planfunc.get_definition_hash(env_definition):
+        misc.print_warning(f"State of {environment} in {file_path} was scanned from a different environment definition. Resolving the environment from Fabric.")
+        return None
+
+    workspace_ids = fabcli.get_workspace_ids()
+    changed = [layer.get("workspace_name") for layer in environment_state.get("layers", []) if workspace_ids.get(layer.get("workspace_name")) != layer.get("workspace_id")]
+    if changed:
+        misc.print_warning(f"Workspace(s) {', '.join(changed)} changed since the state of {environment} was scanned. Resolving the environment from Fabric.")
+        return None
+
+    connections = environment_state.get("connections") or {}
+    if connections:
+        connection_ids = {connection.get("displayName"): connection.get("id") for connection in fabcli.list_paginated("connections")}
+        stale = [name for name, connection in connections.items() if not connection or connection_ids.get(name) != connection.get("id")]
+        if stale:
+            misc.print_warning(f"Connection(s) {', '.join(stale)} changed since the state of {environment} was scanned. Resolving them from Fabric.")
+            connections = {name: connection for name, connection in connections.items() if name not in stale}
+            valid_ids = {connection.get("id") for connection in connections.values()}
+            layers = [{**layer, "items": [{key: value for key, value in item.items() if key != "connectionId" or value in valid_ids} for item in layer.get("items", [])]} for layer in environment_state.get("layers", [])]
+            environment_state = {**environment_state, "layers": layers, "connections": connections}
+
+    fabcli.add_cached_connections(connections)
+    misc.print_info(f"Using state of {environment} from {file_path} (scanned {environment_state.get('scanned')}, {len(environment_state.get('layers', []))} workspace(s), {len(environment_state.get('connections') or {})} connection(s)).")
+    return environment_state
+
+
+def get_layer(environment_state: dict, layer_name: str) -> dict:
+    """Returns the snapshot of a layer (case-insensitive), or None if there is no state or the layer is not in it."""
+    return next((layer for layer in (environment_state or {}).get("layers", []) if layer.get("name", "").lower() == layer_name.lower()), None)
+
+
+def get_workspace_id(environment_state: dict, layer_name: str) -> str:
+    """Returns the workspace ID of a layer from the snapshot, or None."""
+    return (get_layer(environment_state, layer_name) or {}).get("workspace_id")
+
+
+def get_item(environment_state: dict, layer_name: str, item_name: str, item_type: str) -> dict:
+    """Returns an item of a layer from the snapshot, e.g. a lakehouse with its 'sqlEndpointId' and 'connectionString', or None."""
+    unique_name = f"{item_name}.{item_type}"
+    return next((item for item in (get_layer(environment_state, layer_name) or {}).get("items", []) if item.get("unique_name") == unique_name), None)
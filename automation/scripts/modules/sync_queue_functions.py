@@ -0,0 +1,105 @@
+import threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SyncQueue:
+    """
+    Work queue for workspace synchronizations with per-workspace coalescing and bounded concurrency.
+
+    A workspace is queued at most once. Requests for a workspace that is already queued are merged into the
+    queued entry, requests for a workspace that is currently synchronizing schedule exactly one follow-up run,
+    so changes pushed during a sync are never lost.
+    """
+
+    def __init__(self, sync_function, max_workers: int = 4, history_size: int = 100):
+        """
+        Args:
+            sync_function (callable): Called with a workspace name, returns a result dict (see gitsync.sync_workspaces).
+            max_workers (int): Maximum number of workspaces synchronized at the same time.
+            history_size (int): Number of completed results kept for the status endpoint.
+        """
+        self._sync_function = sync_function
+        self._max_workers = max(1, max_workers)
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()
+        self._running = set()
+        self._rerun = set()
+        self._history = deque(maxlen=history_size)
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="sync-dispatcher", daemon=True)
+
+    def start(self):
+        self._dispatcher.start()
+
+    def stop(self, wait: bool = True):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=wait)
+
+    def submit(self, workspace_name: str) -> str:
+        """
+        Requests a synchronization of a workspace.
+
+        Returns:
+            str: 'queued', 'coalesced' (already queued) or 'rerun' (follow-up run after the running sync).
+        """
+        with self._condition:
+            if workspace_name in self._pending:
+                self._pending[workspace_name] += 1
+                return "coalesced"
+            if workspace_name in self._running:
+                self._rerun.add(workspace_name)
+                return "rerun"
+            self._pending[workspace_name] = 1
+            self._condition.notify_all()
+            return "queued"
+
+    def status(self) -> dict:
+        with self._condition:
+            return {
+                "pending": list(self._pending.keys()),
+                "running": sorted(self._running),
+                "rerun": sorted(self._rerun),
+                "history": list(self._history),
+            }
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Blocks until no synchronizations are queued or running. Returns False on timeout.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while self._pending or self._running or self._rerun:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._pending or len(self._running) >= self._max_workers):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                workspace_name, requests = self._pending.popitem(last=False)
+                self._running.add(workspace_name)
+            self._executor.submit(self._run, workspace_name, requests)
+
+    def _run(self, workspace_name: str, requests: int):
+        try:
+            result = self._sync_function(workspace_name)
+        except Exception as e:
+            result = {"workspace": workspace_name, "status": "failed", "message": str(e)}
+
+        with self._condition:
+            self._history.append({**result, "requests": requests, "finished": time.strftime("%Y-%m-%dT%H:%M:%S")})
+            self._running.discard(workspace_name)
+            if workspace_name in self._rerun:
+                self._rerun.discard(workspace_name)
+                self._pending[workspace_name] = self._pending.get(workspace_name, 0) + 1
+            self._condition.notify_all()
@@ -0,0 +1,206 @@
+import re, json, time, random, threading
+import modules.trace_functions as tracing
+
+# Settings per endpoint family: token bucket refill rate (requests per second) and burst size, and the bounds of the
+# adaptive concurrency limit. Families are throttled independently, as Fabric and Power BI throttle independently.
+FAMILY_SETTINGS = {
+    "fabric": {"rate": 10.0, "burst": 20, "initial_limit": 8, "min_limit": 1, "max_limit": 32},
+    "operations": {"rate": 10.0, "burst": 20, "initial_limit": 16, "min_limit": 2, "max_limit": 32},
+    "powerbi": {"rate": 4.0, "burst": 8, "initial_limit": 4, "min_limit": 1, "max_limit": 16},
+    "cli": {"rate": 8.0, "burst": 16, "initial_limit": 8, "min_limit": 1, "max_limit": 32},
+}
+
+# Commands that only change local CLI state and are never throttled
+LOCAL_COMMANDS = {"config", "auth"}
+
+MAX_RETRIES = 5
+DEFAULT_RETRY_AFTER = 2  # Seconds, doubled per retry when the response carries no Retry-After
+MAX_RETRY_AFTER = 120
+
+THROTTLED_PATTERN = re.compile(r"TooManyRequests|Too Many Requests|RequestBlocked|status code:? ?429|\[429\]", re.IGNORECASE)
+RETRY_AFTER_PATTERN = re.compile(r"retry[- ]after\D{0,10}(\d+)|try again in (\d+) seconds?", re.IGNORECASE)
+
+
+def get_endpoint_family(command: str):
+    """
+    Returns the endpoint family a Fabric CLI command is throttled in, or None for local commands.
+    """
+    tokens = command.split()
+    if not tokens or tokens[0] in LOCAL_COMMANDS:
+        return None
+    if tokens[0] != "api":
+        return "cli"
+    if "powerbi" in tokens[1:4]:
+        return "powerbi"
+    path = next((token for token in tokens[1:] if not token.startswith("-") and token.lower() not in ("get", "post", "patch", "put", "delete")), "")
+    if path.strip("/").startswith("operations"):
+        return "operations"
+    return "fabric"
+
+
+def get_throttling(output: str):
+    """
+    Detects a throttled response in the output of a Fabric CLI command.
+
+    Returns:
+        tuple: (throttled, retry_after) where retry_after is the delay requested by the service in seconds, or None.
+    """
+    try:
+        response = json.loads(output)
+    except (ValueError, TypeError):
+        response = None
+
+    if isinstance(response, dict) and "status_code" in response:
+        if response.get("status_code") != 429:
+            return False, None
+        headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+        try:
+            return True, float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            text = response.get("text")
+            match = RETRY_AFTER_PATTERN.search(text if isinstance(text, str) else json.dumps(text or ""))
+            return True, float(next(group for group in match.groups() if group)) if match else None
+
+    if output and THROTTLED_PATTERN.search(output):
+        match = RETRY_AFTER_PATTERN.search(output)
+        return True, float(next(group for group in match.groups() if group)) if match else None
+    return False, None
+
+
+class EndpointFamily:
+    """
+    Token bucket and AIMD concurrency limit of one endpoint family.
+
+    The concurrency limit grows by one after a full window of successful calls (additive increase) and is halved when
+    the service throttles (multiplicative decrease), at most once per Retry-After window so a burst of throttled
+    responses to concurrent calls counts as one signal. While a Retry-After is pending, no call of the family starts.
+    """
+
+    def __init__(self, name, rate, burst, initial_limit, min_limit, max_limit):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = initial_limit
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.waited = 0.0
+        self.condition = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def acquire(self):
+        start_time = time.monotonic()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.in_flight >= self.limit:
+                    delay = None  # Woken up by release
+                elif self.tokens < 1:
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.calls += 1
+                    self.waited += now - start_time
+                    return
+                self.condition.wait(delay)
+
+    def release(self, throttled: bool = False, retry_after: float = None):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                self.successes = 0
+                delay = min(retry_after or DEFAULT_RETRY_AFTER, MAX_RETRY_AFTER)
+                self.blocked_until = max(self.blocked_until, now + delay)
+                if now - self.last_decrease >= delay:
+                    self.limit = max(self.min_limit, self.limit // 2)
+                    self.last_decrease = now
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+    def get_metrics(self) -> dict:
+        with self.condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rate": self.rate,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "wait_seconds": round(self.waited, 1),
+                "blocked_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+            }
+
+
+class ThrottleController:
+    """
+    Shared controller all Fabric CLI calls go through (see fabric_cli_functions.run_command).
+
+    Calls are admitted per endpoint family by a token bucket and an adaptive concurrency limit. Throttled calls (HTTP
+    429) are retried after the Retry-After requested by the service, up to MAX_RETRIES times.
+    """
+
+    def __init__(self, settings: dict = None):
+        self.families = {name: EndpointFamily(name, **family_settings) for name, family_settings in (settings or FAMILY_SETTINGS).items()}
+
+    def call(self, command: str, execute):
+        """
+        Executes a command through the controller.
+
+        Args:
+            command (str): The Fabric CLI command, used to determine the endpoint family.
+            execute (callable): Executes the command and returns its output and error output (stderr). Throttling is
+                detected in both, only the output is returned.
+
+        Returns:
+            str: The output of the last attempt.
+        """
+        family = self.families.get(get_endpoint_family(command))
+        if family is None:
+            return execute()[0]
+
+        for attempt in range(MAX_RETRIES + 1):
+            wait_start = time.time()
+            family.acquire()
+            if time.time() - wait_start > 0.01:
+                tracing.record_span("throttle wait", wait_start, family=family.name)
+            throttled, retry_after = False, None
+            try:
+                output, error_output = execute()
+                throttled, retry_after = get_throttling(output)
+                if not throttled and error_output:
+                    throttled, retry_after = get_throttling(error_output)
+            finally:
+                if throttled and retry_after is None:
+                    retry_after = DEFAULT_RETRY_AFTER * 2 ** attempt + random.uniform(0, 1)
+                family.release(throttled, retry_after)
+
+            if not throttled or attempt == MAX_RETRIES:
+                return output
+            with family.condition:
+                family.retries += 1
+            tracing.set_attribute("retry_count", attempt + 1)
+
+    def get_metrics(self) -> dict:
+        """Returns the current concurrency limit, throttle and retry counts per endpoint family."""
+        return {name: family.get_metrics() for name, family in self.families.items()}
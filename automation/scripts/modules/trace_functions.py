@@ -0,0 +1,287 @@
+import os, re, sys, json, time, uuid, atexit, threading, contextvars
+from contextlib import contextmanager
+
+# Spans are only collected when tracing was started (see start), otherwise all functions are no-ops.
+# Output format is chosen by file name: *.otlp.json writes OTLP JSON, anything else a Chrome trace_event file
+# (open with chrome://tracing or https://ui.perfetto.dev).
+
+_enabled = False
+_file_path = None
+_trace_id = None
+_root = None
+_phases = []
+_spans = []
+_lock = threading.Lock()
+_current = contextvars.ContextVar("fabricops_span", default=None)
+_sleep_factor = 1.0
+
+GUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "thread_id", "thread_name")
+
+    def __init__(self, name, parent, attributes=None, start_ns=None):
+        thread = threading.current_thread()
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, end_ns=None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            with _lock:
+                _spans.append(self)
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _parent():
+    return _current.get() or (_phases[-1] if _phases else _root)
+
+
+def start(file_path: str = None, name: str = None, collect: bool = False):
+    """
+    Starts collecting spans for this process and exports them to file_path when the process exits.
+
+    Args:
+        file_path (str, optional): Trace file to write. Defaults to the FABRICOPS_TRACE environment variable; tracing
+            stays disabled if neither is set.
+        name (str, optional): Name of the root span, e.g. the script name.
+        collect (bool): Collect spans even without a trace file, e.g. for the performance report.
+    """
+    global _enabled, _file_path, _trace_id, _root
+    file_path = file_path or os.environ.get("FABRICOPS_TRACE")
+    if _enabled:
+        _file_path = _file_path or file_path
+        return
+    if not file_path and not collect:
+        return
+
+    _enabled = True
+    _file_path = file_path
+    _trace_id = uuid.uuid4().hex
+    _root = Span(name or os.path.basename(sys.argv[0]), None)
+    # Interpreter start, imports and argument parsing before tracing started
+    process_start = get_process_start_time()
+    if process_start:
+        record_span("startup", process_start, _root.start_ns / 1e9)
+    _instrument_requests()
+    atexit.register(export)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Records the enclosed block as a span, nested below the current span (or the current phase).
+    """
+    if not _enabled:
+        yield NOOP_SPAN
+        return
+
+    current = Span(name, _parent(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def set_attribute(key: str, value):
+    """Sets an attribute on the current span."""
+    current = _current.get()
+    if _enabled and current:
+        current.set_attribute(key, value)
+
+
+def record_span(name: str, start_time: float, end_time: float = None, **attributes):
+    """
+    Records a span after the fact, e.g. a long running operation awaited by a shared poll loop.
+
+    Args:
+        start_time (float): Start as returned by time.time().
+        end_time (float, optional): End as returned by time.time(). Defaults to now.
+    """
+    if not _enabled:
+        return
+    recorded = Span(name, _parent(), attributes, start_ns=int(start_time * 1e9))
+    recorded.end(int((end_time or time.time()) * 1e9))
+
+
+def get_process_start_time() -> float:
+    """Returns when this process started (seconds since the epoch), or None where it cannot be determined."""
+    try:
+        if sys.platform.startswith("linux"):
+            # Start of the process in clock ticks since boot, the 22nd field of /proc/self/stat
+            with open("/proc/self/stat", "r") as f:
+                start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime", "r") as f:
+                uptime = float(f.read().split()[0])
+            return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            creation, exit_time, kernel_time, user_time = (wintypes.FILETIME() for _ in range(4))
+            kernel32 = ctypes.windll.kernel32
+            if kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(creation), ctypes.byref(exit_time), ctypes.byref(kernel_time), ctypes.byref(user_time)):
+                # FILETIME counts 100 ns intervals since 1601-01-01
+                return ((creation.dwHighDateTime << 32) + creation.dwLowDateTime) / 1e7 - 11644473600
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return None
+
+
+def start_phase(name: str, level: int = 1):
+    """
+    Starts a phase of the run (e.g. a header printed by misc.print_header), ending the previous phase of the same or
+    a deeper level. Spans without an enclosing span are nested below the current phase.
+    """
+    if not _enabled:
+        return
+    end_phases(level)
+    parent = _phases[-1] if _phases else _root
+    _phases.append(Span(name, parent, {"phase": True}))
+
+
+def end_phases(level: int = 1):
+    """Ends all phases at or below the given level."""
+    while len(_phases) >= level:
+        _phases.pop().end()
+
+
+def sleep(seconds: float, reason: str = None):
+    """time.sleep recorded as a span, so waiting shows up in traces."""
+    with span("sleep", reason=reason, seconds=seconds):
+        time.sleep(seconds * _sleep_factor)
+
+
+def set_sleep_factor(factor: float):
+    """Scales all waits of sleep, e.g. to 0 when replaying a cassette instantly."""
+    global _sleep_factor
+    _sleep_factor = factor
+
+
+def normalize_endpoint(path: str) -> str:
+    """Replaces IDs in a REST path with placeholders, so calls to the same endpoint can be grouped."""
+    path = GUID_PATTERN.sub("{id}", path.split("?")[0])
+    return re.sub(r"/\d+(?=/|$)", "/{n}", path)
+
+
+def _instrument_requests():
+    """Records all calls made with the requests library (ADO, GitHub, Entra ID and fabric_cicd) as spans."""
+    try:
+        import requests
+    except ImportError:
+        return
+
+    original_request = requests.Session.request
+    if getattr(original_request, "_fabricops_traced", False):
+        return
+
+    def traced_request(session, method, url, *args, **kwargs):
+        host = re.sub(r"^https?://", "", str(url)).split("/")[0]
+        endpoint = normalize_endpoint("/" + "/".join(re.sub(r"^https?://", "", str(url)).split("/")[1:]))
+        with span(f"http {method.upper()}", **{"http.method": method.upper(), "http.host": host, "endpoint": endpoint}) as current:
+            response = original_request(session, method, url, *args, **kwargs)
+            current.set_attribute("status_code", response.status_code)
+            return response
+
+    traced_request._fabricops_traced = True
+    requests.Session.request = traced_request
+
+
+def get_spans() -> list:
+    """Returns all ended spans as dicts (start and duration in seconds since the epoch)."""
+    with _lock:
+        spans = list(_spans)
+    return [{
+        "name": s.name, "span_id": s.span_id, "parent_id": s.parent_id, "start": s.start_ns / 1e9,
+        "duration": (s.end_ns - s.start_ns) / 1e9, "thread": s.thread_name, "attributes": s.attributes,
+    } for s in spans]
+
+
+def _to_chrome(spans):
+    pid = os.getpid()
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": _root.name}}]
+    for thread_id, thread_name in {(s.thread_id, s.thread_name) for s in spans}:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        events.append({
+            "name": s.name, "cat": "phase" if s.attributes.get("phase") else s.name.split(" ")[0], "ph": "X",
+            "ts": s.start_ns / 1000, "dur": (s.end_ns - s.start_ns) / 1000, "pid": pid, "tid": s.thread_id, "args": s.attributes,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(spans):
+    otlp_spans = []
+    for s in spans:
+        otlp_span = {
+            "traceId": _trace_id, "spanId": s.span_id, "name": s.name, "kind": 1,
+            "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in {**s.attributes, "thread.name": s.thread_name}.items()],
+            "status": {"code": 2} if s.attributes.get("error") else {},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        otlp_spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "fabricops"}}, {"key": "process.command", "value": {"stringValue": _root.name}}]},
+        "scopeSpans": [{"scope": {"name": "fabricops"}, "spans": otlp_spans}],
+    }]}
+
+
+def finish():
+    """Ends the open phases and the root span."""
+    if _enabled:
+        end_phases()
+        _root.end()
+
+
+def export(file_path: str = None):
+    """Ends the open phases and the root span and writes all spans to the trace file."""
+    file_path = file_path or _file_path
+    if not _enabled or not file_path:
+        return
+    finish()
+    with _lock:
+        spans = [s for s in _spans if s.end_ns is not None]
+
+    trace = _to_otlp(spans) if file_path.lower().endswith(".otlp.json") else _to_chrome(spans)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    print(f"Trace with {len(spans)} span(s) written to {file_path}")
@@ -4,9 +4,13 @@
 import os, sys, io, argparse
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.state_functions as fabstate
 import shutil
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stdout.reconfigure(line_buffering=True)
 
 # Get arguments
@@ -17,8 +21,13 @@ parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENAN
 parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
 parser.add_argument("--build_parameter_file", required=False, default=True, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Build parameter file for Fabric deployments. Collects environment specific item IDs etc.")
+parser.add_argument("--state", required=False, default=os.environ.get('FABRICOPS_STATE'), help="Writes the resolved workspaces, items, SQL endpoints and connections of the scanned environments to this state file (e.g. fabric_state.json), so later pipeline steps can read them with --state instead of discovering them again. Defaults to the FABRICOPS_STATE environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
 environments = args.environments.split(",")
 source_environment = args.source_environment
 tenant_id = args.tenant_id
@@ -27,92 +36,42 @@ client_secret = args.client_secret
 build_parameter_file = args.build_parameter_file
 
 # Authenticate
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(client_id, client_secret, tenant_id)
 
 data = {
     "environments": []
 }
+environment_states = {}
 
 if(build_parameter_file):
     misc.print_header(f"Fetching environment details")
 
     for environment in environments:    
         # Load JSON environment files (main and environment specific) and merge
-        main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-        env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+        main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+        env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
         env_definition = misc.merge_json(main_json, env_json)
 
         if env_definition:
             misc.print_info(f"Fetching details for {environment}...", bold=True, end="")
             
-            solution_name = env_definition.get("name")
-            layers = env_definition.get("layers")
-            default_capacity_name = env_definition.get("generic").get("capacity_name")
-
-            environment_definition = { "name": environment, "layers": [] }
-            
-            has_item_connections = False
-            for layer_name, layer_definition in layers.items():
-                workspace_name = solution_name.format(layer=layer_name, environment=environment)
-                workspace_name_escaped = workspace_name.replace("/", "\\/")
-                workspace_id = fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
-                print(f"Getting data for {workspace_id}, {workspace_name}")
-                if(misc.is_guid(workspace_id)):
-                    workspace_items = fabcli.list_all_workspace_items(workspace_id)
-
-                    layer = {
-                        "name": layer_name,
-                        "workspace_name": workspace_name,
-                        "workspace_id": workspace_id,
-                        "items": []
-                    }
-        
-                    # Get all items in the workspace
-                    for item in workspace_items:
-                        fabric_item = {
-                            "unique_name": f"{item.get('displayName')}.{item.get('type')}",
-                            "name": item.get("displayName"),
-                            "id": item.get("id"),
-                            "type": item.get("type")
-                        }
-
-                        if item.get("type") in {"Lakehouse", "SQLDatabase", "Warehouse"}:
-                            item_details = fabcli.get_item(f"/{workspace_name_escaped}.Workspace/{item.get('displayName')}.{item.get('type')}", retry_count=2)
-                            fabric_item.update({
-                                "connectionString": item_details.get("properties").get("connectionString") if item.get("type") != "Lakehouse" else item_details.get("properties").get("sqlEndpointProperties").get("connectionString") ,
-                                "databaseName": item_details.get("properties").get("databaseName") if item.get("type") == "SQLDatabase" else item_details.get("displayName") if item.get("type") == "Warehouse" else None,
-                                "serverFqdn": item_details.get("properties").get("serverFqdn") if item.get("type") == "SQLDatabase" else None,
-                                "sqlEndpointId": item_details.get("properties").get("sqlEndpointProperties").get("id") if item.get("type") == "Lakehouse" else None,
-                            })
-
-                        layer["items"].append(fabric_item)
-
-                    # Get all layer connections
-                    if layer_definition.get("items"):
-                        for item_type, items in layer_definition.get("items").items():
-                            for item in items: 
-                                if item.get("connection_name") and item_type in {"Lakehouse", "SQLDatabase", "Warehouse"}:
-                                    connection_name = item.get("connection_name").format(layer=layer_name, environment=environment)
-                                    if fabcli.connection_exists(connection_name):
-                                        connection = fabcli.get_item(f".connections/{connection_name}.Connection")
-                                        upd_item = next((i for i in layer["items"] if i.get('unique_name') == f"{item.get('item_name')}.{item_type}"), None)
-                                        if upd_item:
-                                            upd_item['connectionId'] = connection.get("id")
-
-                    environment_definition["layers"].append(layer)
-            
-            data["environments"].append(environment_definition)
+            layers, connections = fabstate.scan_environment(environment, env_definition)
+            data["environments"].append({ "name": environment, "layers": layers })
+            environment_states[environment] = fabstate.build_environment_state(env_definition, layers, connections)
         else:
             misc.print_warning(f"No environment definition found for {environment}... Skipping!")
 
         print("")
 
-parameter_file_src = os.path.join(os.path.dirname(__file__), "../resources/parameters/parameter.yml")
+if args.state and environment_states:
+    fabstate.save_state(args.state, environment_states)
+
+parameter_file_src = os.path.join(misc.PARAMETERS_DIR, "parameter.yml")
 yml_data = misc.build_parameter_yml(parameter_file_src, data)
 
 # Copy the parameter file to each solution folder
-solution_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../solution'))
+solution_root = misc.SOLUTION_DIR
 for folder in os.listdir(solution_root):
     folder_path = os.path.join(solution_root, folder)
     if os.path.isdir(folder_path):
@@ -8,9 +8,14 @@
 import os, sys, io, argparse
 import modules.fabric_cli_functions as fabcli
 import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.state_functions as fabstate
+import modules.semantic_model_functions as smfunc
 import shutil
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stdout.reconfigure(line_buffering=True)
 
 # Get arguments
@@ -20,8 +25,15 @@ parser.add_argument("--client_id", required=False, default=os.environ.get('CLIEN
 parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
 parser.add_argument("--target_environments", required=False, default="tst,prd", help="Comma separated list of target environments for parameter mapping (e.g., 'tst,prd'). Defaults to 'tst,prd'.")
 parser.add_argument("--build_parameter_file", required=False, default=True, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Build parameter file for Fabric deployments using dynamic values.")
+parser.add_argument("--state", required=False, default=os.environ.get('FABRICOPS_STATE'), help="Writes the resolved workspaces, items, SQL endpoints and connections of the scanned environments to this state file (e.g. fabric_state.json), so later pipeline steps can read them with --state instead of discovering them again. Defaults to the FABRICOPS_STATE environment variable.")
+parser.add_argument("--changed_models", required=False, default=os.environ.get('FABRICOPS_CHANGED_MODELS'), help="Writes the semantic models changed since --changed_since per layer to this file (e.g. changed_semantic_models.json), so release stages without a git checkout can refresh only changed models (fabric_release.py --refresh_models changed --changed_models <file>). Defaults to the FABRICOPS_CHANGED_MODELS environment variable.")
+parser.add_argument("--changed_since", required=False, default="HEAD~1", help="Git reference semantic model changes are detected against for --changed_models. The checkout needs this history. Default is HEAD~1.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
 
 tenant_id = args.tenant_id
 client_id = args.client_id
@@ -30,13 +42,14 @@ target_environments = [env.strip() for env in args.target_environments.split(","
 build_parameter_file = args.build_parameter_file
 
 # Authenticate
-fabcli.run_command("config set encryption_fallback_enabled true")
-fabcli.run_command(f"auth login -u {client_id} -p {client_secret} --tenant {tenant_id}")
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(client_id, client_secret, tenant_id)
 
 dev_environment_data = {
     "name": "dev",
     "layers": []
 }
+dev_connections = {}
 
 if build_parameter_file:
     misc.print_header(f"Fetching dev environment details for dynamic parameter generation")
@@ -44,8 +57,8 @@ if build_parameter_file:
     environment = "dev"
 
     # Load JSON environment files (main and environment specific) and merge
-    main_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.json'))
-    env_json = misc.load_json(os.path.join(os.path.dirname(__file__), f'../resources/environments/infrastructure.{environment}.json'))
+    main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+    env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
     env_definition = misc.merge_json(main_json, env_json)
 
     if env_definition:
@@ -105,6 +118,7 @@ if build_parameter_file:
                                 connection_name = item.get("connection_name").format(layer=layer_name, environment=environment)
                                 if fabcli.connection_exists(connection_name):
                                     connection = fabcli.get_item(f".connections/{connection_name}.Connection")
+                                    dev_connections[connection_name] = connection
                                     upd_item = next((i for i in layer["items"] if i.get('unique_name') == f"{item.get('item_name')}.{item_type}"), None)
                                     if upd_item:
                                         upd_item['connectionId'] = connection.get("id")
@@ -114,14 +128,28 @@ if build_parameter_file:
                 print(" ⚠ (workspace not found)")
         
         print("")
+
+        if args.state:
+            # The parameter file resolves target IDs at deployment time, the state needs them for the later steps
+            environment_states = {environment: fabstate.build_environment_state(env_definition, dev_environment_data["layers"], dev_connections)}
+            for target_environment in target_environments:
+                target_definition = misc.merge_json(main_json, misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{target_environment}.json')))
+                misc.print_info(f"Fetching details for {target_environment} state...", bold=True)
+                target_layers, target_connections = fabstate.scan_environment(target_environment, target_definition)
+                environment_states[target_environment] = fabstate.build_environment_state(target_definition, target_layers, target_connections)
+            print("")
+            fabstate.save_state(args.state, environment_states)
+
+        if args.changed_models:
+            smfunc.save_changed_semantic_models(args.changed_models, misc.SOLUTION_DIR, list(layers), args.changed_since)
         
         # Build dynamic parameter file
-        parameter_file_src = os.path.join(os.path.dirname(__file__), "../resources/parameters/parameter.yml")
+        parameter_file_src = os.path.join(misc.PARAMETERS_DIR, "parameter.yml")
         misc.build_parameter_yml_dynamic(parameter_file_src, dev_environment_data, target_environments)
 
         # Copy the updated parameter file to each solution folder
         misc.print_info(f"Copying parameter file to solution folders...", bold=True)
-        solution_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../solution'))
+        solution_root = misc.SOLUTION_DIR
         for folder in os.listdir(solution_root):
             folder_path = os.path.join(solution_root, folder)
             if os.path.isdir(folder_path):
@@ -2,6 +2,8 @@ import os, sys, argparse, shutil, subprocess, json
 from datetime import datetime
 from pathlib import Path
 import uuid
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
 
 os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
 sys.path.append(os.getcwd())
@@ -32,8 +34,12 @@ default_model_dir= f"{os.getenv('BUILD_SOURCEDIRECTORY')}\\solution\\model"
 parser = argparse.ArgumentParser(description="Semantic model build script arguments")
 parser.add_argument("--model_dir", required=False, default=default_model_dir, help="Repository containing semantic models.")
 parser.add_argument("--tabulareditor_dir", required=False, default=None, help="Directory where Tabular Editor 2.x executable file is stored.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
 
 args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
 model_dir = Path(args.model_dir)
 tabulareditor_directory = Path(args.tabulareditor_dir)
 
@@ -75,10 +81,11 @@ if model_dir and os.path.exists(model_dir):
                         te_exec = os.path.join(tabulareditor_directory, "TabularEditor.exe")
                         
                         # Run the conversion to TMDL format
-                        subprocess.run([
-                            te_exec, source_file, 
-                            "-TMDL", output_definition_path
-                        ], check=True)
+                        with tracing.span("tabular editor convert", model=model_name):
+                            subprocess.run([
+                                te_exec, source_file, 
+                                "-TMDL", output_definition_path
+                            ], check=True)
                         
                         print(f"  Converted to {output_folder_name}/definition")
                         
@@ -0,0 +1,69 @@
+#---------------------------------------------------------
+# Performance report comparison
+# Compares the performance report of a run (--report of fabric_setup.py,
+# fabric_release.py, fabric_gitsync_env.py, ...) with a baseline report and
+# fails if wall time, phase times, call counts, latencies, sleep time or
+# retries regressed beyond the threshold.
+#---------------------------------------------------------
+import os, sys, io, argparse, json
+import modules.misc_functions as misc
+import modules.report_functions as perfreport
+import modules.profile_functions as profiling
+
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Performance report comparison arguments")
+parser.add_argument("--baseline", required=True, help="Performance report of the baseline run.")
+parser.add_argument("--current", required=True, help="Performance report of the run to check.")
+parser.add_argument("--threshold", required=False, default=20, type=float, help="Growth in percent above which a metric counts as regression. Default is 20.")
+parser.add_argument("--min_seconds", required=False, default=1.0, type=float, help="Minimum growth in seconds for time metrics to count as regression. Default is 1.")
+parser.add_argument("--all", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Print all metrics instead of changed metrics only.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
+
+args = parser.parse_args()
+profiling.start(args.profile)
+
+baseline = misc.load_json(args.baseline)
+current = misc.load_json(args.current)
+
+if not baseline or not current:
+    misc.print_error(f"Performance report {args.baseline if not baseline else args.current} could not be loaded... Exiting!")
+    sys.exit(1)
+
+misc.print_header(f"Comparing {current.get('script')} with baseline")
+misc.print_info(f"Baseline: {args.baseline} ({baseline.get('started')})")
+misc.print_info(f"Current:  {args.current} ({current.get('started')})")
+print("")
+
+results = perfreport.compare_reports(baseline, current, args.threshold, args.min_seconds)
+regressions = [result for result in results if result.get("regression")]
+
+def format_value(value, unit):
+    if value is None:
+        return "-"
+    return f"{value:.2f}s" if unit == "s" else str(value)
+
+rows = [
+    (
+        result.get("metric"),
+        format_value(result.get("baseline"), result.get("unit")),
+        format_value(result.get("current"), result.get("unit")),
+        f"{result.get('change'):+.1f}%" if result.get("change") is not None else ("new" if result.get("baseline") is None else "-"),
+        "✖ regression" if result.get("regression") else "",
+    )
+    for result in results
+    if args.all or result.get("regression") or result.get("baseline") != result.get("current")
+]
+
+if rows:
+    misc.print_table(["Metric", "Baseline", "Current", "Change", ""], rows)
+    print("")
+
+if regressions:
+    misc.print_error(f"{len(regressions)} metric(s) regressed by more than {args.threshold}%.", bold=True)
+    sys.exit(1)
+
+misc.print_success(f"No regressions above {args.threshold}%.", bold=True)
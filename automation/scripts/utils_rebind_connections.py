@@ -0,0 +1,190 @@
+#---------------------------------------------------------
+# Bulk report and semantic model rebinding
+# Rebinds all report definitions (*.Report/definition.pbir) to the published
+# semantic models and points all model expression files to the SQL endpoint
+# of their lakehouse. Semantic model IDs are resolved from a single workspace
+# listing and only files whose content actually changes are written.
+#---------------------------------------------------------
+import os, sys, io, argparse, json
+from concurrent.futures import ThreadPoolExecutor
+import modules.fabric_cli_functions as fabcli
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+import modules.state_functions as fabstate
+
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+MODEL_EXPRESSION_FILES = {"expressions.tmdl", "model.bim", "database.json", "sqlendpoint.json"}
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Bulk report and semantic model rebinding arguments")
+parser.add_argument("--environment", required=False, default="dev", help="Environment whose workspaces the reports and models are bound to. Default is dev.")
+parser.add_argument("--solution_path", required=False, default=misc.SOLUTION_DIR, help="Path to the solution folder containing reports and semantic models.")
+parser.add_argument("--model_layer", required=False, default="Model", help="Layer of the workspace holding the semantic models.")
+parser.add_argument("--store_layer", required=False, default="Store", help="Layer of the workspace holding the lakehouse, used for models without an entry in sqlendpoint_model_binding.yml.")
+parser.add_argument("--lakehouse_name", required=False, default="Curated", help="Lakehouse used for models without an entry in sqlendpoint_model_binding.yml.")
+parser.add_argument("--max_workers", required=False, default=8, type=int, help="Number of files rewritten in parallel.")
+parser.add_argument("--dry_run", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Only report which files would change.")
+parser.add_argument("--state", required=False, default=os.environ.get('FABRICOPS_STATE'), help="State file written by utils_build_parameter_file.py --state. The workspace ID of the model layer and the SQL endpoints of the lakehouses are read from it instead of being discovered, if it is recent, matches the environment definition and its workspace IDs are current. Defaults to the FABRICOPS_STATE environment variable.")
+parser.add_argument("--tenant_id", required=False, default=os.environ.get('TENANT_ID'), help="Azure Active Directory (Microsoft Entra ID) tenant ID used for authenticating with Fabric APIs. Defaults to the TENANT_ID environment variable.")
+parser.add_argument("--client_id", required=False, default=os.environ.get('CLIENT_ID'), help="Client ID of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_ID environment variable.")
+parser.add_argument("--client_secret", required=False, default=os.environ.get('CLIENT_SECRET'), help="Client secret of the Azure AD application registered for accessing Fabric APIs. Defaults to the CLIENT_SECRET environment variable.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
+
+args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+environment = args.environment
+solution_path = os.path.abspath(args.solution_path)
+model_layer = args.model_layer
+dry_run = args.dry_run
+
+
+def get_model_name_for_file(file_path):
+    """Returns the semantic model a model file belongs to, based on the nearest *.SemanticModel folder or the model folder name."""
+    relative_parts = os.path.relpath(os.path.dirname(file_path), solution_path).split(os.sep)
+    for part in reversed(relative_parts):
+        if part.endswith(".SemanticModel"):
+            return part.removesuffix(".SemanticModel")
+    return relative_parts[1] if len(relative_parts) > 1 else None
+
+
+def write_if_changed(file_path, original, updated):
+    if updated == original:
+        return "unchanged"
+    if not dry_run:
+        with open(file_path, "w", encoding="utf-8", newline="") as f:
+            f.write(updated)
+    return "updated"
+
+
+def rebind_report(file_path, workspace_name, semantic_model_ids):
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        original = f.read()
+
+    content = json.loads(original)
+    semantic_model_name = misc.get_report_semantic_model_name(content)
+    by_connection = (content.get("datasetReference") or {}).get("byConnection")
+
+    if not by_connection:
+        return "skipped", "report is bound by path"
+    if semantic_model_name not in semantic_model_ids:
+        return "skipped", f"semantic model '{semantic_model_name}' not found in workspace {workspace_name}"
+
+    connection_string = misc.build_semantic_model_connection_string(workspace_name, semantic_model_name, semantic_model_ids[semantic_model_name])
+    if by_connection.get("connectionString") == connection_string:
+        return "unchanged", semantic_model_name
+
+    by_connection["connectionString"] = connection_string
+    return write_if_changed(file_path, original, json.dumps(content, indent=2)), semantic_model_name
+
+
+def rebind_model_file(file_path, expression_values):
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        original = f.read()
+
+    if file_path.lower().endswith(".tmdl"):
+        updated, _ = misc.update_expressions_tmdl(original, expression_values)
+    else:
+        updated, _ = misc.update_expressions_tmsl_text(original, expression_values)
+
+    return write_if_changed(file_path, original, updated), expression_values.get("Database")
+
+
+# Authenticate
+fabcli.configure({"encryption_fallback_enabled": "true"})
+fabcli.login(args.client_id, args.client_secret, args.tenant_id)
+
+# Load JSON environment files (main and environment specific) and merge
+main_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, 'infrastructure.json'))
+env_json = misc.load_json(os.path.join(misc.ENVIRONMENTS_DIR, f'infrastructure.{environment}.json'))
+env_definition = misc.merge_json(main_json, env_json)
+
+if env_definition:
+    misc.print_header(f"Rebinding reports and semantic models to {environment}")
+    solution_name = env_definition.get("name")
+    environment_state = fabstate.load_state(args.state, environment, env_definition) if args.state else None
+
+    # Discover all report definitions and model expression files in one pass
+    report_files, model_files = [], []
+    for root, _, files in os.walk(solution_path):
+        for filename in files:
+            if filename.lower() == "definition.pbir" and os.path.basename(root).endswith(".Report"):
+                report_files.append(os.path.join(root, filename))
+            elif filename.lower() in MODEL_EXPRESSION_FILES:
+                model_files.append(os.path.join(root, filename))
+
+    misc.print_info(f"Found {len(report_files)} report(s) and {len(model_files)} model expression file(s).")
+
+    # Resolve all semantic model IDs from a single workspace listing
+    workspace_name = solution_name.format(layer=model_layer, environment=environment)
+    workspace_name_escaped = workspace_name.replace("/", "\\/")
+    workspace_id = fabstate.get_workspace_id(environment_state, model_layer) or fabcli.run_command(f"get '{workspace_name_escaped}.Workspace' -q id -f").strip()
+    semantic_model_ids = fabcli.get_workspace_item_ids(workspace_id, "SemanticModel") if misc.is_guid(workspace_id) else {}
+    misc.print_info(f"Resolved {len(semantic_model_ids)} semantic model(s) in workspace {workspace_name}.")
+
+    # Map each semantic model to its lakehouse, falling back to the default lakehouse
+    bindings_yml = os.path.join(misc.PARAMETERS_DIR, "sqlendpoint_model_binding.yml")
+    model_lakehouses = {}
+    for binding in misc.get_semantic_model_bindings(bindings_yml, model_layer):
+        for semantic_model_name in binding.get("semantic_models"):
+            model_lakehouses[semantic_model_name] = (binding.get("lakehouse_ws_layer"), binding.get("lakehouse_name"))
+
+    model_names = {get_model_name_for_file(file_path) for file_path in model_files}
+    lakehouses = {model_lakehouses.get(name, (args.store_layer, args.lakehouse_name)) for name in model_names}
+
+    def resolve_sqlendpoint(lakehouse):
+        lakehouse_ws_layer, lakehouse_name = lakehouse
+        scanned = fabstate.get_item(environment_state, lakehouse_ws_layer, lakehouse_name, "Lakehouse")
+        if scanned and scanned.get("connectionString"):
+            return scanned.get("connectionString")
+        lakehouse_workspace = solution_name.format(layer=lakehouse_ws_layer, environment=environment).replace("/", "\\/")
+        item = fabcli.get_item(f"/{lakehouse_workspace}.Workspace/{lakehouse_name}.Lakehouse", retry_count=2)
+        properties = (item or {}).get("properties") or {}
+        return (properties.get("sqlEndpointProperties") or {}).get("connectionString")
+
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        sqlendpoints = dict(zip(lakehouses, executor.map(resolve_sqlendpoint, lakehouses)))
+
+        counts = {"updated": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+        futures = {}
+        for file_path in report_files:
+            futures[file_path] = executor.submit(rebind_report, file_path, workspace_name, semantic_model_ids)
+
+        for file_path in model_files:
+            lakehouse = model_lakehouses.get(get_model_name_for_file(file_path), (args.store_layer, args.lakehouse_name))
+            if not sqlendpoints.get(lakehouse):
+                misc.print_warning(f"  ⚠ {os.path.relpath(file_path, solution_path)}: SQL endpoint for lakehouse '{lakehouse[1]}' could not be resolved")
+                counts["skipped"] += 1
+                continue
+            expression_values = {"SqlEndpoint": sqlendpoints[lakehouse], "Database": lakehouse[1]}
+            futures[file_path] = executor.submit(rebind_model_file, file_path, expression_values)
+
+        for file_path, future in futures.items():
+            relative_path = os.path.relpath(file_path, solution_path)
+            try:
+                status, detail = future.result()
+            except Exception as e:
+                status, detail = "failed", str(e)
+
+            counts[status] += 1
+            if status == "updated":
+                misc.print_success(f"  ✔ {relative_path} ({detail}){' [dry run]' if dry_run else ''}")
+            elif status == "skipped":
+                misc.print_warning(f"  ⚠ {relative_path}: {detail}")
+            elif status == "failed":
+                misc.print_error(f"  ✖ {relative_path}: {detail}")
+
+    print("")
+    summary = f"{counts['updated']} updated, {counts['unchanged']} unchanged, {counts['skipped']} skipped, {counts['failed']} failed."
+    if counts["failed"]:
+        misc.print_error(f"Rebinding failed: {summary}", bold=True)
+        sys.exit(1)
+    misc.print_success(f"Rebinding completed: {summary}", bold=True)
+else:
+    misc.print_error(f"No environment definition found for {environment}... Exiting!")
+    sys.exit(1)
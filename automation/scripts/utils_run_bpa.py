@@ -0,0 +1,105 @@
+#---------------------------------------------------------
+# Incremental Best Practice Analyzer runner
+# Runs the Tabular Editor BPA against all semantic models in the model folder,
+# re-evaluating only the rules affected by changed model objects and reusing
+# cached verdicts for everything else.
+#---------------------------------------------------------
+import os, sys, io, argparse
+from datetime import datetime
+import modules.bpa_functions as bpa
+import modules.misc_functions as misc
+import modules.trace_functions as tracing
+import modules.profile_functions as profiling
+
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stdout.reconfigure(line_buffering=True)
+
+start_time = datetime.now()
+
+# Get arguments
+parser = argparse.ArgumentParser(description="Incremental Best Practice Analyzer arguments")
+parser.add_argument("--model_dir", required=False, default=os.path.join(os.path.dirname(__file__), "../../solution/model"), help="Folder containing the semantic models to analyze. Each first-level folder is treated as a model.")
+parser.add_argument("--rules_file", required=False, default=os.path.join(os.path.dirname(__file__), "../resources/BPARules.json"), help="Path to the BPA rules file.")
+parser.add_argument("--tabulareditor_dir", required=True, help="Directory where Tabular Editor 2.x executable file is stored.")
+parser.add_argument("--cache_file", required=False, default=os.path.join(os.path.dirname(__file__), "../../.bpa_cache/bpa_cache.json"), help="Path to the BPA result cache. Restore and save this file between pipeline runs to enable incremental analysis.")
+parser.add_argument("--full", required=False, default=False, type=lambda x: x.lower() in ['true', '1', 'yes'], help="Ignore cached verdicts and analyze all models with all rules.")
+parser.add_argument("--trace", required=False, default=os.environ.get('FABRICOPS_TRACE'), help="Writes a trace of all Fabric calls, REST calls and waits to this file (Chrome trace_event JSON, or OTLP JSON if the name ends with .otlp.json). Defaults to the FABRICOPS_TRACE environment variable.")
+parser.add_argument("--profile", required=False, default=os.environ.get('FABRICOPS_PROFILE'), help="Profiles the run and writes <profile>.pstats (cProfile) and <profile>.folded (collapsed stacks of all threads for flame graphs), or files named after the script if an existing folder is given. Prints the functions with the most own time at the end. Defaults to the FABRICOPS_PROFILE environment variable.")
+
+args = parser.parse_args()
+profiling.start(args.profile)
+tracing.start(args.trace)
+model_dir = args.model_dir
+te_exec = os.path.join(args.tabulareditor_dir, "TabularEditor.exe")
+
+rules = bpa.load_rules(args.rules_file)
+cache = {"version": bpa.CACHE_VERSION, "models": {}} if args.full else bpa.load_cache(args.cache_file)
+
+misc.print_header("Best Practice Analyzer")
+
+if not os.path.isdir(model_dir):
+    misc.print_warning(f"No model folders found in {model_dir}")
+    sys.exit(0)
+
+has_errors = False
+failed_models = []
+models_processed = 0
+model_names = set()
+
+for folder in sorted(os.scandir(model_dir), key=lambda entry: entry.name):
+    if not folder.is_dir():
+        continue
+
+    definition_path = bpa.find_model_definition(folder.path)
+    if not definition_path:
+        misc.print_info(f"Skipping folder (no model found): {folder.name}")
+        continue
+
+    model_name = folder.name.removesuffix(".SemanticModel")
+    model_names.add(model_name)
+    models_processed += 1
+
+    misc.print_info(f"Analyzing {model_name}...", bold=True, end="")
+    try:
+        result = bpa.analyze_model(model_name, definition_path, rules, cache, te_exec)
+    except RuntimeError as e:
+        # The cache keeps the previous entry of the model, so the next run analyzes it again
+        print("")
+        misc.print_error(f"  Analysis failed: {e}")
+        failed_models.append(model_name)
+        continue
+
+    if result["ran_analyzer"]:
+        misc.print_info(f" {result['rules_run']} rule(s) evaluated, {result['rules_cached']} served from cache")
+    else:
+        misc.print_info(" all verdicts served from cache")
+
+    for violation in result["violations"]:
+        severity = rules.get(violation["rule_id"], {}).get("Severity", 1)
+        rule_name = rules.get(violation["rule_id"], {}).get("Name", violation["rule_id"])
+        message = f"  {violation['object_type']} {violation['object_name']} violates rule \"{rule_name}\""
+        if severity >= 3:
+            misc.print_error(message)
+            has_errors = True
+        elif severity == 2:
+            misc.print_warning(message)
+        else:
+            misc.print_info(message)
+
+# Drop cache entries for models that no longer exist
+cache["models"] = {name: model for name, model in cache["models"].items() if name in model_names}
+bpa.save_cache(cache, args.cache_file)
+
+print("")
+misc.print_info(f"Processed {models_processed} semantic model(s) in {datetime.now() - start_time}")
+
+if failed_models:
+    misc.print_error(f"Best Practice Analyzer could not analyze {len(failed_models)} model(s): {', '.join(failed_models)}", bold=True)
+    sys.exit(1)
+
+if has_errors:
+    misc.print_error("Best Practice Analyzer found errors", bold=True)
+    sys.exit(1)
+
+misc.print_success("All semantic models passed BPA validation", bold=True)